@@ -0,0 +1,6 @@
+try:
+    import pyarrow  # noqa: F401
+except ImportError as e:
+    raise ImportError(
+        "归档功能需要安装 pyarrow，请使用 uv sync --extra archive 安装"
+    ) from e
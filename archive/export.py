@@ -0,0 +1,332 @@
+"""将历史数据导出为列式归档文件。
+
+通过服务端游标分批读取分区或时间范围内的数据，写入压缩的 Parquet 或 Arrow IPC
+文件，并在归档目录的 manifest.json 中记录文件信息。
+
+用法：
+python -m archive.export jpep.ftn_market_records --partition ftn_market_records_2024
+python -m archive.export jianshu.user_assets_ranking_records \
+    --start 2024-01-01 --end 2025-01-01
+"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from asyncio import run
+from datetime import date, datetime, time
+from pathlib import Path
+from typing import Any
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from msgspec import Struct
+from psycopg.sql import SQL, Composed, Identifier
+
+from archive.manifest import ArchiveFormatType, Manifest, ManifestEntry
+from archive.tables import ARCHIVE_TABLES, ArchiveTable
+from utils.db import POOLS, close_pools
+from utils.partition import Partition
+
+DEFAULT_COMPRESSION: dict[ArchiveFormatType, str] = {
+    "parquet": "zstd",
+    # Arrow IPC 仅支持 lz4 与 zstd，lz4 解压更快，适合内存映射读取
+    "arrow": "lz4",
+}
+
+
+async def _get_partition(table: ArchiveTable, name: str, /) -> Partition | None:
+    """获取分区边界，分区已从主表分离时返回 None。"""
+    async with POOLS[table.database].get_conn() as conn:
+        cursor = await conn.execute(
+            "SELECT pg_class.relispartition, pg_inherits.inhparent = %s::regclass, "
+            "pg_get_expr(pg_class.relpartbound, pg_class.oid) FROM pg_class "
+            "LEFT JOIN pg_inherits ON pg_inherits.inhrelid = pg_class.oid "
+            "WHERE pg_class.oid = to_regclass(%s) AND pg_class.relkind = 'r';",
+            (table.table, name),
+        )
+
+        data = await cursor.fetchone()
+
+    if data:
+        is_partition, is_partition_of_table, bound_expr = data
+        if is_partition and is_partition_of_table:
+            partition = Partition.from_bound_expr(name=name, bound_expr=bound_expr)
+            if partition:
+                return partition
+        # 分区管理 Flow 分离的分区为普通表，以主表名称为前缀
+        if not is_partition and name.startswith(f"{table.table}_"):
+            return None
+
+    raise ValueError(f"{table.table} 表不存在分区 {name}")
+
+
+class _ExportSource(Struct, frozen=True):
+    # 写入清单的数据来源，为分区名称或时间范围
+    name: str
+    # 查询的表
+    table: str
+    start_time: datetime | None
+    end_time: datetime | None
+
+
+async def _get_source(
+    table: ArchiveTable,
+    /,
+    *,
+    partition: str | None,
+    start_time: datetime | None,
+    end_time: datetime | None,
+) -> _ExportSource:
+    if partition is None:
+        if start_time is None or end_time is None:
+            raise ValueError("未指定分区时，必须指定时间范围")
+
+        return _ExportSource(
+            name=f"{start_time:%Y%m%d%H%M%S}_{end_time:%Y%m%d%H%M%S}",
+            table=table.table,
+            start_time=start_time,
+            end_time=end_time,
+        )
+
+    partition_info = await _get_partition(table, partition)
+    # 已分离的分区无法通过主表查询，直接读取分区表（分离时已授予查询权限）
+    if not partition_info:
+        return _ExportSource(
+            name=partition, table=partition, start_time=None, end_time=None
+        )
+
+    # 仅有主表的查询权限，按分区边界查询主表，由数据库裁剪到对应分区
+    return _ExportSource(
+        name=partition,
+        table=table.table,
+        start_time=partition_info.start_time,
+        end_time=partition_info.end_time,
+    )
+
+
+def _get_query(
+    table: ArchiveTable,
+    /,
+    *,
+    source_table: str,
+    start_time: datetime | None,
+    end_time: datetime | None,
+) -> tuple[Composed, tuple[Any, ...]]:
+    columns = SQL(", ").join(
+        SQL(column.expr) if column.expr else Identifier(column.name)
+        for column in table.columns
+    )
+
+    conditions: list[Composed] = []
+    params: list[Any] = []
+    if start_time:
+        conditions.append(
+            SQL("{} >= %s").format(Identifier(table.time_column)),
+        )
+        params.append(start_time)
+    if end_time:
+        conditions.append(
+            SQL("{} < %s").format(Identifier(table.time_column)),
+        )
+        params.append(end_time)
+
+    query = SQL("SELECT {} FROM {}").format(columns, Identifier(source_table))
+    if conditions:
+        query += SQL(" WHERE ") + SQL(" AND ").join(conditions)
+
+    return query + SQL(";"), tuple(params)
+
+
+def _to_datetime(value: date | datetime | None, /) -> datetime | None:
+    if value is None or isinstance(value, datetime):
+        return value
+
+    return datetime.combine(value, time())
+
+
+class _ArchiveWriter:
+    def __init__(
+        self,
+        path: Path,
+        /,
+        *,
+        schema: pa.Schema,
+        archive_format: ArchiveFormatType,
+        compression: str,
+    ) -> None:
+        self._format = archive_format
+
+        self._sink = pa.OSFile(str(path), "wb")
+        if archive_format == "parquet":
+            self._parquet_writer = pq.ParquetWriter(
+                self._sink, schema, compression=compression
+            )
+        else:
+            self._ipc_writer = pa.ipc.new_file(
+                self._sink,
+                schema,
+                options=pa.ipc.IpcWriteOptions(compression=compression),
+            )
+
+    def write_batch(self, batch: pa.RecordBatch, /) -> None:
+        if self._format == "parquet":
+            # 每批数据写入为一个 Row Group，便于读取时按统计信息跳过
+            self._parquet_writer.write_batch(batch)
+        else:
+            self._ipc_writer.write_batch(batch)
+
+    def close(self) -> None:
+        if self._format == "parquet":
+            self._parquet_writer.close()
+        else:
+            self._ipc_writer.close()
+        self._sink.close()
+
+
+async def export(
+    table: ArchiveTable,
+    /,
+    *,
+    directory: Path,
+    partition: str | None = None,
+    start_time: datetime | None = None,
+    end_time: datetime | None = None,
+    archive_format: ArchiveFormatType = "parquet",
+    compression: str | None = None,
+    batch_size: int = 50000,
+) -> ManifestEntry:
+    """导出分区或时间范围内的数据，返回写入清单的条目。"""
+    source = await _get_source(
+        table, partition=partition, start_time=start_time, end_time=end_time
+    )
+
+    compression = compression or DEFAULT_COMPRESSION[archive_format]
+    relative_path = (
+        f"{table.database}/{table.table}/{source.name}."
+        f"{'parquet' if archive_format == 'parquet' else 'arrow'}"
+    )
+    file = directory / relative_path
+    file.parent.mkdir(parents=True, exist_ok=True)
+
+    query, params = _get_query(
+        table,
+        source_table=source.table,
+        start_time=source.start_time,
+        end_time=source.end_time,
+    )
+    schema = table.schema
+    time_column_index = schema.get_field_index(table.time_column)
+
+    rows_count = 0
+    min_time: datetime | None = None
+    max_time: datetime | None = None
+
+    # 先写入临时文件，导出完成后再重命名，避免读取到不完整的文件
+    temp_file = file.with_name(f"{file.name}.tmp")
+    writer = _ArchiveWriter(
+        temp_file,
+        schema=schema,
+        archive_format=archive_format,
+        compression=compression,
+    )
+    try:
+        async with (
+            POOLS[table.database].get_conn() as conn,
+            # 服务端游标需在事务中使用
+            conn.transaction(),
+            conn.cursor(name=f"archive_{table.table}") as cursor,
+        ):
+            await cursor.execute(query, params)
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+
+                batch = pa.RecordBatch.from_arrays(
+                    [
+                        pa.array(values, type=field.type)
+                        for values, field in zip(zip(*rows), schema)
+                    ],
+                    schema=schema,
+                )
+                writer.write_batch(batch)
+
+                rows_count += batch.num_rows
+                batch_min_max = pc.call_function(
+                    "min_max", [batch.column(time_column_index)]
+                )
+                batch_min_time = _to_datetime(batch_min_max["min"].as_py())
+                batch_max_time = _to_datetime(batch_min_max["max"].as_py())
+                if batch_min_time is not None and batch_max_time is not None:
+                    min_time = min(min_time or batch_min_time, batch_min_time)
+                    max_time = max(max_time or batch_max_time, batch_max_time)
+    except BaseException:
+        writer.close()
+        temp_file.unlink()
+        raise
+
+    writer.close()
+    temp_file.replace(file)
+
+    entry = ManifestEntry(
+        path=relative_path,
+        table=table.key,
+        format=archive_format,
+        compression=compression,
+        source=source.name,
+        rows_count=rows_count,
+        size_bytes=file.stat().st_size,
+        min_time=min_time,
+        max_time=max_time,
+        create_time=datetime.now(),
+    )
+
+    manifest = Manifest.load(directory)
+    replaced_entries = manifest.add_entry(entry)
+    manifest.save(directory)
+
+    # 以其它格式重新导出时，删除旧文件
+    for replaced_entry in replaced_entries:
+        if replaced_entry.path != entry.path:
+            (directory / replaced_entry.path).unlink(missing_ok=True)
+
+    return entry
+
+
+async def main() -> None:
+    parser = ArgumentParser(description="JFetcher 历史数据归档")
+    parser.add_argument("table", choices=list(ARCHIVE_TABLES), help="要导出的表")
+    parser.add_argument("--partition", help="要导出的分区名称")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="开始时间（包含）")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="结束时间（不包含）")
+    parser.add_argument("--format", choices=("parquet", "arrow"), default="parquet")
+    parser.add_argument("--compression", help="压缩算法，默认根据格式选择")
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument("--output", type=Path, default=Path("archives"))
+    args = parser.parse_args()
+
+    if not args.partition and not (args.start and args.end):
+        parser.error("必须指定 --partition 或 --start 与 --end")
+
+    try:
+        entry = await export(
+            ARCHIVE_TABLES[args.table],
+            directory=args.output,
+            partition=args.partition,
+            start_time=args.start,
+            end_time=args.end,
+            archive_format=args.format,
+            compression=args.compression,
+            batch_size=args.batch_size,
+        )
+    finally:
+        await close_pools()
+    print(
+        f"已导出 {entry.rows_count} 条数据至 {args.output / entry.path}"
+        f"（{entry.size_bytes / 1024 / 1024:.2f} MiB）"
+    )
+
+
+if __name__ == "__main__":
+    run(main())
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+from typing import Literal
+
+from msgspec import Struct, field
+from msgspec.json import Decoder, encode
+from msgspec.json import format as format_json
+
+ArchiveFormatType = Literal["parquet", "arrow"]
+
+MANIFEST_FILE_NAME = "manifest.json"
+
+
+class ManifestEntry(Struct, frozen=True):
+    # 相对于归档目录的路径
+    path: str
+    table: str
+    format: ArchiveFormatType
+    compression: str
+    # 导出来源，分区名称或时间范围
+    source: str
+    rows_count: int
+    size_bytes: int
+    # 数据中时间列的最小值与最大值，无数据时为 None
+    min_time: datetime | None
+    max_time: datetime | None
+    create_time: datetime
+
+
+class Manifest(Struct):
+    entries: list[ManifestEntry] = field(default_factory=list)
+
+    @classmethod
+    def load(cls, directory: Path, /) -> Manifest:
+        file = directory / MANIFEST_FILE_NAME
+        if not file.exists():
+            return cls()
+
+        return _MANIFEST_DECODER.decode(file.read_bytes())
+
+    def save(self, directory: Path, /) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+
+        temp_file = directory / f"{MANIFEST_FILE_NAME}.tmp"
+        temp_file.write_bytes(format_json(encode(self)))
+        temp_file.replace(directory / MANIFEST_FILE_NAME)
+
+    def add_entry(self, entry: ManifestEntry, /) -> list[ManifestEntry]:
+        """添加条目，返回被替换的同一导出来源的条目。"""
+        replaced_entries = [
+            x
+            for x in self.entries
+            if x.table == entry.table and x.source == entry.source
+        ]
+        self.entries = [x for x in self.entries if x not in replaced_entries]
+        self.entries.append(entry)
+        self.entries.sort(key=lambda x: (x.table, x.path))
+
+        return replaced_entries
+
+    def get_entries(
+        self,
+        table: str,
+        /,
+        *,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+    ) -> list[ManifestEntry]:
+        """获取数据时间范围与 [start_time, end_time) 有交集的条目。"""
+        return [
+            entry
+            for entry in self.entries
+            if entry.table == table
+            and entry.min_time is not None
+            and entry.max_time is not None
+            and (start_time is None or entry.max_time >= start_time)
+            and (end_time is None or entry.min_time < end_time)
+        ]
+
+
+_MANIFEST_DECODER = Decoder(Manifest)
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from archive.manifest import Manifest, ManifestEntry
+from archive.tables import ARCHIVE_TABLES, ArchiveTable
+
+
+class ArchiveReader:
+    """读取归档文件。
+
+    根据清单中记录的数据时间范围跳过无关文件，并以内存映射方式读取，
+    不会将整个文件复制到内存中。
+    """
+
+    def __init__(self, directory: Path, /) -> None:
+        self.directory = directory
+        self.manifest = Manifest.load(directory)
+
+    def _get_filter(
+        self,
+        table: ArchiveTable,
+        /,
+        *,
+        start_time: datetime | None,
+        end_time: datetime | None,
+    ) -> pc.Expression | None:
+        time_type = table.schema.field(table.time_column).type
+
+        conditions: list[pc.Expression] = []
+        if start_time is not None:
+            conditions.append(
+                pc.field(table.time_column) >= pa.scalar(start_time).cast(time_type)
+            )
+        if end_time is not None:
+            conditions.append(
+                pc.field(table.time_column) < pa.scalar(end_time).cast(time_type)
+            )
+        if not conditions:
+            return None
+
+        expression = conditions[0]
+        for condition in conditions[1:]:
+            expression &= condition
+
+        return expression
+
+    def _read_entry(
+        self,
+        entry: ManifestEntry,
+        /,
+        *,
+        columns: list[str] | None,
+        expression: pc.Expression | None,
+    ) -> pa.Table:
+        file = self.directory / entry.path
+
+        if entry.format == "parquet":
+            return pq.read_table(
+                file, columns=columns, filters=expression, memory_map=True
+            )
+
+        with pa.memory_map(str(file)) as source:
+            data = pa.ipc.open_file(source).read_all()
+        if expression is not None:
+            data = data.filter(expression)
+        if columns is not None:
+            data = data.select(columns)
+
+        return data
+
+    def get_entries(
+        self,
+        table: str,
+        /,
+        *,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+    ) -> list[ManifestEntry]:
+        return self.manifest.get_entries(
+            table, start_time=start_time, end_time=end_time
+        )
+
+    def read(
+        self,
+        table: str,
+        /,
+        *,
+        columns: list[str] | None = None,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+    ) -> pa.Table:
+        """读取 [start_time, end_time) 范围内的数据。
+
+        table 为 ARCHIVE_TABLES 中的键，如 jpep.ftn_market_records。
+        """
+        archive_table = ARCHIVE_TABLES[table]
+        expression = self._get_filter(
+            archive_table, start_time=start_time, end_time=end_time
+        )
+
+        result = [
+            self._read_entry(entry, columns=columns, expression=expression)
+            for entry in self.get_entries(
+                table, start_time=start_time, end_time=end_time
+            )
+        ]
+        if not result:
+            schema = archive_table.schema
+            if columns is not None:
+                schema = pa.schema([schema.field(name) for name in columns])
+            return schema.empty_table()
+
+        return pa.concat_tables(result)
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from typing import Literal
+
+import pyarrow as pa
+from msgspec import Struct
+from typing_extensions import LiteralString
+
+# 与 utils.db.PoolNameType 一致，读取归档时不依赖 config.toml，因此不从 utils.db 导入
+DatabaseType = Literal["jianshu", "jpep", "beijiaoyi"]
+
+
+class ArchiveColumn(Struct, frozen=True):
+    name: str
+    type: pa.DataType
+    # 查询时使用的表达式，为空时直接使用列名
+    expr: LiteralString = ""
+
+
+class ArchiveTable(Struct, frozen=True):
+    database: DatabaseType
+    table: str
+    # 用于按时间范围导出与读取的列，date 类型会转换为当天零点
+    time_column: str
+    columns: tuple[ArchiveColumn, ...]
+
+    @property
+    def key(self) -> str:
+        return f"{self.database}.{self.table}"
+
+    @property
+    def schema(self) -> pa.Schema:
+        return pa.schema([(column.name, column.type) for column in self.columns])
+
+
+ARCHIVE_TABLES: dict[str, ArchiveTable] = {
+    table.key: table
+    for table in (
+        ArchiveTable(
+            database="jpep",
+            table="ftn_market_records",
+            time_column="fetch_time",
+            columns=(
+                ArchiveColumn("fetch_time", pa.timestamp("us")),
+                ArchiveColumn("id", pa.int32()),
+                ArchiveColumn("price", pa.float64(), "price::DOUBLE PRECISION"),
+                ArchiveColumn("total_amount", pa.int32()),
+                ArchiveColumn("traded_amount", pa.int32()),
+                ArchiveColumn("remaining_amount", pa.int32()),
+                ArchiveColumn("minimum_trade_amount", pa.int32()),
+                ArchiveColumn("completed_trades_count", pa.int16()),
+            ),
+        ),
+        ArchiveTable(
+            database="beijiaoyi",
+            table="ftn_market_records",
+            time_column="fetch_time",
+            columns=(
+                ArchiveColumn("fetch_time", pa.timestamp("us")),
+                ArchiveColumn("id", pa.int64()),
+                ArchiveColumn("price", pa.float64(), "price::DOUBLE PRECISION"),
+                ArchiveColumn("total_amount", pa.int32()),
+                ArchiveColumn("traded_amount", pa.int32()),
+                ArchiveColumn("remaining_amount", pa.int32()),
+                ArchiveColumn("minimum_trade_amount", pa.int32()),
+                ArchiveColumn("maximum_trade_amount", pa.int32()),
+                ArchiveColumn("completed_trades_count", pa.int16()),
+            ),
+        ),
+        ArchiveTable(
+            database="jianshu",
+            table="user_assets_ranking_records",
+            time_column="date",
+            columns=(
+                ArchiveColumn("date", pa.date32()),
+                ArchiveColumn("ranking", pa.int16()),
+                ArchiveColumn("slug", pa.string()),
+                ArchiveColumn("fp", pa.float64(), "fp::DOUBLE PRECISION"),
+                ArchiveColumn("ftn", pa.float64(), "ftn::DOUBLE PRECISION"),
+                ArchiveColumn("assets", pa.float64(), "assets::DOUBLE PRECISION"),
+            ),
+        ),
+    )
+}
@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+from asyncio import sleep
+from typing import Any
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, Response
+from starlette.routing import Route
+
+PAGE_SIZE = 20
+
+AVATAR_URL = "https://upload.jianshu.io/users/upload_avatars/1/avatar.png"
+
+# 模拟服务不校验凭证，此 Token 仅需通过 JKit 的格式与过期时间检查
+# 载荷为 {"iat": 1700000000,"exp":4102444800}
+BEIJIAOYI_TOKEN = "benchmark.eyJpYXQiOiAxNzAwMDAwMDAwLCJleHAiOjQxMDI0NDQ4MDB9.benchmark"  # noqa: S105
+
+
+def get_slug(index: int, /) -> str:
+    return f"{index:012x}"
+
+
+def get_index(slug: str, /) -> int:
+    return int(slug, 16)
+
+
+def get_user_data(index: int, /) -> dict[str, Any]:
+    return {
+        "id": index,
+        "slug": get_slug(index),
+        "nickname": f"user{index}",
+        "avatar": AVATAR_URL,
+    }
+
+
+class FakeServer:
+    """模拟简书、简书积分兑换平台与贝交易平台的 HTTP 服务。
+
+    数据按请求参数即时生成，size 控制排行榜与订单簿的条目数，
+    latency 控制每个请求的响应延迟（秒）。
+    """
+
+    def __init__(self, *, size: int, latency: float, total_users_count: int) -> None:
+        self.size = size
+        self.latency = latency
+        self.total_users_count = total_users_count
+
+        self.requests_count = 0
+
+        self.app = Starlette(
+            routes=[
+                Route("/asimov/fp_rankings", self.user_assets_ranking),
+                Route("/asimov/fp_rankings/voter_users", self.user_earning_ranking),
+                Route("/asimov/fp_rankings/voter_notes", self.article_earning_ranking),
+                Route(
+                    "/asimov/daily_activity_participants/rank",
+                    self.daily_update_ranking,
+                ),
+                Route("/asimov/users/slug/{slug}", self.user_info),
+                Route("/asimov/p/{slug}", self.article_info),
+                Route("/u/{slug}", self.user_page),
+                Route("/getList/furnish.bei/", self.jpep_ftn_market, methods=["POST"]),
+                Route(
+                    "/jsb_product/{name}", self.beijiaoyi_ftn_market, methods=["POST"]
+                ),
+            ]
+        )
+
+    async def _wait(self) -> None:
+        self.requests_count += 1
+        if self.latency:
+            await sleep(self.latency)
+
+    async def user_assets_ranking(self, request: Request) -> Response:
+        await self._wait()
+
+        since_id = int(request.query_params["since_id"])
+        end = min(since_id + PAGE_SIZE, self.total_users_count)
+
+        return JSONResponse(
+            {
+                "rankings": [
+                    {
+                        "ranking": ranking,
+                        "amount": ranking * 1000,
+                        "user": get_user_data(ranking),
+                    }
+                    for ranking in range(since_id + 1, end + 1)
+                ]
+            }
+        )
+
+    async def user_earning_ranking(self, _: Request) -> Response:
+        await self._wait()
+
+        return JSONResponse(
+            {
+                "fp": self.size * 3000,
+                "author_fp": self.size * 2000,
+                "voter_fp": self.size * 1000,
+                "users": [
+                    {
+                        **get_user_data(index),
+                        "fp": (self.size - index + 1) * 3000,
+                        "author_fp": (self.size - index + 1) * 2000,
+                        "voter_fp": (self.size - index + 1) * 1000,
+                    }
+                    for index in range(1, self.size + 1)
+                ],
+            }
+        )
+
+    async def article_earning_ranking(self, _: Request) -> Response:
+        await self._wait()
+
+        return JSONResponse(
+            {
+                "fp": self.size * 3000,
+                "author_fp": self.size * 2000,
+                "voter_fp": self.size * 1000,
+                "notes": [
+                    {
+                        "title": f"article{index}",
+                        "slug": get_slug(index),
+                        "fp": (self.size - index + 1) * 3000,
+                        "author_fp": (self.size - index + 1) * 2000,
+                        "voter_fp": (self.size - index + 1) * 1000,
+                        "author_nickname": f"user{index}",
+                        "author_avatar": AVATAR_URL,
+                    }
+                    for index in range(1, self.size + 1)
+                ],
+            }
+        )
+
+    async def daily_update_ranking(self, _: Request) -> Response:
+        await self._wait()
+
+        return JSONResponse(
+            {
+                "daps": [
+                    {
+                        "rank": index,
+                        "checkin_count": self.size - index + 1,
+                        "slug": get_slug(index),
+                        "nickname": f"user{index}",
+                        "avatar": AVATAR_URL,
+                    }
+                    for index in range(1, self.size + 1)
+                ]
+            }
+        )
+
+    async def user_info(self, request: Request) -> Response:
+        await self._wait()
+
+        index = get_index(request.path_params["slug"])
+
+        return JSONResponse(
+            {
+                **get_user_data(index),
+                "gender": 0,
+                "intro": "",
+                "last_updated_at": 1700000000,
+                "badges": [],
+                "member": {"type": "gold", "expires_at": 1900000000},
+                "user_ip_addr": "上海",
+                "following_users_count": 0,
+                "followers_count": 0,
+                "total_wordage": 0,
+                "total_likes_count": 0,
+                "jsd_balance": index * 1000,
+            }
+        )
+
+    async def user_page(self, request: Request) -> Response:
+        await self._wait()
+
+        index = get_index(request.path_params["slug"])
+
+        return HTMLResponse(f"<div>收获喜欢</div><p>{index * 2}</p><div>总资产</div>")
+
+    async def article_info(self, request: Request) -> Response:
+        await self._wait()
+
+        index = get_index(request.path_params["slug"])
+
+        return JSONResponse(
+            {
+                "id": index,
+                "slug": get_slug(index),
+                "notebook_id": 100000,
+                "public_title": f"article{index}",
+                "description": "",
+                "wordage": 0,
+                "first_shared_at": 1700000000,
+                "last_updated_at": 1700000000,
+                "commentable": True,
+                "reprintable": True,
+                "paid_type": "free",
+                "user": {
+                    **get_user_data(index),
+                    "intro": "",
+                    "user_ip_addr": "上海",
+                    "wordage": 0,
+                    "likes_count": 0,
+                },
+                "free_content": "<p>content</p>",
+                "likes_count": 0,
+                "public_comment_count": 0,
+                "featured_comments_count": 0,
+                "total_fp_amount": 0,
+            }
+        )
+
+    async def jpep_ftn_market(self, request: Request) -> Response:
+        await self._wait()
+
+        page = int(request.query_params["page"])
+        start = (page - 1) * PAGE_SIZE + 1
+        end = min(page * PAGE_SIZE, self.size)
+
+        return JSONResponse(
+            {
+                "data": [
+                    {
+                        "id": index,
+                        "price": round(0.1 + index / 10000, 4),
+                        "totalNum": 1000,
+                        "tradeNum": 100,
+                        "tradable": 900,
+                        "minNum": 10,
+                        "tradeCount": 1,
+                        "pub_date": "2024-01-01T00:00:00",
+                        "member.user": [
+                            {
+                                # 每个用户发布两个订单
+                                "id": index // 2 + 1,
+                                "username": f"user{index // 2 + 1}",
+                                "username_md5": f"{index // 2 + 1:09x}",
+                                "avatarUrl": "",
+                                "credit": index % 100,
+                                "pay_types": "1|2",
+                            }
+                        ],
+                    }
+                    for index in range(start, end + 1)
+                ]
+            }
+        )
+
+    async def beijiaoyi_ftn_market(self, request: Request) -> Response:
+        await self._wait()
+
+        body = await request.json()
+        page, rows = body["page"], body["rows"]
+        start = (page - 1) * rows + 1
+        end = min(page * rows, self.size)
+
+        return JSONResponse(
+            {
+                "data": [
+                    {
+                        "productId": str(index),
+                        "unitPrice": round(0.1 + index / 10000, 4),
+                        "totalQty": 1000,
+                        "availableQty": 900,
+                        "Limit": 10,
+                        "MaxLimit": 1000,
+                        "tradeQty": 1,
+                        "CreateDate": "2024-01-01T08:00:00",
+                        "isWeXin": True,
+                        "isZfb": True,
+                        "userId": index // 2 + 1,
+                        "userName": f"user{index // 2 + 1}",
+                        "userImage": "avatar.png",
+                    }
+                    for index in range(start, end + 1)
+                ]
+            }
+        )
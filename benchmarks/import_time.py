@@ -0,0 +1,127 @@
+"""导入耗时基准测试。
+
+基于 python -X importtime，在独立进程中分别导入部署入口（main.py）与各 Flow 模块，
+输出导入总耗时与按顶层包汇总的耗时，用于跟踪启动开销。
+
+用法：python -m benchmarks.import_time --repeat 3 --top 10
+"""
+
+from __future__ import annotations
+
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from subprocess import run
+
+from msgspec import Struct
+
+from main import DEPLOYMENTS
+
+
+class ImportRecord(Struct, frozen=True):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+class ImportTimeResult(Struct, frozen=True):
+    module: str
+    records: list[ImportRecord]
+
+    @property
+    def total_us(self) -> int:
+        return sum(x.cumulative_us for x in self.records if x.depth == 0)
+
+    def get_packages_self_us(self) -> dict[str, int]:
+        """按顶层包汇总各模块自身的导入耗时。"""
+        result: dict[str, int] = {}
+        for record in self.records:
+            package = record.module.split(".")[0]
+            result[package] = result.get(package, 0) + record.self_us
+
+        return dict(sorted(result.items(), key=lambda x: x[1], reverse=True))
+
+
+def get_flow_modules() -> list[str]:
+    """从部署入口点中获取 Flow 模块名称。"""
+    modules: list[str] = []
+    for deployment in DEPLOYMENTS:
+        if not deployment.entrypoint:
+            continue
+
+        path = deployment.entrypoint.split(":")[0]
+        module = ".".join(Path(path).with_suffix("").parts)
+        if module not in modules:
+            modules.append(module)
+
+    return modules
+
+
+def parse_importtime_output(output: str, /) -> list[ImportRecord]:
+    records: list[ImportRecord] = []
+    for line in output.splitlines():
+        # 格式：import time:  self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        indent = len(name) - len(name.lstrip())
+        records.append(
+            ImportRecord(
+                module=name.strip(),
+                self_us=int(self_us),
+                cumulative_us=int(cumulative_us),
+                # 顶层模块前有一个空格，每深入一层增加两个空格
+                depth=(indent - 1) // 2,
+            )
+        )
+
+    return records
+
+
+def measure_import_time(module: str, /) -> ImportTimeResult:
+    process = run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败：\n{process.stderr}")
+
+    return ImportTimeResult(
+        module=module, records=parse_importtime_output(process.stderr)
+    )
+
+
+def print_result(result: ImportTimeResult, /, *, top: int) -> None:
+    print(f"[{result.module}]")
+    print(f"  total: {result.total_us / 1000:.1f}ms")
+    for package, self_us in list(result.get_packages_self_us().items())[:top]:
+        print(f"  {self_us / 1000:>9.1f}ms  {package}")
+
+
+def main() -> None:
+    parser = ArgumentParser(description="JFetcher 导入耗时基准测试")
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="重复次数，取总耗时最低的一次"
+    )
+    parser.add_argument("--top", type=int, default=10, help="显示耗时最高的包数量")
+    parser.add_argument(
+        "modules", nargs="*", help="要测试的模块，默认测试 main 与全部 Flow 模块"
+    )
+    args = parser.parse_args()
+
+    modules: list[str] = args.modules or ["main", *get_flow_modules()]
+    for module in modules:
+        # 首次运行时会生成字节码缓存，取多次运行中的最小值以减少干扰
+        result = min(
+            (measure_import_time(module) for _ in range(args.repeat)),
+            key=lambda x: x.total_us,
+        )
+        print_result(result, top=args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""离线基准测试。
+
+启动模拟数据源 HTTP 服务，在本地 PostgreSQL 上依次运行 flows 目录下的采集任务，
+输出吞吐量、单条数据处理延迟与数据库语句数量。
+
+数据库连接信息读取自 config.toml，请务必使用专门用于测试的空数据库。
+
+用法：python -m benchmarks.run --size 1000 --latency 0.01
+"""
+
+from __future__ import annotations
+
+import logging
+import sys
+from argparse import ArgumentParser
+from asyncio import create_task, run, sleep
+from collections import Counter
+from collections.abc import AsyncGenerator, Awaitable
+from functools import partial
+from importlib import import_module
+from time import perf_counter
+from types import ModuleType
+from typing import Any, Callable
+
+from jkit.config import CONFIG as JKIT_CONFIG
+from msgspec import Struct
+from msgspec.structs import replace
+from prefect import Task
+from psycopg import AsyncCursor
+from uvicorn import Config, Server
+
+from benchmarks.fake_server import BEIJIAOYI_TOKEN, FakeServer, get_slug
+from utils.rate_limiter import apply_rate_limiters
+
+
+class BenchmarkFlow(Struct, frozen=True):
+    module: str
+    flow: str
+    # 被测量的数据迭代任务，为 None 时仅统计总耗时
+    iter_task: str | None
+    parameters: dict[str, Any]
+
+
+FLOWS: dict[str, BenchmarkFlow] = {
+    "jianshu_article_earning_ranking": BenchmarkFlow(
+        module="flows.jianshu.fetch_article_earning_ranking_data",
+        flow="jianshu_fetch_article_earning_ranking_data",
+        iter_task="iter_article_earning_ranking",
+        parameters={},
+    ),
+    "jianshu_core_user_assets": BenchmarkFlow(
+        module="flows.jianshu.fetch_core_user_assets_data",
+        flow="jianshu_fetch_core_user_assets_data",
+        iter_task="iter_core_users",
+        parameters={},
+    ),
+    "jianshu_daily_update_ranking": BenchmarkFlow(
+        module="flows.jianshu.fetch_daily_update_ranking_data",
+        flow="jianshu_fetch_daily_update_ranking_data",
+        iter_task="iter_daily_update_ranking",
+        parameters={},
+    ),
+    "jianshu_user_assets_ranking": BenchmarkFlow(
+        module="flows.jianshu.fetch_user_assets_ranking_data",
+        flow="jianshu_fetch_user_assets_ranking_data",
+        iter_task="iter_user_assets_ranking",
+        parameters={},
+    ),
+    "jianshu_user_earning_ranking": BenchmarkFlow(
+        module="flows.jianshu.fetch_user_earning_ranking_data",
+        flow="jianshu_fetch_user_earning_ranking_data",
+        iter_task="iter_user_earning_ranking",
+        parameters={"type": "ALL"},
+    ),
+    "jianshu_user_earning_ranking_all_types": BenchmarkFlow(
+        module="flows.jianshu.fetch_user_earning_ranking_data",
+        flow="jianshu_fetch_user_earning_ranking_data_all_types",
+        iter_task="iter_user_earning_ranking",
+        parameters={},
+    ),
+    "jianshu_users_count": BenchmarkFlow(
+        module="flows.jianshu.fetch_users_count_data",
+        flow="jianshu_fetch_users_count_data",
+        iter_task=None,
+        parameters={},
+    ),
+    # 先创建简书贝市场记录分区，否则无法写入市场记录
+    "jpep_manage_ftn_market_records_partitions": BenchmarkFlow(
+        module="flows.jpep.manage_ftn_market_records_partitions",
+        flow="jpep_manage_ftn_market_records_partitions",
+        iter_task=None,
+        parameters={},
+    ),
+    "jpep_ftn_market_orders": BenchmarkFlow(
+        module="flows.jpep.fetch_ftn_market_orders_data",
+        flow="jpep_fetch_ftn_market_orders_data",
+        iter_task="iter_ftn_market_orders",
+        parameters={"type": "BUY"},
+    ),
+    "beijiaoyi_manage_ftn_market_records_partitions": BenchmarkFlow(
+        module="flows.beijiaoyi.manage_ftn_market_records_partitions",
+        flow="beijiaoyi_manage_ftn_market_records_partitions",
+        iter_task=None,
+        parameters={},
+    ),
+    "beijiaoyi_ftn_market_orders": BenchmarkFlow(
+        module="flows.beijiaoyi.fetch_ftn_market_orders_data",
+        flow="beijiaoyi_fetch_ftn_market_orders_data",
+        iter_task="iter_ftn_market_orders",
+        parameters={"type": "BUY"},
+    ),
+}
+
+
+class BenchmarkResult(Struct):
+    name: str
+    duration: float
+    items_count: int
+    item_latencies: list[float]
+    requests_count: int
+    statements_count: Counter[str]
+    error: str | None = None
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items_count / self.duration if self.duration else 0
+
+    def get_latency_percentile(self, percentile: float, /) -> float:
+        if not self.item_latencies:
+            return 0
+
+        latencies = sorted(self.item_latencies)
+        return latencies[min(int(len(latencies) * percentile), len(latencies) - 1)]
+
+
+class StatementsCounter:
+    """统计客户端发出的数据库语句数量。"""
+
+    def __init__(self) -> None:
+        self.counter: Counter[str] = Counter()
+
+    def install(self) -> None:
+        counter = self.counter
+
+        original_execute = AsyncCursor.execute
+        original_executemany = AsyncCursor.executemany
+        original_copy = AsyncCursor.copy
+
+        async def execute(self: AsyncCursor, *args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+            counter["execute"] += 1
+            return await original_execute(self, *args, **kwargs)
+
+        async def executemany(self: AsyncCursor, *args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+            counter["executemany"] += 1
+            return await original_executemany(self, *args, **kwargs)
+
+        def copy(self: AsyncCursor, *args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+            counter["copy"] += 1
+            return original_copy(self, *args, **kwargs)
+
+        AsyncCursor.execute = execute  # type: ignore
+        AsyncCursor.executemany = executemany  # type: ignore
+        AsyncCursor.copy = copy  # type: ignore
+
+
+def unwrap_prefect(module: ModuleType, /) -> None:
+    """将模块中的 Prefect Task 替换为原始函数，避免测量编排框架的开销。"""
+    for name, value in vars(module).items():
+        if isinstance(value, Task):
+            setattr(module, name, value.fn)
+
+    # Flow 使用的公共模块（如 utils.partition）中也可能获取 Prefect 日志记录器
+    for logger_module in (
+        module,
+        *(x for name, x in sys.modules.items() if name.startswith("utils.")),
+    ):
+        if hasattr(logger_module, "get_run_logger"):
+            logger_module.get_run_logger = partial(  # type: ignore
+                logging.getLogger, logger_module.__name__
+            )
+
+
+def measure_iter_task(
+    func: Callable[..., AsyncGenerator[Any]], /, *, latencies: list[float]
+) -> Callable[..., AsyncGenerator[Any]]:
+    """记录每条数据从产出到下一条数据被请求之间的耗时，即 Flow 处理单条数据的延迟。"""
+
+    async def wrapper(*args: Any, **kwargs: Any) -> AsyncGenerator[Any]:  # noqa: ANN401
+        async for item in func(*args, **kwargs):
+            start_time = perf_counter()
+            yield item
+            latencies.append(perf_counter() - start_time)
+
+    return wrapper
+
+
+async def run_benchmark(
+    name: str,
+    benchmark_flow: BenchmarkFlow,
+    /,
+    *,
+    server: FakeServer,
+    statements_counter: StatementsCounter,
+) -> BenchmarkResult:
+    module = import_module(benchmark_flow.module)
+    unwrap_prefect(module)
+
+    if name == "jianshu_core_user_assets":
+        module.CONFIG = replace(  # type: ignore
+            module.CONFIG,
+            core_user_slugs={get_slug(index) for index in range(1, server.size + 1)},
+        )
+    if name == "beijiaoyi_ftn_market_orders":
+        module.CONFIG = replace(  # type: ignore
+            module.CONFIG, beijiaoyi_token=BEIJIAOYI_TOKEN
+        )
+    if name == "jianshu_user_assets_ranking":
+        benchmark_flow = replace(
+            benchmark_flow,
+            parameters={**benchmark_flow.parameters, "total_count": server.size},
+        )
+
+    latencies: list[float] = []
+    if benchmark_flow.iter_task:
+        setattr(
+            module,
+            benchmark_flow.iter_task,
+            measure_iter_task(
+                getattr(module, benchmark_flow.iter_task), latencies=latencies
+            ),
+        )
+
+    flow_func: Callable[..., Awaitable[None]] = getattr(module, benchmark_flow.flow).fn
+
+    server.requests_count = 0
+    statements_counter.counter.clear()
+    error = None
+    start_time = perf_counter()
+    try:
+        await flow_func(**benchmark_flow.parameters)
+    except Exception as e:  # noqa: BLE001
+        error = repr(e)
+    duration = perf_counter() - start_time
+
+    return BenchmarkResult(
+        name=name,
+        duration=duration,
+        # 最后一条数据处理完成后迭代结束，数量与延迟记录数一致
+        items_count=len(latencies),
+        item_latencies=latencies,
+        requests_count=server.requests_count,
+        statements_count=statements_counter.counter.copy(),
+        error=error,
+    )
+
+
+def print_result(result: BenchmarkResult, /) -> None:
+    print(f"[{result.name}]")
+    if result.error:
+        print(f"  error: {result.error}")
+    print(
+        f"  duration: {result.duration:.3f}s items: {result.items_count} "
+        f"items/s: {result.items_per_second:.1f}"
+    )
+    print(
+        f"  item latency p50: {result.get_latency_percentile(0.5) * 1000:.2f}ms "
+        f"p99: {result.get_latency_percentile(0.99) * 1000:.2f}ms"
+    )
+    print(
+        f"  http requests: {result.requests_count} db statements: "
+        f"{sum(result.statements_count.values())} {dict(result.statements_count)}"
+    )
+
+
+async def main() -> None:
+    parser = ArgumentParser(description="JFetcher 离线基准测试")
+    parser.add_argument("--size", type=int, default=1000, help="排行榜与订单簿条目数")
+    parser.add_argument("--latency", type=float, default=0, help="模拟响应延迟（秒）")
+    parser.add_argument(
+        "--total-users-count", type=int, default=18280000, help="模拟用户总数"
+    )
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument(
+        "--rate-limit", action="store_true", help="启用数据源限流器，默认关闭"
+    )
+    parser.add_argument("flows", nargs="*", help="要运行的 Flow，默认运行全部")
+    args = parser.parse_args()
+
+    flows: list[str] = args.flows or list(FLOWS)
+    for name in flows:
+        if name not in FLOWS:
+            parser.error(f"未知的 Flow {name}，可选值：{', '.join(FLOWS)}")
+
+    logging.basicConfig(level=logging.WARNING)
+
+    server = FakeServer(
+        size=args.size,
+        latency=args.latency,
+        total_users_count=args.total_users_count,
+    )
+    uvicorn_server = Server(
+        Config(server.app, host="127.0.0.1", port=args.port, log_level="warning")
+    )
+    server_task = create_task(uvicorn_server.serve())
+    while not uvicorn_server.started:  # noqa: ASYNC110
+        await sleep(0.01)
+
+    # 导入 Flow 时会设置数据源配置，需先导入再指向模拟服务
+    for name in flows:
+        import_module(FLOWS[name].module)
+    endpoint = f"http://127.0.0.1:{args.port}"
+    JKIT_CONFIG.datasources.jianshu.endpoint = endpoint
+    JKIT_CONFIG.datasources.jpep.endpoint = endpoint
+    JKIT_CONFIG.datasources.beijiaoyi.endpoint = endpoint
+    # 修改数据源配置会重建 HTTP 客户端，限流器需重新启用
+    if args.rate_limit:
+        apply_rate_limiters()
+
+    statements_counter = StatementsCounter()
+    statements_counter.install()
+
+    try:
+        for name in flows:
+            print_result(
+                await run_benchmark(
+                    name,
+                    FLOWS[name],
+                    server=server,
+                    statements_counter=statements_counter,
+                )
+            )
+    finally:
+        uvicorn_server.should_exit = True
+        await server_task
+
+
+if __name__ == "__main__":
+    run(main())
@@ -6,12 +6,17 @@ from jkit.credentials import BeijiaoyiCredential
 from prefect import flow, get_run_logger, task
 
 from models.beijiaoyi.ftn_market_record import FtnMarketRecord
-from models.beijiaoyi.ftn_market_summary_record import FtnMarketSummaryRecord
+from models.beijiaoyi.ftn_market_snapshot import FtnMarketSnapshot
 from models.beijiaoyi.ftn_order import FtnOrder, FtnOrdersType
 from models.beijiaoyi.user import User
 from utils.config import CONFIG
+from utils.db import beijiaoyi_pool, use_pools
 from utils.exceptions import MissingCredentialError
+from utils.instrumentation import collect_metrics, instrumented_iter
 from utils.prefect_helper import get_flow_run_name, get_task_run_name
+from utils.rate_limiter import apply_rate_limiters
+
+apply_rate_limiters()
 
 
 def get_fetch_time() -> datetime:
@@ -40,51 +45,19 @@ async def iter_ftn_market_orders(
     *,
     type: FtnOrdersType,
 ) -> AsyncGenerator[OrderData]:
-    async for item in FtnMarket(
-        credential=BeijiaoyiCredential.from_bearer_token(CONFIG.beijiaoyi_token)
-    ).iter_orders(type=type):
+    async for item in instrumented_iter(
+        "beijiaoyi.iter_ftn_market_orders",
+        FtnMarket(
+            credential=BeijiaoyiCredential.from_bearer_token(CONFIG.beijiaoyi_token)
+        ).iter_orders(type=type),
+    ):
         yield item
 
 
-async def save_user_data(item: OrderData, /) -> None:
-    user = await User.get_by_id(item.publisher_info.id)
-    if not user:
-        await User.create(
-            id=item.publisher_info.id,
-            name=item.publisher_info.name,
-            avatar_url=item.publisher_info.avatar_url,
-        )
-    else:
-        await User.update_by_id(
-            id=item.publisher_info.id,
-            name=item.publisher_info.name,
-            avatar_url=item.publisher_info.avatar_url,
-        )
-
-
-async def save_ftn_order_data(
-    item: OrderData, /, *, type: FtnOrdersType, fetch_time: datetime
-) -> None:
-    ftn_order = await FtnOrder.get_by_id(item.id)
-    if not ftn_order:
-        await FtnOrder.create(
-            id=item.id,
-            type=type,
-            publisher_id=item.publisher_info.id,
-            publish_time=item.publish_time,
-            last_seen_time=fetch_time,
-        )
-    else:
-        await FtnOrder.update_by_id(
-            id=item.id,
-            last_seen_time=fetch_time,
-        )
-
-
-async def save_ftn_market_record_data(
+def get_ftn_market_record(
     item: OrderData, /, *, fetch_time: datetime
-) -> None:
-    await FtnMarketRecord.create(
+) -> FtnMarketRecord:
+    return FtnMarketRecord(
         fetch_time=fetch_time,
         id=item.id,
         price=item.price,
@@ -97,18 +70,56 @@ async def save_ftn_market_record_data(
     )
 
 
-async def save_ftn_market_summary_record_data(
-    *, type: FtnOrdersType, fetch_time: datetime
-) -> None:
+async def save_ftn_market_snapshot_data(snapshot: FtnMarketSnapshot, /) -> None:
     logger = get_run_logger()
 
-    if not await FtnMarketRecord.exists_by_fetch_time(fetch_time):
+    if not snapshot.ftn_market_records:
         logger.warning("无简书贝市场记录数据，跳过摘要数据写入")
+
+    save_result = await snapshot.save()
+    if save_result == "DROPPED":
+        logger.error(
+            "数据库不可用且本地缓冲区已满，已丢弃简书贝市场快照数据 fetch_time=%s "
+            "records_count=%s",
+            snapshot.fetch_time,
+            len(snapshot.ftn_market_records),
+        )
+        return
+    if save_result == "SPOOLED":
+        logger.warning(
+            "数据库不可用，简书贝市场快照数据已写入本地缓冲区 fetch_time=%s",
+            snapshot.fetch_time,
+        )
         return
 
-    await FtnMarketSummaryRecord.create_from_ftn_market_records_by_fetch_time_and_type(
-        fetch_time=fetch_time, type=type
+    logger.info(
+        "已保存简书贝订单数据 new_count=%s seen_again_count=%s",
+        snapshot.new_ftn_orders_count,
+        snapshot.seen_again_ftn_orders_count,
     )
+    if snapshot.delta_storage:
+        logger.info(
+            "增量存储模式，写入 %s 条市场记录，跳过 %s 条未变化的市场记录",
+            snapshot.written_ftn_market_records_count,
+            len(snapshot.ftn_market_records)
+            - snapshot.written_ftn_market_records_count,
+        )
+
+    # 数据库可用时，重放此前写入本地缓冲区的数据
+    # 本次快照已写入，重放失败时不影响运行结果，未重放的快照在之后的运行中重放
+    try:
+        replay_result = await FtnMarketSnapshot.replay_spooled()
+    except Exception:
+        logger.exception("重放本地缓冲区中的快照时发生异常")
+        return
+
+    if replay_result.replayed_count:
+        logger.info("已重放 %s 个本地缓冲区中的快照", replay_result.replayed_count)
+    if replay_result.quarantined_count:
+        logger.error(
+            "%s 个本地缓冲区中的快照无法写入，已移入死信目录",
+            replay_result.quarantined_count,
+        )
 
 
 @flow(
@@ -118,30 +129,44 @@ async def save_ftn_market_summary_record_data(
     retry_delay_seconds=10,
     timeout_seconds=20,
 )
-async def beijiaoyi_fetch_ftn_market_orders_data(type: FtnOrdersType) -> None:
+@collect_metrics
+@use_pools(beijiaoyi_pool)
+async def beijiaoyi_fetch_ftn_market_orders_data(
+    type: FtnOrdersType, *, delta_storage: bool = False
+) -> None:
     logger = get_run_logger()
 
     fetch_time = get_fetch_time()
 
     await pre_check()
 
+    snapshot = FtnMarketSnapshot(
+        fetch_time=fetch_time, type=type, delta_storage=delta_storage
+    )
+    update_time = datetime.now()
     async for item in iter_ftn_market_orders(type=type):
-        try:
-            await save_user_data(item)
-        except Exception:
-            logger.exception("保存用户数据时发生未知异常 id=%s", item.id)
-
-        try:
-            await save_ftn_order_data(item, type=type, fetch_time=fetch_time)
-        except Exception:
-            logger.exception("保存简书贝订单数据时发生未知异常 id=%s", item.id)
-
-        try:
-            await save_ftn_market_record_data(item, fetch_time=fetch_time)
-        except Exception:
-            logger.exception("保存简书贝市场记录数据时发生未知异常 id=%s", item.id)
+        snapshot.add_ftn_market_record(
+            get_ftn_market_record(item, fetch_time=fetch_time)
+        )
+        snapshot.add_user(
+            User(
+                id=item.publisher_info.id,
+                update_time=update_time,
+                name=item.publisher_info.name,
+                avatar_url=item.publisher_info.avatar_url,
+            )
+        )
+        snapshot.add_ftn_order(
+            FtnOrder(
+                id=item.id,
+                type=type,
+                publisher_id=item.publisher_info.id,
+                publish_time=item.publish_time,
+                last_seen_time=fetch_time,
+            )
+        )
 
     try:
-        await save_ftn_market_summary_record_data(type=type, fetch_time=fetch_time)
+        await save_ftn_market_snapshot_data(snapshot)
     except Exception:
-        logger.exception("保存简书贝市场摘要数据时发生未知异常")
+        logger.exception("保存简书贝市场快照数据时发生未知异常")
@@ -3,6 +3,7 @@ from __future__ import annotations
 from collections.abc import AsyncGenerator
 from datetime import date, datetime, timedelta
 
+from jkit.article import InfoData as ArticleInfoData
 from jkit.config import CONFIG as JKIT_CONFIG
 from jkit.ranking.article_earning import ArticleEarningRanking, RecordData
 from jkit.user import InfoData as UserInfoData
@@ -11,27 +12,42 @@ from sshared.retry import retry
 
 from models.jianshu.article_earning_ranking_record import ArticleEarningRankingRecord
 from models.jianshu.user import User
+from utils.cache import get_cached_user_info
 from utils.config import CONFIG
+from utils.db import jianshu_pool, use_pools
 from utils.exceptions import DataExistsError
+from utils.instrumentation import collect_metrics, instrumented, instrumented_iter
+from utils.pipeline import Pipeline
 from utils.prefect_helper import get_flow_run_name, get_task_run_name
+from utils.rate_limiter import apply_rate_limiters
 from utils.retry import NETWORK_REQUEST_RETRY_PARAMS
+from utils.write_behind import WriteBehind
 
 TOTAL_DATA_COUNT = 100
 
 JKIT_CONFIG.data_validation.enabled = False
 if CONFIG.jianshu_endpoint:
     JKIT_CONFIG.datasources.jianshu.endpoint = CONFIG.jianshu_endpoint
+apply_rate_limiters()
 
 
 @retry(**NETWORK_REQUEST_RETRY_PARAMS)
-async def get_article_author_info(
+async def get_article_info(
     item: RecordData,
-) -> UserInfoData:
+) -> ArticleInfoData:
     article = item.to_article_obj()
-    article_info = await article.info
+
+    return await article.info
+
+
+@instrumented("jianshu.get_article_author_info")
+async def get_article_author_info(
+    item: RecordData,
+) -> tuple[UserInfoData, datetime]:
+    article_info = await get_article_info(item)
     author = article_info.author_info.to_user_obj()
 
-    return await author.info
+    return await get_cached_user_info(author)
 
 
 @task(task_run_name=get_task_run_name)
@@ -49,42 +65,45 @@ async def pre_check(*, date: date) -> int:
 
 @task(task_run_name=get_task_run_name)
 async def iter_article_earning_ranking(date: date) -> AsyncGenerator[RecordData]:
-    async for item in ArticleEarningRanking(date_=date).iter_records():
+    async for item in instrumented_iter(
+        "jianshu.iter_article_earning_ranking",
+        ArticleEarningRanking(date_=date).iter_records(),
+    ):
         yield item
 
 
-async def save_user_data(*, author_info: UserInfoData) -> None:
-    user = await User.get_by_slug(author_info.slug)
-    if not user:
-        await User.create(
-            slug=author_info.slug,
-            id=author_info.id,
-            name=author_info.name,
-            avatar_url=author_info.avatar_url,
-            membership_type=author_info.membership_info.type,
-            membership_expire_time=author_info.membership_info.expire_time,
-        )
-    else:
-        await User.update_by_slug(
-            slug=author_info.slug,
-            name=author_info.name,
-            avatar_url=author_info.avatar_url,
-            membership_type=author_info.membership_info.type,
-            membership_expire_time=author_info.membership_info.expire_time,
-        )
+async def save_user_data(
+    *, author_info: UserInfoData, author_info_fetch_time: datetime
+) -> None:
+    await User.upsert(
+        slug=author_info.slug,
+        update_time=author_info_fetch_time,
+        id=author_info.id,
+        name=author_info.name,
+        avatar_url=author_info.avatar_url,
+        membership_type=author_info.membership_info.type,
+        membership_expire_time=author_info.membership_info.expire_time,
+    )
 
 
 async def save_article_earning_ranking_record_data(
-    item: RecordData, /, *, date: date, author_info: UserInfoData | None
+    item: RecordData,
+    /,
+    *,
+    date: date,
+    author_info: UserInfoData | None,
+    writer: WriteBehind,
 ) -> None:
-    await ArticleEarningRankingRecord.create(
-        date=date,
-        ranking=item.ranking,
-        slug=item.slug,
-        title=item.title,
-        author_slug=author_info.slug if author_info else None,
-        author_earning=item.fp_to_author_amount,
-        voter_earning=item.fp_to_voter_amount,
+    await writer.add(
+        ArticleEarningRankingRecord(
+            date=date,
+            ranking=item.ranking,
+            slug=item.slug,
+            title=item.title,
+            author_slug=author_info.slug if author_info else None,
+            author_earning=item.fp_to_author_amount,
+            voter_earning=item.fp_to_voter_amount,
+        )
     )
 
 
@@ -95,6 +114,8 @@ async def save_article_earning_ranking_record_data(
     retry_delay_seconds=300,
     timeout_seconds=300,
 )
+@collect_metrics
+@use_pools(jianshu_pool)
 async def jianshu_fetch_article_earning_ranking_data(date: date | None = None) -> None:
     logger = get_run_logger()
 
@@ -103,16 +124,19 @@ async def jianshu_fetch_article_earning_ranking_data(date: date | None = None) -
 
     start_ranking = await pre_check(date=date)
 
-    async for item in iter_article_earning_ranking(date):
+    async def handle(item: RecordData) -> None:
         # 断点续采
         if item.ranking < start_ranking:
-            continue
+            return
 
         if item.slug:
-            author_info: UserInfoData = await get_article_author_info(item)
+            author_info, author_info_fetch_time = await get_article_author_info(item)
 
             try:
-                await save_user_data(author_info=author_info)
+                await save_user_data(
+                    author_info=author_info,
+                    author_info_fetch_time=author_info_fetch_time,
+                )
             except Exception:
                 logger.exception("保存用户数据时发生未知异常")
         else:
@@ -122,7 +146,11 @@ async def jianshu_fetch_article_earning_ranking_data(date: date | None = None) -
 
         try:
             await save_article_earning_ranking_record_data(
-                item, date=date, author_info=author_info
+                item, date=date, author_info=author_info, writer=writer
             )
         except Exception:
             logger.exception("保存文章收益排行榜数据时发生未知异常 id=%s", item.ranking)
+
+    # 获取下一页数据与写入当前数据并行进行，按顺序写入以保证断点续采正确
+    async with WriteBehind(jianshu_pool) as writer:
+        await Pipeline(handle).run(iter_article_earning_ranking(date))
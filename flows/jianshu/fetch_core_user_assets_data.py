@@ -13,13 +13,20 @@ from sshared.retry import retry
 
 from models.jianshu.core_user_assets_record import CoreUserAssetsRecord
 from models.jianshu.user import User as DbUser
+from utils.cache import get_cached_user_info
 from utils.config import CONFIG
+from utils.db import jianshu_pool, use_pools
+from utils.instrumentation import collect_metrics, instrumented
+from utils.pipeline import Pipeline
 from utils.prefect_helper import get_flow_run_name, get_task_run_name
+from utils.rate_limiter import apply_rate_limiters
 from utils.retry import NETWORK_REQUEST_RETRY_PARAMS
+from utils.write_behind import WriteBehind
 
 JKIT_CONFIG.data_validation.enabled = False
 if CONFIG.jianshu_endpoint:
     JKIT_CONFIG.datasources.jianshu.endpoint = CONFIG.jianshu_endpoint
+apply_rate_limiters()
 
 
 def get_fetch_time() -> datetime:
@@ -33,11 +40,12 @@ def get_fetch_time() -> datetime:
         return time.replace(minute=0) + timedelta(hours=1)
 
 
-@retry(**NETWORK_REQUEST_RETRY_PARAMS)
-async def get_user_info(item: User) -> InfoData:
-    return await item.info
+@instrumented("jianshu.get_user_info")
+async def get_user_info(item: User) -> tuple[InfoData, datetime]:
+    return await get_cached_user_info(item)
 
 
+@instrumented("jianshu.get_user_assets_info")
 @retry(**NETWORK_REQUEST_RETRY_PARAMS)
 async def get_user_assets_info(item: User) -> AssetsInfoData:
     return await item.assets_info
@@ -59,13 +67,14 @@ async def save_user_data(item: User, /) -> None:
         return
 
     try:
-        user_info: InfoData = await get_user_info(item)
+        user_info, fetch_time = await get_user_info(item)
     except ResourceUnavailableError:
         # 用户已注销 / 被封禁，创建用户记录无意义
         logger.info("用户已注销 / 被封禁，跳过创建用户记录 slug=%s", item.slug)
     else:
         await DbUser.create(
             slug=user_info.slug,
+            update_time=fetch_time,
             id=user_info.id,
             name=user_info.name,
             avatar_url=user_info.avatar_url,
@@ -74,7 +83,9 @@ async def save_user_data(item: User, /) -> None:
         )
 
 
-async def save_core_user_assets_record_data(item: User, /, *, time: datetime) -> None:
+async def save_core_user_assets_record_data(
+    item: User, /, *, time: datetime, writer: WriteBehind
+) -> None:
     logger = get_run_logger()
 
     try:
@@ -82,12 +93,14 @@ async def save_core_user_assets_record_data(item: User, /, *, time: datetime) ->
     except ResourceUnavailableError:
         logger.info("用户已注销 / 被封禁，跳过采集资产数据 slug=%s", item.slug)
     else:
-        await CoreUserAssetsRecord.create(
-            time=time,
-            slug=item.slug,
-            fp=assets_info.fp_amount,
-            ftn=assets_info.ftn_amount,
-            assets=assets_info.assets_amount,
+        await writer.add(
+            CoreUserAssetsRecord(
+                time=time,
+                slug=item.slug,
+                fp=assets_info.fp_amount,
+                ftn=assets_info.ftn_amount,
+                assets=assets_info.assets_amount,
+            )
         )
 
 
@@ -98,18 +111,24 @@ async def save_core_user_assets_record_data(item: User, /, *, time: datetime) ->
     retry_delay_seconds=600,
     timeout_seconds=3600,
 )
+@collect_metrics
+@use_pools(jianshu_pool)
 async def jianshu_fetch_core_user_assets_data() -> None:
     logger = get_run_logger()
 
     time = get_fetch_time()
 
-    async for item in iter_core_users():
+    async def handle(item: User) -> None:
         try:
             await save_user_data(item)
         except Exception:
             logger.exception("保存用户数据时发生未知异常 slug=%s", item.slug)
 
         try:
-            await save_core_user_assets_record_data(item, time=time)
+            await save_core_user_assets_record_data(item, time=time, writer=writer)
         except Exception:
             logger.exception("保存核心用户资产数据时发生未知异常 slug=%s", item.slug)
+
+    # 获取下一个用户的数据与写入当前用户的数据并行进行
+    async with WriteBehind(jianshu_pool) as writer:
+        await Pipeline(handle).run(iter_core_users())
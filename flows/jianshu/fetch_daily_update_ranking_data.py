@@ -1,37 +1,43 @@
 from __future__ import annotations
 
 from collections.abc import AsyncGenerator
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
 from jkit.config import CONFIG as JKIT_CONFIG
 from jkit.ranking.daily_update import DailyUpdateRanking, RecordData
 from jkit.user import InfoData as UserInfoData
 from prefect import flow, get_run_logger, task
-from sshared.retry import retry
 
 from models.jianshu.daily_update_ranking_record import (
     DailyUpdateRankingRecord as DbDailyUpdateRankingRecord,
 )
 from models.jianshu.user import User
+from utils.cache import get_cached_user_info
 from utils.config import CONFIG
+from utils.db import jianshu_pool, use_pools
 from utils.exceptions import DataExistsError
+from utils.freshness import FreshnessFilter
+from utils.instrumentation import collect_metrics, instrumented, instrumented_iter
+from utils.pipeline import Pipeline
 from utils.prefect_helper import get_flow_run_name, get_task_run_name
-from utils.retry import NETWORK_REQUEST_RETRY_PARAMS
+from utils.rate_limiter import apply_rate_limiters
+from utils.write_behind import WriteBehind
 
 TOTAL_DATA_COUNT = 100
 
 JKIT_CONFIG.data_validation.enabled = False
 if CONFIG.jianshu_endpoint:
     JKIT_CONFIG.datasources.jianshu.endpoint = CONFIG.jianshu_endpoint
+apply_rate_limiters()
 
 
-@retry(**NETWORK_REQUEST_RETRY_PARAMS)
+@instrumented("jianshu.get_user_info")
 async def get_user_info(
     item: RecordData,
-) -> UserInfoData:
+) -> tuple[UserInfoData, datetime]:
     user = item.user_info.to_user_obj()
 
-    return await user.info
+    return await get_cached_user_info(user)
 
 
 @task(task_run_name=get_task_run_name)
@@ -49,41 +55,36 @@ async def pre_check(*, date: date) -> int:
 
 @task(task_run_name=get_task_run_name)
 async def iter_daily_update_ranking() -> AsyncGenerator[RecordData]:
-    async for item in DailyUpdateRanking().iter_records():
+    async for item in instrumented_iter(
+        "jianshu.iter_daily_update_ranking", DailyUpdateRanking().iter_records()
+    ):
         yield item
 
 
 async def save_user_data(item: RecordData, /) -> None:
-    user_info: UserInfoData = await get_user_info(item)
-
-    user = await User.get_by_slug(user_info.slug)
-    if not user:
-        await User.create(
-            slug=user_info.slug,
-            id=user_info.id,
-            name=user_info.name,
-            avatar_url=user_info.avatar_url,
-            membership_type=user_info.membership_info.type,
-            membership_expire_time=user_info.membership_info.expire_time,
-        )
-    else:
-        await User.update_by_slug(
-            slug=user_info.slug,
-            name=user_info.name,
-            avatar_url=user_info.avatar_url,
-            membership_type=user_info.membership_info.type,
-            membership_expire_time=user_info.membership_info.expire_time,
-        )
+    user_info, fetch_time = await get_user_info(item)
+
+    await User.upsert(
+        slug=user_info.slug,
+        update_time=fetch_time,
+        id=user_info.id,
+        name=user_info.name,
+        avatar_url=user_info.avatar_url,
+        membership_type=user_info.membership_info.type,
+        membership_expire_time=user_info.membership_info.expire_time,
+    )
 
 
 async def save_daily_update_ranking_record_data(
-    item: RecordData, /, *, date: date
+    item: RecordData, /, *, date: date, writer: WriteBehind
 ) -> None:
-    await DbDailyUpdateRankingRecord.create(
-        date=date,
-        ranking=item.ranking,
-        slug=item.user_info.slug,
-        days=item.days,
+    await writer.add(
+        DbDailyUpdateRankingRecord(
+            date=date,
+            ranking=item.ranking,
+            slug=item.user_info.slug,
+            days=item.days,
+        )
     )
 
 
@@ -94,26 +95,39 @@ async def save_daily_update_ranking_record_data(
     retry_delay_seconds=300,
     timeout_seconds=300,
 )
+@collect_metrics
+@use_pools(jianshu_pool)
 async def jianshu_fetch_daily_update_ranking_data() -> None:
     logger = get_run_logger()
 
     date = datetime.now().date()
 
     start_ranking = await pre_check(date=date)
+    fresh_users = FreshnessFilter[RecordData](
+        User.get_update_times_by_slugs,
+        key=lambda item: item.user_info.slug,
+        window=timedelta(seconds=CONFIG.user_refresh.fresh_window),
+    )
 
-    async for item in iter_daily_update_ranking():
+    async def handle(item: RecordData) -> None:
         # 断点续采
         if item.ranking < start_ranking:
-            continue
+            return
 
-        try:
-            await save_user_data(item)
-        except Exception:
-            logger.exception("保存用户数据时发生未知异常 ranking=%s", item.ranking)
+        if not fresh_users.is_fresh(item):
+            try:
+                await save_user_data(item)
+            except Exception:
+                logger.exception("保存用户数据时发生未知异常 ranking=%s", item.ranking)
 
         try:
-            await save_daily_update_ranking_record_data(item, date=date)
+            await save_daily_update_ranking_record_data(item, date=date, writer=writer)
         except Exception:
             logger.exception(
                 "保存日更排行榜数据时发生未知异常 ranking=%s", item.ranking
             )
+
+    # 获取下一页数据与写入当前数据并行进行，按顺序写入以保证断点续采正确
+    async with WriteBehind(jianshu_pool) as writer:
+        await Pipeline(handle).run(fresh_users.iter(iter_daily_update_ranking()))
+    logger.info("跳过近期已更新的用户 skipped_count=%s", fresh_users.skipped_count)
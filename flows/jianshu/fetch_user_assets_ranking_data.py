@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from collections.abc import AsyncGenerator
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
 from jkit.config import CONFIG as JKIT_CONFIG
 from jkit.exceptions import (
@@ -16,24 +16,33 @@ from models.jianshu.user import User
 from models.jianshu.user_assets_ranking_record import (
     UserAssetsRankingRecord as DbUserAssetsRankingRecord,
 )
+from utils.cache import get_cached_user_info
 from utils.config import CONFIG
+from utils.db import jianshu_pool, use_pools
+from utils.freshness import FreshnessFilter
+from utils.instrumentation import collect_metrics, instrumented, instrumented_iter
+from utils.pipeline import Pipeline
 from utils.prefect_helper import get_flow_run_name, get_task_run_name
+from utils.rate_limiter import apply_rate_limiters
 from utils.retry import NETWORK_REQUEST_RETRY_PARAMS
+from utils.write_behind import WriteBehind
 
 JKIT_CONFIG.data_validation.enabled = False
 if CONFIG.jianshu_endpoint:
     JKIT_CONFIG.datasources.jianshu.endpoint = CONFIG.jianshu_endpoint
+apply_rate_limiters()
 
 
-@retry(**NETWORK_REQUEST_RETRY_PARAMS)
+@instrumented("jianshu.get_user_info")
 async def get_user_info(
     item: RecordData,
-) -> InfoData:
+) -> tuple[InfoData, datetime]:
     user = item.user_info.to_user_obj()
 
-    return await user.info
+    return await get_cached_user_info(user)
 
 
+@instrumented("jianshu.get_user_assets_info")
 @retry(**NETWORK_REQUEST_RETRY_PARAMS)
 async def get_user_assets_info(
     item: RecordData,
@@ -44,16 +53,28 @@ async def get_user_assets_info(
 
 
 @task(task_run_name=get_task_run_name)
-async def pre_check(*, date: date, total_count: int) -> int:
+async def pre_check(*, date: date, total_count: int) -> tuple[int, set[int]]:
     logger = get_run_logger()
 
-    current_data_count = await DbUserAssetsRankingRecord.count_by_date(date)
-    if current_data_count >= total_count:
+    completed_rankings = await DbUserAssetsRankingRecord.get_rankings_by_date(date)
+
+    # 并发采集时数据并非按排名顺序写入，只有连续完成的前缀可以跳过
+    completed_prefix = 0
+    while completed_prefix + 1 in completed_rankings:
+        completed_prefix += 1
+
+    if completed_prefix >= total_count:
         logger.error("该日期的数据已存在 date=%s", date)
-    if 0 < current_data_count < total_count:
-        logger.warning("正在进行断点续采 current_data_count=%s", current_data_count)
+    if completed_rankings and completed_prefix < total_count:
+        logger.warning(
+            "正在进行断点续采 completed_prefix=%s completed_count=%s",
+            completed_prefix,
+            len(completed_rankings),
+        )
 
-    return current_data_count + 1
+    return completed_prefix + 1, {
+        ranking for ranking in completed_rankings if ranking > completed_prefix
+    }
 
 
 @task(task_run_name=get_task_run_name)
@@ -62,7 +83,10 @@ async def iter_user_assets_ranking(
     start_ranking: int,
     total_count: int,
 ) -> AsyncGenerator[RecordData]:
-    async for item in UserAssetsRanking(start_ranking=start_ranking).iter_records():
+    async for item in instrumented_iter(
+        "jianshu.iter_user_assets_ranking",
+        UserAssetsRanking(start_ranking=start_ranking).iter_records(),
+    ):
         yield item
 
         if item.ranking == total_count:
@@ -81,48 +105,42 @@ async def save_user_data(item: RecordData, /) -> None:
         logger.info("用户信息不可用，跳过用户数据采集 raning=%s", item.ranking)
         return
 
-    user = await User.get_by_slug(item.user_info.slug)
-
     try:
-        user_info: InfoData = await get_user_info(item)
+        user_info, fetch_time = await get_user_info(item)
     except ResourceUnavailableError:
         # 用户不存在或已注销 / 被封禁，将其 status 设置为 INACCESSIBLE
         # 如果用户记录尚不存在，先创建
-        if not user:
+        if not await User.get_by_slug(item.user_info.slug):
             await User.create(
                 slug=item.user_info.slug,
+                update_time=datetime.now(),
                 id=item.user_info.id,
                 name=item.user_info.name,
                 avatar_url=item.user_info.avatar_url,
                 membership_type="NONE",
                 membership_expire_time=None,
             )
+        await User.update_status_by_slug(
+            slug=item.user_info.slug, status="INACCESSIBLE"
+        )
         logger.info(
             "用户不存在或已注销 / 被封禁，status 已设为 INACCESSIBLE slug=%s",
             item.user_info.slug,
         )
     else:
-        if not user:
-            await User.create(
-                slug=item.user_info.slug,
-                id=item.user_info.id,
-                name=item.user_info.name,
-                avatar_url=item.user_info.avatar_url,
-                membership_type=user_info.membership_info.type,
-                membership_expire_time=user_info.membership_info.expire_time,
-            )
-        else:
-            await User.update_by_slug(
-                slug=item.user_info.slug,
-                name=item.user_info.name,
-                avatar_url=item.user_info.avatar_url,
-                membership_type=user_info.membership_info.type,
-                membership_expire_time=user_info.membership_info.expire_time,
-            )
+        await User.upsert(
+            slug=item.user_info.slug,
+            update_time=fetch_time,
+            id=item.user_info.id,
+            name=item.user_info.name,
+            avatar_url=item.user_info.avatar_url,
+            membership_type=user_info.membership_info.type,
+            membership_expire_time=user_info.membership_info.expire_time,
+        )
 
 
 async def save_user_assets_ranking_record_data(
-    item: RecordData, /, *, date: date
+    item: RecordData, /, *, date: date, writer: WriteBehind
 ) -> None:
     logger = get_run_logger()
 
@@ -138,17 +156,43 @@ async def save_user_assets_ranking_record_data(
                 item.user_info.slug,
             )
 
-    await DbUserAssetsRankingRecord.create(
-        date=date,
-        ranking=item.ranking,
-        slug=item.user_info.slug,
-        fp=assets_info.fp_amount if assets_info else None,
-        ftn=assets_info.ftn_amount if assets_info else None,
-        # 后备数据（资产排行榜，非实时）
-        assets=assets_info.assets_amount if assets_info else item.assets_amount,
+    await writer.add(
+        DbUserAssetsRankingRecord(
+            date=date,
+            ranking=item.ranking,
+            slug=item.user_info.slug,
+            fp=assets_info.fp_amount if assets_info else None,
+            ftn=assets_info.ftn_amount if assets_info else None,
+            # 后备数据（资产排行榜，非实时）
+            assets=assets_info.assets_amount if assets_info else item.assets_amount,
+        )
     )
 
 
+async def save_data(
+    item: RecordData,
+    /,
+    *,
+    date: date,
+    writer: WriteBehind,
+    refresh_user_data: bool = True,
+) -> None:
+    logger = get_run_logger()
+
+    if refresh_user_data:
+        try:
+            await save_user_data(item)
+        except Exception:
+            logger.exception("保存用户数据时发生未知异常 ranking=%s", item.ranking)
+
+    try:
+        await save_user_assets_ranking_record_data(item, date=date, writer=writer)
+    except Exception:
+        logger.exception(
+            "保存用户收益排行榜数据时发生未知异常 ranking=%s", item.ranking
+        )
+
+
 @flow(
     name="采集简书用户资产排行榜数据",
     flow_run_name=get_flow_run_name,
@@ -156,26 +200,55 @@ async def save_user_assets_ranking_record_data(
     retry_delay_seconds=600,
     timeout_seconds=3600,
 )
-async def jianshu_fetch_user_assets_ranking_data(total_count: int = 3000) -> None:
+@collect_metrics
+@use_pools(jianshu_pool)
+async def jianshu_fetch_user_assets_ranking_data(
+    total_count: int = 3000, concurrency: int = 4
+) -> None:
     logger = get_run_logger()
 
     date = datetime.now().date()
 
-    start_ranking = await pre_check(date=date, total_count=total_count)
+    start_ranking, completed_rankings = await pre_check(
+        date=date, total_count=total_count
+    )
+    fresh_users = FreshnessFilter[RecordData](
+        User.get_update_times_by_slugs,
+        key=lambda item: item.user_info.slug,
+        window=timedelta(seconds=CONFIG.user_refresh.fresh_window),
+    )
+
+    async def handle(item: RecordData) -> None:
+        # 该条目已在之前的运行中完成
+        if item.ranking in completed_rankings:
+            return
 
-    async for item in iter_user_assets_ranking(
-        # 断点续采
-        start_ranking=start_ranking,
-        total_count=total_count,
-    ):
-        try:
-            await save_user_data(item)
-        except Exception:
-            logger.exception("保存用户数据时发生未知异常 ranking=%s", item.ranking)
+        await save_data(
+            item,
+            date=date,
+            writer=writer,
+            refresh_user_data=not fresh_users.is_fresh(item),
+        )
 
-        try:
-            await save_user_assets_ranking_record_data(item, date=date)
-        except Exception:
-            logger.exception(
-                "保存用户收益排行榜数据时发生未知异常 ranking=%s", item.ranking
+    # 由 concurrency 个 worker 并发处理排行榜条目，队列长度有界以限制内存占用
+    # 队列可容纳两页数据（每页 20 条），处理当前页时即可开始获取下一页
+    pipeline = Pipeline(handle, concurrency=concurrency, queue_size=40)
+    try:
+        async with WriteBehind(jianshu_pool) as writer:
+            await pipeline.run(
+                fresh_users.iter(
+                    iter_user_assets_ranking(
+                        # 断点续采
+                        start_ranking=start_ranking,
+                        total_count=total_count,
+                    )
+                )
+            )
+    finally:
+        logger.info("跳过近期已更新的用户 skipped_count=%s", fresh_users.skipped_count)
+        if pipeline.watermark:
+            logger.info(
+                "已连续完成至 ranking=%s completed_count=%s",
+                pipeline.watermark.ranking,
+                pipeline.completed_count,
             )
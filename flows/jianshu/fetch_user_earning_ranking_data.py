@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from asyncio import gather
 from collections.abc import AsyncGenerator
 from datetime import date, datetime, timedelta
 
@@ -7,30 +8,42 @@ from jkit.config import CONFIG as JKIT_CONFIG
 from jkit.ranking.user_earning import RecordData, UserEarningRanking
 from jkit.user import InfoData
 from prefect import flow, get_run_logger, task
-from sshared.retry import retry
 
 from models.jianshu.user import User
 from models.jianshu.user_earning_ranking_record import (
     UserEarningRankingRecord,
     UserEarningRankingRecordType,
 )
+from utils.batch import write_batch
+from utils.cache import get_cached_user_info
 from utils.config import CONFIG
+from utils.db import jianshu_pool, use_pools
 from utils.exceptions import DataExistsError
+from utils.freshness import FreshnessFilter
+from utils.instrumentation import collect_metrics, instrumented, instrumented_iter
+from utils.pipeline import Pipeline
 from utils.prefect_helper import get_flow_run_name, get_task_run_name
-from utils.retry import NETWORK_REQUEST_RETRY_PARAMS
+from utils.rate_limiter import apply_rate_limiters
+from utils.write_behind import WriteBehind
 
 TOTAL_DATA_COUNT = 100
+USER_EARNING_RANKING_TYPES: tuple[UserEarningRankingRecordType, ...] = (
+    "ALL",
+    "CREATING",
+    "VOTING",
+)
 
 JKIT_CONFIG.data_validation.enabled = False
 if CONFIG.jianshu_endpoint:
     JKIT_CONFIG.datasources.jianshu.endpoint = CONFIG.jianshu_endpoint
+apply_rate_limiters()
 
 
-@retry(**NETWORK_REQUEST_RETRY_PARAMS)
+@instrumented("jianshu.get_user_info")
 async def get_user_info(
     item: RecordData,
-) -> InfoData:
-    return await item.to_user_obj().info
+) -> tuple[InfoData, datetime]:
+    return await get_cached_user_info(item.to_user_obj())
 
 
 @task(task_run_name=get_task_run_name)
@@ -48,11 +61,43 @@ async def pre_check(*, date: date, type: UserEarningRankingRecordType) -> int:
     return current_data_count + 1
 
 
+@task(task_run_name=get_task_run_name)
+async def pre_check_all_types(*, date: date) -> dict[UserEarningRankingRecordType, int]:
+    logger = get_run_logger()
+
+    current_data_counts = await UserEarningRankingRecord.count_by_date_group_by_type(
+        date
+    )
+
+    start_rankings: dict[UserEarningRankingRecordType, int] = {}
+    for type in USER_EARNING_RANKING_TYPES:
+        current_data_count = current_data_counts.get(type, 0)
+        if current_data_count == TOTAL_DATA_COUNT:
+            logger.info("该类型的数据已存在，跳过采集 type=%s", type)
+            continue
+        if 0 < current_data_count < TOTAL_DATA_COUNT:
+            logger.warning(
+                "正在进行断点续采 type=%s current_data_count=%s",
+                type,
+                current_data_count,
+            )
+
+        start_rankings[type] = current_data_count + 1
+
+    if not start_rankings:
+        raise DataExistsError(f"该日期的数据已存在 {date=}")
+
+    return start_rankings
+
+
 @task(task_run_name=get_task_run_name)
 async def iter_user_earning_ranking(
     date: date, type: UserEarningRankingRecordType
 ) -> AsyncGenerator[RecordData]:
-    async for item in UserEarningRanking(date_=date).iter_records(type=type):
+    async for item in instrumented_iter(
+        "jianshu.iter_user_earning_ranking",
+        UserEarningRanking(date_=date).iter_records(type=type),
+    ):
         yield item
 
 
@@ -61,40 +106,39 @@ async def save_user_data(item: RecordData, /) -> None:
 
     if not item.slug or not item.name or not item.avatar_url:
         logger.warning("用户数据不可用，跳过采集 ranking=%s", item.ranking)
+        return
 
-    user_info: InfoData = await get_user_info(item)
-
-    user = await User.get_by_slug(user_info.slug)
-    if not user:
-        await User.create(
-            slug=user_info.slug,
-            id=user_info.id,
-            name=user_info.name,
-            avatar_url=user_info.avatar_url,
-            membership_type=user_info.membership_info.type,
-            membership_expire_time=user_info.membership_info.expire_time,
-        )
-    else:
-        await User.update_by_slug(
-            slug=user_info.slug,
-            name=user_info.name,
-            avatar_url=user_info.avatar_url,
-            membership_type=user_info.membership_info.type,
-            membership_expire_time=user_info.membership_info.expire_time,
-        )
+    user_info, fetch_time = await get_user_info(item)
+
+    await User.upsert(
+        slug=user_info.slug,
+        update_time=fetch_time,
+        id=user_info.id,
+        name=user_info.name,
+        avatar_url=user_info.avatar_url,
+        membership_type=user_info.membership_info.type,
+        membership_expire_time=user_info.membership_info.expire_time,
+    )
 
 
 async def save_user_earning_ranking_record_data(
-    item: RecordData, /, *, date: date, type: UserEarningRankingRecordType
+    item: RecordData,
+    /,
+    *,
+    date: date,
+    type: UserEarningRankingRecordType,
+    writer: WriteBehind,
 ) -> None:
-    await UserEarningRankingRecord.create(
-        date=date,
-        type=type,
-        ranking=item.ranking,
-        slug=item.slug,
-        total_earning=item.total_fp_amount,
-        creating_earning=item.fp_by_creating_amount,
-        voting_earning=item.fp_by_voting_amount,
+    await writer.add(
+        UserEarningRankingRecord(
+            date=date,
+            type=type,
+            ranking=item.ranking,
+            slug=item.slug,
+            total_earning=item.total_fp_amount,
+            creating_earning=item.fp_by_creating_amount,
+            voting_earning=item.fp_by_voting_amount,
+        )
     )
 
 
@@ -105,6 +149,8 @@ async def save_user_earning_ranking_record_data(
     retry_delay_seconds=300,
     timeout_seconds=300,
 )
+@collect_metrics
+@use_pools(jianshu_pool)
 async def jianshu_fetch_user_earning_ranking_data(
     type: UserEarningRankingRecordType, date: date | None = None
 ) -> None:
@@ -114,20 +160,171 @@ async def jianshu_fetch_user_earning_ranking_data(
         date = datetime.now().date() - timedelta(days=1)
 
     start_ranking = await pre_check(date=date, type=type)
+    fresh_users = FreshnessFilter[RecordData](
+        User.get_update_times_by_slugs,
+        key=lambda item: item.slug,
+        window=timedelta(seconds=CONFIG.user_refresh.fresh_window),
+    )
 
-    async for item in iter_user_earning_ranking(date=date, type=type):
+    async def handle(item: RecordData) -> None:
         # 断点续采
         if item.ranking < start_ranking:
-            continue
+            return
 
-        try:
-            await save_user_data(item)
-        except Exception:
-            logger.exception("保存用户数据时发生未知异常 ranking=%s", item.ranking)
+        if not fresh_users.is_fresh(item):
+            try:
+                await save_user_data(item)
+            except Exception:
+                logger.exception("保存用户数据时发生未知异常 ranking=%s", item.ranking)
 
         try:
-            await save_user_earning_ranking_record_data(item, date=date, type=type)
+            await save_user_earning_ranking_record_data(
+                item, date=date, type=type, writer=writer
+            )
         except Exception:
             logger.exception(
                 "保存用户收益排行榜数据时发生未知异常 ranking=%s", item.ranking
             )
+
+    # 获取下一页数据与写入当前数据并行进行，按顺序写入以保证断点续采正确
+    async with WriteBehind(jianshu_pool) as writer:
+        await Pipeline(handle).run(
+            fresh_users.iter(iter_user_earning_ranking(date=date, type=type))
+        )
+    logger.info("跳过近期已更新的用户 skipped_count=%s", fresh_users.skipped_count)
+
+
+async def fetch_user_earning_ranking(
+    *, date: date, type: UserEarningRankingRecordType, start_ranking: int
+) -> list[RecordData]:
+    return [
+        item
+        async for item in iter_user_earning_ranking(date=date, type=type)
+        # 断点续采
+        if item.ranking >= start_ranking
+    ]
+
+
+@flow(
+    name="采集简书用户收益排行榜数据（全部类型）",
+    flow_run_name=get_flow_run_name,
+    retries=2,
+    retry_delay_seconds=300,
+    timeout_seconds=300,
+)
+@collect_metrics
+@use_pools(jianshu_pool)
+async def jianshu_fetch_user_earning_ranking_data_all_types(
+    date: date | None = None, concurrency: int = 4
+) -> None:
+    """在一次运行中并发采集全部类型的用户收益排行榜。
+
+    各类型排行榜中的用户合并后只获取、更新一次，每个类型的排行榜数据批量写入。
+    """
+    logger = get_run_logger()
+
+    if not date:
+        date = datetime.now().date() - timedelta(days=1)
+
+    start_rankings = await pre_check_all_types(date=date)
+    rankings = dict(
+        zip(
+            start_rankings,
+            await gather(
+                *(
+                    fetch_user_earning_ranking(
+                        date=date, type=type, start_ranking=start_ranking
+                    )
+                    for type, start_ranking in start_rankings.items()
+                )
+            ),
+        )
+    )
+
+    # 同一用户可能出现在多个类型的排行榜中
+    items_by_slug: dict[str, RecordData] = {}
+    for items in rankings.values():
+        for item in items:
+            if not item.slug or not item.name or not item.avatar_url:
+                logger.warning("用户数据不可用，跳过采集 ranking=%s", item.ranking)
+                continue
+
+            items_by_slug.setdefault(item.slug, item)
+
+    async def iter_items() -> AsyncGenerator[RecordData]:
+        for item in items_by_slug.values():
+            yield item
+
+    users: list[User] = []
+    fresh_users = FreshnessFilter[RecordData](
+        User.get_update_times_by_slugs,
+        key=lambda item: item.slug,
+        window=timedelta(seconds=CONFIG.user_refresh.fresh_window),
+        # 数据已全部在内存中，一次查询所有用户
+        batch_size=len(items_by_slug) or 1,
+    )
+
+    async def handle(item: RecordData) -> None:
+        if fresh_users.is_fresh(item):
+            return
+
+        try:
+            user_info, fetch_time = await get_user_info(item)
+        except Exception:
+            logger.exception("获取用户数据时发生未知异常 slug=%s", item.slug)
+            return
+
+        users.append(
+            User(
+                slug=user_info.slug,
+                status="NORMAL",
+                update_time=fetch_time,
+                id=user_info.id,
+                name=user_info.name,
+                history_names=[],
+                avatar_url=user_info.avatar_url,
+                membership_type=user_info.membership_info.type,
+                membership_expire_time=user_info.membership_info.expire_time,
+            )
+        )
+
+    await Pipeline(handle, concurrency=concurrency).run(fresh_users.iter(iter_items()))
+
+    try:
+        poison_users = await write_batch(users, User.upsert_many, name="jianshu.users")
+    except Exception:
+        logger.exception("保存用户数据时发生未知异常")
+    else:
+        if poison_users:
+            logger.warning("已隔离 %s 条无法写入的用户数据", len(poison_users))
+
+    poison_records = await gather(
+        *(
+            write_batch(
+                [
+                    UserEarningRankingRecord(
+                        date=date,
+                        type=type,
+                        ranking=item.ranking,
+                        slug=item.slug,
+                        total_earning=item.total_fp_amount,
+                        creating_earning=item.fp_by_creating_amount,
+                        voting_earning=item.fp_by_voting_amount,
+                    )
+                    for item in items
+                ],
+                UserEarningRankingRecord.create_many,
+                name="jianshu.user_earning_ranking_records",
+            )
+            for type, items in rankings.items()
+        )
+    )
+    poison_records_count = sum(len(x) for x in poison_records)
+    if poison_records_count:
+        logger.warning("已隔离 %s 条无法写入的用户收益排行榜数据", poison_records_count)
+    logger.info(
+        "采集完成 types=%s users_count=%s skipped_users_count=%s",
+        ",".join(rankings),
+        len(users),
+        fresh_users.skipped_count,
+    )
@@ -1,36 +1,79 @@
 from __future__ import annotations
 
+from asyncio import gather
 from datetime import date, datetime, timedelta
 
 from jkit.config import CONFIG as JKIT_CONFIG
-from jkit.ranking.user_assets import RecordData, UserAssetsRanking
+from jkit.ranking.user_assets import UserAssetsRanking
 from prefect import flow, get_run_logger, task
 from sshared.retry import retry
 
 from models.jianshu.users_count_record import UsersCountRecord
 from utils.config import CONFIG
+from utils.db import jianshu_pool, use_pools
 from utils.exceptions import BinarySearchMaxTriesReachedError, DataExistsError
+from utils.instrumentation import collect_metrics, instrumented
 from utils.prefect_helper import get_flow_run_name, get_task_run_name
+from utils.rate_limiter import apply_rate_limiters
 from utils.retry import NETWORK_REQUEST_RETRY_PARAMS
 
-USERS_LIST_LENGTH = 20
+HISTORY_DAYS = 7
+MIN_SEARCH_RADIUS = 1000
 DEFAULT_START_RANKING = 18270000
+DEFAULT_SEARCH_RADIUS = 10000
 
 JKIT_CONFIG.data_validation.enabled = False
 if CONFIG.jianshu_endpoint:
     JKIT_CONFIG.datasources.jianshu.endpoint = CONFIG.jianshu_endpoint
+apply_rate_limiters()
 
 
+@instrumented("jianshu.is_ranking_exists")
 @retry(**NETWORK_REQUEST_RETRY_PARAMS)
-async def get_users_list(start_ranking: int) -> list[RecordData]:
-    result: list[RecordData] = []
-    async for item in UserAssetsRanking(start_ranking=start_ranking).iter_records():
-        result.append(item)
+async def is_ranking_exists(ranking: int) -> bool:
+    # 仅需获取第一页数据，即可判断该排名是否存在
+    async for _ in UserAssetsRanking(start_ranking=ranking).iter_records():
+        return True
+
+    return False
+
+
+def predict_total_users_count(
+    records: list[UsersCountRecord], /, *, date: date
+) -> tuple[int, int]:
+    """根据近期用户数量记录的增长速率预测用户总数。
+
+    返回预测值与搜索半径。
+    """
+    latest_record = records[0]
+    days = (date - latest_record.date).days
+    if len(records) < 2:
+        return latest_record.total_users_count, MIN_SEARCH_RADIUS * days
+
+    daily_growth = (latest_record.total_users_count - records[-1].total_users_count) / (
+        latest_record.date - records[-1].date
+    ).days
+
+    # 以历史数据与平均增长速率的最大偏差估算搜索半径
+    max_deviation = max(
+        abs(
+            current.total_users_count
+            - previous.total_users_count
+            - daily_growth * (current.date - previous.date).days
+        )
+        for current, previous in zip(records, records[1:])
+    )
+
+    return (
+        latest_record.total_users_count + round(daily_growth * days),
+        max(MIN_SEARCH_RADIUS, round(max_deviation * 2) * days),
+    )
 
-        if len(result) == USERS_LIST_LENGTH:
-            return result
 
-    return result
+def get_probe_rankings(*, low: int, high: int, count: int) -> list[int]:
+    """在开区间 (low, high) 中均匀选取至多 count 个探测点。"""
+    step = (high - low) / (count + 1)
+    return sorted({low + round(step * i) for i in range(1, count + 1)} - {low, high})
 
 
 @task(task_run_name=get_task_run_name)
@@ -53,8 +96,10 @@ async def save_users_count_record_data(*, date: date, total_users_count: int) ->
     retry_delay_seconds=300,
     timeout_seconds=300,
 )
+@collect_metrics
+@use_pools(jianshu_pool)
 async def jianshu_fetch_users_count_data(
-    initial_step: int = 1000, max_tries: int = 20
+    probes_per_round: int = 16, max_rounds: int = 10
 ) -> None:
     logger = get_run_logger()
 
@@ -62,49 +107,75 @@ async def jianshu_fetch_users_count_data(
 
     await pre_check(date=date)
 
-    latest_data = await UsersCountRecord.get_by_date(date - timedelta(days=1))
-    if not latest_data:
-        start_ranking = DEFAULT_START_RANKING
+    recent_data = await UsersCountRecord.get_recent_by_date(
+        date - timedelta(days=1), limit=HISTORY_DAYS
+    )
+    if not recent_data:
+        predicted_ranking, radius = DEFAULT_START_RANKING, DEFAULT_SEARCH_RADIUS
         logger.warning(
-            "获取数据库最新记录失败，将使用默认参数 start_ranking=%s",
-            start_ranking,
+            "获取数据库最新记录失败，将使用默认参数 predicted_ranking=%s radius=%s",
+            predicted_ranking,
+            radius,
         )
     else:
-        start_ranking = latest_data.total_users_count
-        logger.warning(
-            "正在使用数据库历史参数加速查找收敛 start_ranking=%s",
-            start_ranking,
-        )
-
-    step = initial_step
-    tries = 1
-    while True:
+        predicted_ranking, radius = predict_total_users_count(recent_data, date=date)
         logger.info(
-            "正在获取资产排行榜数据 tries=%s start_ranking=%s step=%s",
-            tries,
-            start_ranking,
-            step,
+            "正在使用数据库历史数据预测搜索范围 predicted_ranking=%s radius=%s",
+            predicted_ranking,
+            radius,
         )
-        users_list: list[RecordData] = await get_users_list(start_ranking=start_ranking)
 
-        # 已获取到用户列表末尾
-        if 0 < len(users_list) < USERS_LIST_LENGTH:
-            break
+    # low 为已知存在的最大排名，high 为已知不存在的最小排名，None 表示尚未确定
+    low: int | None = None
+    high: int | None = None
+    for current_round in range(1, max_rounds + 1):
+        if low is not None and high is not None:
+            probe_rankings = get_probe_rankings(
+                low=low, high=high, count=probes_per_round
+            )
+        # 所有探测点均存在，向后扩大搜索范围
+        elif low is not None:
+            radius *= 2
+            probe_rankings = get_probe_rankings(
+                low=low, high=low + radius + 1, count=probes_per_round
+            )
+        # 所有探测点均不存在，向前扩大搜索范围
+        elif high is not None:
+            radius *= 2
+            probe_rankings = get_probe_rankings(
+                low=max(high - radius, 1) - 1, high=high, count=probes_per_round
+            )
+        else:
+            probe_rankings = get_probe_rankings(
+                low=max(predicted_ranking - radius, 1) - 1,
+                high=predicted_ranking + radius + 1,
+                count=probes_per_round,
+            )
 
-        # 获取到用户列表中段，向后跳转
-        if len(users_list) == USERS_LIST_LENGTH:
-            start_ranking += step
-        # 已超出用户列表范围，向前跳转
-        if len(users_list) == 0:
-            step //= 2
-            start_ranking -= step
+        logger.info(
+            "正在获取资产排行榜数据 round=%s low=%s high=%s probes_count=%s",
+            current_round,
+            low,
+            high,
+            len(probe_rankings),
+        )
+        results = await gather(
+            *(is_ranking_exists(ranking) for ranking in probe_rankings)
+        )
 
-        if tries == max_tries:
-            raise BinarySearchMaxTriesReachedError(f"已达到最大尝试次数 {max_tries=}")
+        for ranking, exists in zip(probe_rankings, results):
+            if exists and (low is None or ranking > low):
+                low = ranking
+            if not exists and (high is None or ranking < high):
+                high = ranking
 
-        tries += 1
+        # 已找到用户列表末尾
+        if low is not None and high is not None and high - low == 1:
+            break
+    else:
+        raise BinarySearchMaxTriesReachedError(f"已达到最大尝试次数 {max_rounds=}")
 
     await save_users_count_record_data(
         date=date,
-        total_users_count=users_list[-1].ranking,
+        total_users_count=low,
     )
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from prefect import flow
+
+from models.jpep.ftn_market_record import FtnMarketRecord
+from utils.db import jpep_pool, use_pools
+from utils.instrumentation import collect_metrics
+from utils.partition import (
+    PartitionGranularityType,
+    create_partitions,
+    detach_partitions,
+)
+from utils.prefect_helper import get_flow_run_name
+
+
+@flow(
+    name="管理简书积分兑换平台简书贝市场记录分区",
+    flow_run_name=get_flow_run_name,
+    retries=2,
+    retry_delay_seconds=60,
+    timeout_seconds=300,
+)
+@collect_metrics
+@use_pools(jpep_pool)
+async def jpep_manage_ftn_market_records_partitions(
+    granularity: PartitionGranularityType = "MONTH",
+    create_ahead: int = 3,
+    retention_days: int | None = None,
+) -> None:
+    await create_partitions(
+        FtnMarketRecord,
+        table_name="ftn_market_records",
+        granularity=granularity,
+        create_ahead=create_ahead,
+    )
+
+    # 默认保留所有分区
+    if retention_days is not None:
+        await detach_partitions(FtnMarketRecord, retention_days=retention_days)
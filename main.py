@@ -1,96 +1,88 @@
 from prefect import serve
 from prefect.deployments.runner import RunnerDeployment
 
-from flows.beijiaoyi.fetch_ftn_market_orders_data import (
-    beijiaoyi_fetch_ftn_market_orders_data,
-)
-from flows.jianshu.fetch_article_earning_ranking_data import (
-    jianshu_fetch_article_earning_ranking_data,
-)
-from flows.jianshu.fetch_core_user_assets_data import (
-    jianshu_fetch_core_user_assets_data,
-)
-from flows.jianshu.fetch_daily_update_ranking_data import (
-    jianshu_fetch_daily_update_ranking_data,
-)
-from flows.jianshu.fetch_user_assets_ranking_data import (
-    jianshu_fetch_user_assets_ranking_data,
-)
-from flows.jianshu.fetch_user_earning_ranking_data import (
-    jianshu_fetch_user_earning_ranking_data,
-)
-from flows.jianshu.fetch_users_count_data import jianshu_fetch_users_count_data
-from flows.jpep.fetch_ftn_market_orders_data import jpep_fetch_ftn_market_orders_data
-from utils.prefect_helper import get_cron_schedule
+from utils.prefect_helper import get_deployment
 
+# 通过入口点字符串声明部署，Flow 模块仅在运行时导入，以降低启动耗时与内存占用
 DEPLOYMENTS: tuple[RunnerDeployment, ...] = (
-    beijiaoyi_fetch_ftn_market_orders_data.to_deployment(
+    get_deployment(
+        "flows/beijiaoyi/fetch_ftn_market_orders_data.py:beijiaoyi_fetch_ftn_market_orders_data",
         name="JFetcher_采集贝交易平台简书贝市场买单订单数据",
         tags=["数据源 / 贝交易平台"],
         parameters={"type": "BUY"},
-        schedules=(get_cron_schedule("*/10 * * * *"),),
+        cron="*/10 * * * *",
     ),
-    beijiaoyi_fetch_ftn_market_orders_data.to_deployment(
+    get_deployment(
+        "flows/beijiaoyi/fetch_ftn_market_orders_data.py:beijiaoyi_fetch_ftn_market_orders_data",
         name="JFetcher_采集贝交易平台简书贝市场卖单订单数据",
         tags=["数据源 / 贝交易平台"],
         parameters={"type": "SELL"},
-        schedules=(get_cron_schedule("*/10 * * * *"),),
+        cron="*/10 * * * *",
+    ),
+    get_deployment(
+        "flows/beijiaoyi/manage_ftn_market_records_partitions.py:beijiaoyi_manage_ftn_market_records_partitions",
+        name="JFetcher_管理贝交易平台简书贝市场记录分区",
+        tags=["数据源 / 贝交易平台"],
+        cron="0 4 * * *",
     ),
-    jianshu_fetch_article_earning_ranking_data.to_deployment(
+    get_deployment(
+        "flows/jianshu/fetch_article_earning_ranking_data.py:jianshu_fetch_article_earning_ranking_data",
         name="JFetcher_采集简书文章收益排行榜数据",
         tags=["数据源 / 简书"],
-        schedules=(get_cron_schedule("35 0 * * *"),),
+        cron="35 0 * * *",
     ),
-    jianshu_fetch_core_user_assets_data.to_deployment(
+    get_deployment(
+        "flows/jianshu/fetch_core_user_assets_data.py:jianshu_fetch_core_user_assets_data",
         name="JFetcher_采集简书核心用户资产数据",
         tags=["数据源 / 简书"],
-        schedules=(get_cron_schedule("0 * * * *"),),
+        cron="0 * * * *",
     ),
-    jianshu_fetch_daily_update_ranking_data.to_deployment(
+    get_deployment(
+        "flows/jianshu/fetch_daily_update_ranking_data.py:jianshu_fetch_daily_update_ranking_data",
         name="JFetcher_采集简书日更排行榜数据",
         tags=["数据源 / 简书"],
-        schedules=(get_cron_schedule("15 3 * * *"),),
+        cron="15 3 * * *",
     ),
-    jianshu_fetch_user_assets_ranking_data.to_deployment(
+    get_deployment(
+        "flows/jianshu/fetch_user_assets_ranking_data.py:jianshu_fetch_user_assets_ranking_data",
         name="JFetcher_采集简书用户资产排行榜数据",
         tags=["数据源 / 简书"],
-        schedules=(get_cron_schedule("0 1 * * *"),),
+        cron="0 1 * * *",
     ),
-    jianshu_fetch_user_earning_ranking_data.to_deployment(
-        name="JFetcher_采集简书用户全部收益排行榜数据",
+    # 单独采集某个类型时，可手动运行 jianshu_fetch_user_earning_ranking_data
+    get_deployment(
+        "flows/jianshu/fetch_user_earning_ranking_data.py:jianshu_fetch_user_earning_ranking_data_all_types",
+        name="JFetcher_采集简书用户收益排行榜数据",
         tags=["数据源 / 简书"],
-        parameters={"type": "ALL"},
-        schedules=(get_cron_schedule("35 0 * * *"),),
+        cron="35 0 * * *",
     ),
-    jianshu_fetch_user_earning_ranking_data.to_deployment(
-        name="JFetcher_采集简书用户创作收益排行榜数据",
-        tags=["数据源 / 简书"],
-        parameters={"type": "CREATING"},
-        schedules=(get_cron_schedule("35 0 * * *"),),
-    ),
-    jianshu_fetch_user_earning_ranking_data.to_deployment(
-        name="JFetcher_采集简书用户投票收益排行榜数据",
-        tags=["数据源 / 简书"],
-        parameters={"type": "VOTING"},
-        schedules=(get_cron_schedule("35 0 * * *"),),
-    ),
-    jianshu_fetch_users_count_data.to_deployment(
+    get_deployment(
+        "flows/jianshu/fetch_users_count_data.py:jianshu_fetch_users_count_data",
         name="JFetcher_采集简书用户数量数据",
         tags=["数据源 / 简书"],
-        schedules=(get_cron_schedule("45 0 * * *"),),
+        cron="45 0 * * *",
     ),
-    jpep_fetch_ftn_market_orders_data.to_deployment(
+    get_deployment(
+        "flows/jpep/fetch_ftn_market_orders_data.py:jpep_fetch_ftn_market_orders_data",
         name="JFetcher_采集简书积分兑换平台简书贝市场买单订单数据",
         tags=["数据源 / 简书积分兑换平台"],
         parameters={"type": "BUY"},
-        schedules=(get_cron_schedule("*/10 * * * *"),),
+        cron="*/10 * * * *",
     ),
-    jpep_fetch_ftn_market_orders_data.to_deployment(
+    get_deployment(
+        "flows/jpep/fetch_ftn_market_orders_data.py:jpep_fetch_ftn_market_orders_data",
         name="JFetcher_采集简书积分兑换平台简书贝市场卖单订单数据",
         tags=["数据源 / 简书积分兑换平台"],
         parameters={"type": "SELL"},
-        schedules=(get_cron_schedule("*/10 * * * *"),),
+        cron="*/10 * * * *",
     ),
-)  # type: ignore
+    get_deployment(
+        "flows/jpep/manage_ftn_market_records_partitions.py:jpep_manage_ftn_market_records_partitions",
+        name="JFetcher_管理简书积分兑换平台简书贝市场记录分区",
+        tags=["数据源 / 简书积分兑换平台"],
+        cron="0 4 * * *",
+    ),
+)
 
-serve(*DEPLOYMENTS)
+if __name__ == "__main__":
+    serve(*DEPLOYMENTS)
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from models.beijiaoyi.ftn_market_record import FtnMarketRecord
+from models.beijiaoyi.ftn_market_summary_record import FtnMarketSummaryRecord
+from models.beijiaoyi.ftn_order import FtnOrder
+from models.beijiaoyi.user import User
+from utils.db import beijiaoyi_pool
+from utils.ftn_market_snapshot import (
+    BaseFtnMarketSnapshot,
+    FtnMarketSnapshotData,
+    FtnMarketSnapshotStore,
+)
+from utils.spool import ReplayResult
+
+_FtnMarketSnapshotData = FtnMarketSnapshotData[
+    FtnMarketRecord, FtnMarketSummaryRecord, User, FtnOrder
+]
+
+_STORE = FtnMarketSnapshotStore(
+    name="beijiaoyi",
+    pool=beijiaoyi_pool,
+    data_type=_FtnMarketSnapshotData,
+    ftn_market_record_model=FtnMarketRecord,
+    ftn_market_summary_record_model=FtnMarketSummaryRecord,
+    user_model=User,
+    ftn_order_model=FtnOrder,
+)
+
+
+class FtnMarketSnapshot(
+    BaseFtnMarketSnapshot[
+        FtnMarketRecord, FtnMarketSummaryRecord, User, FtnOrder, _FtnMarketSnapshotData
+    ]
+):
+    """单次采集的贝交易平台简书贝市场快照，包括用户、订单、市场记录与摘要数据。"""
+
+    _store = _STORE
+
+    @classmethod
+    async def replay_spooled(cls) -> ReplayResult:
+        return await _STORE.replay()
@@ -3,10 +3,12 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Literal
 
+from psycopg import AsyncConnection
 from sshared.postgres import Table
 from sshared.strict_struct import NonNegativeInt, PositiveFloat, PositiveInt
 
-from utils.db import beijiaoyi_pool
+from utils.db import beijiaoyi_pool, get_conn
+from utils.instrumentation import instrumented
 
 FtnMarketSummaryRecordType = Literal["BUY", "SELL"]
 
@@ -20,6 +22,7 @@ class FtnMarketSummaryRecord(Table, frozen=True):
     remaining_amount: int
 
     @classmethod
+    @instrumented("db.FtnMarketSummaryRecord.create")
     async def create(
         cls,
         *,
@@ -29,12 +32,15 @@ class FtnMarketSummaryRecord(Table, frozen=True):
         total_amount: int,
         traded_amount: int,
         remaining_amount: int,
+        conn: AsyncConnection | None = None,
+        ignore_conflicts: bool = False,
     ) -> None:
-        async with beijiaoyi_pool.get_conn() as conn:
-            await conn.cursor().execute(
+        async with get_conn(beijiaoyi_pool, conn) as current_conn:
+            await current_conn.cursor().execute(
                 "INSERT INTO ftn_market_summary_records (fetch_time, type, best_price, "
                 "total_amount, traded_amount, remaining_amount) "
-                "VALUES (%s, %s, %s, %s, %s, %s);",
+                "VALUES (%s, %s, %s, %s, %s, %s)"
+                + (" ON CONFLICT DO NOTHING;" if ignore_conflicts else ";"),
                 (
                     fetch_time,
                     type,
@@ -44,41 +50,3 @@ class FtnMarketSummaryRecord(Table, frozen=True):
                     remaining_amount,
                 ),
             )
-
-    @classmethod
-    async def create_from_ftn_market_records_by_fetch_time_and_type(
-        cls, *, fetch_time: datetime, type: FtnMarketSummaryRecordType
-    ) -> None:
-        async with beijiaoyi_pool.get_conn() as conn:
-            if type == "BUY":
-                cursor = await conn.cursor().execute(
-                    "SELECT MIN(price), SUM(total_amount), SUM(traded_amount), "
-                    "SUM(remaining_amount) FROM ftn_market_records "
-                    "JOIN ftn_orders ON ftn_market_records.id = ftn_orders.id "
-                    "WHERE type = 'BUY' AND fetch_time = %s;",
-                    (fetch_time,),
-                )
-            else:
-                cursor = await conn.cursor().execute(
-                    "SELECT MAX(price), SUM(total_amount), SUM(traded_amount), "
-                    "SUM(remaining_amount) FROM ftn_market_records "
-                    "JOIN ftn_orders ON ftn_market_records.id = ftn_orders.id "
-                    "WHERE type = 'SELL' AND fetch_time = %s;",
-                    (fetch_time,),
-                )
-
-            data = await cursor.fetchone()
-
-        # 如果没有订单数据，不做任何操作
-        if not data or data[0] is None:
-            return
-
-        best_price, total_amount, traded_amount, remaining_amount = data
-        await cls.create(
-            fetch_time=fetch_time,
-            type=type,
-            best_price=best_price,
-            total_amount=total_amount,
-            traded_amount=traded_amount,
-            remaining_amount=remaining_amount,
-        )
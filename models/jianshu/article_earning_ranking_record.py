@@ -6,6 +6,7 @@ from sshared.postgres import Table
 from sshared.strict_struct import NonEmptyStr, PositiveFloat, PositiveInt
 
 from utils.db import jianshu_pool
+from utils.instrumentation import instrumented
 
 
 class ArticleEarningRankingRecord(Table, frozen=True):
@@ -19,34 +20,7 @@ class ArticleEarningRankingRecord(Table, frozen=True):
     voter_earning: PositiveFloat
 
     @classmethod
-    async def create(
-        cls,
-        *,
-        date: date,
-        ranking: int,
-        slug: str | None,
-        title: str | None,
-        author_slug: str | None,
-        author_earning: float,
-        voter_earning: float,
-    ) -> None:
-        async with jianshu_pool.get_conn() as conn:
-            await conn.cursor().execute(
-                "INSERT INTO article_earning_ranking_records (date, ranking, "
-                "slug, title, author_slug, author_earning, voter_earning) "
-                "VALUES (%s, %s, %s, %s, %s, %s, %s);",
-                (
-                    date,
-                    ranking,
-                    slug,
-                    title,
-                    author_slug,
-                    author_earning,
-                    voter_earning,
-                ),
-            )
-
-    @classmethod
+    @instrumented("db.ArticleEarningRankingRecord.count_by_date")
     async def count_by_date(cls, date: date, /) -> int:
         async with jianshu_pool.get_conn() as conn:
             cursor = await conn.execute(
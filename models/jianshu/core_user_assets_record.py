@@ -6,6 +6,7 @@ from sshared.postgres import Table
 from sshared.strict_struct import NonEmptyStr, NonNegativeFloat
 
 from utils.db import jianshu_pool
+from utils.instrumentation import instrumented
 
 
 class CoreUserAssetsRecord(Table, frozen=True):
@@ -17,29 +18,7 @@ class CoreUserAssetsRecord(Table, frozen=True):
     assets: NonNegativeFloat | None
 
     @classmethod
-    async def create(
-        cls,
-        *,
-        time: datetime,
-        slug: str,
-        fp: float | None,
-        ftn: float | None,
-        assets: float | None,
-    ) -> None:
-        async with jianshu_pool.get_conn() as conn:
-            await conn.cursor().execute(
-                "INSERT INTO core_user_assets_records (time, slug, "
-                "fp, ftn, assets) VALUES (%s, %s, %s, %s, %s);",
-                (
-                    time,
-                    slug,
-                    fp,
-                    ftn,
-                    assets,
-                ),
-            )
-
-    @classmethod
+    @instrumented("db.CoreUserAssetsRecord.exists_by_time_and_slug")
     async def exists_by_time_and_slug(cls, *, time: datetime, slug: str) -> int:
         async with jianshu_pool.get_conn() as conn:
             cursor = await conn.execute(
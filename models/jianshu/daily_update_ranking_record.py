@@ -6,6 +6,7 @@ from sshared.postgres import Table
 from sshared.strict_struct import NonEmptyStr, PositiveInt
 
 from utils.db import jianshu_pool
+from utils.instrumentation import instrumented
 
 
 class DailyUpdateRankingRecord(Table, frozen=True):
@@ -15,20 +16,7 @@ class DailyUpdateRankingRecord(Table, frozen=True):
     days: PositiveInt
 
     @classmethod
-    async def create(cls, *, date: date, ranking: int, slug: str, days: int) -> None:
-        async with jianshu_pool.get_conn() as conn:
-            await conn.cursor().execute(
-                "INSERT INTO daily_update_ranking_records (date, ranking, "
-                "slug, days) VALUES (%s, %s, %s, %s);",
-                (
-                    date,
-                    ranking,
-                    slug,
-                    days,
-                ),
-            )
-
-    @classmethod
+    @instrumented("db.DailyUpdateRankingRecord.count_by_date")
     async def count_by_date(cls, date: date, /) -> int:
         async with jianshu_pool.get_conn() as conn:
             cursor = await conn.execute(
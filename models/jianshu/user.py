@@ -8,6 +8,7 @@ from sshared.postgres import Table
 from sshared.strict_struct import NonEmptyStr, PositiveInt
 
 from utils.db import jianshu_pool
+from utils.instrumentation import instrumented
 
 StatusType = Literal["NORMAL", "INACCESSIBLE"]
 
@@ -24,10 +25,12 @@ class User(Table, frozen=True):
     membership_expire_time: datetime | None
 
     @classmethod
+    @instrumented("db.User.create")
     async def create(
         cls,
         *,
         slug: str,
+        update_time: datetime,
         id: int,
         name: str,
         avatar_url: str | None,
@@ -42,7 +45,7 @@ class User(Table, frozen=True):
                 (
                     slug,
                     "NORMAL",
-                    datetime.now(),
+                    update_time,
                     id,
                     name,
                     [],
@@ -53,6 +56,7 @@ class User(Table, frozen=True):
             )
 
     @classmethod
+    @instrumented("db.User.get_by_slug")
     async def get_by_slug(cls, slug: str, /) -> User | None:
         async with jianshu_pool.get_conn() as conn:
             cursor = await conn.execute(
@@ -79,70 +83,108 @@ class User(Table, frozen=True):
         ).validate()
 
     @classmethod
-    async def update_by_slug(
+    @instrumented("db.User.get_update_times_by_slugs")
+    async def get_update_times_by_slugs(
+        cls, slugs: list[str], /
+    ) -> dict[str, datetime]:
+        if not slugs:
+            return {}
+
+        async with jianshu_pool.get_conn() as conn:
+            cursor = await conn.execute(
+                "SELECT slug, update_time FROM users WHERE slug = ANY(%s);",
+                (slugs,),
+            )
+
+            data = await cursor.fetchall()
+
+        return dict(data)
+
+    @classmethod
+    @instrumented("db.User.upsert")
+    async def upsert(
         cls,
         *,
         slug: str,
+        update_time: datetime,
+        id: int,
         name: str,
-        avatar_url: str,
+        avatar_url: str | None,
         membership_type: MembershipType,
         membership_expire_time: datetime | None,
     ) -> None:
-        old_data = await cls.get_by_slug(slug)
-        if old_data is None:
-            raise ValueError
+        async with jianshu_pool.get_conn() as conn:
+            await conn.execute(
+                "INSERT INTO users (slug, status, update_time, id, name, "
+                "history_names, avatar_url, membership_type, membership_expire_time) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) "
+                "ON CONFLICT (slug) DO UPDATE SET "
+                "update_time = EXCLUDED.update_time, name = EXCLUDED.name, "
+                # 如果 name 已修改，将旧数据的 name 添加到 history_names 中
+                "history_names = CASE WHEN users.name <> EXCLUDED.name "
+                "THEN array_append(users.history_names, users.name) "
+                "ELSE users.history_names END, "
+                "avatar_url = EXCLUDED.avatar_url, "
+                "membership_type = EXCLUDED.membership_type, "
+                "membership_expire_time = EXCLUDED.membership_expire_time "
+                # 避免竞争更新导致数据过时
+                "WHERE users.update_time <= EXCLUDED.update_time;",
+                (
+                    slug,
+                    "NORMAL",
+                    update_time,
+                    id,
+                    name,
+                    [],
+                    avatar_url,
+                    membership_type,
+                    membership_expire_time,
+                ),
+            )
 
-        # 避免竞争更新导致数据过时
-        if old_data.update_time > datetime.now():
+    @classmethod
+    @instrumented("db.User.upsert_many")
+    async def upsert_many(cls, data: list[User], /) -> None:
+        """批量插入或更新用户数据，data 中的 slug 不能重复。"""
+        if not data:
             return
 
-        async with jianshu_pool.get_conn() as conn, conn.transaction():
-            # 更新 update_time
+        async with jianshu_pool.get_conn() as conn:
             await conn.execute(
-                "UPDATE users SET update_time = %s WHERE slug = %s;",
-                (datetime.now(), slug),
+                "INSERT INTO users (slug, status, update_time, id, name, "
+                "history_names, avatar_url, membership_type, membership_expire_time) "
+                "SELECT slug, status, update_time, id, name, '{}', avatar_url, "
+                "membership_type, membership_expire_time "
+                "FROM unnest(%s::VARCHAR[], %s::enum_users_status[], "
+                "%s::TIMESTAMP[], %s::INTEGER[], %s::VARCHAR[], %s::TEXT[], "
+                "%s::enum_users_membership_type[], %s::TIMESTAMP[]) "
+                "AS data (slug, status, update_time, id, name, avatar_url, "
+                "membership_type, membership_expire_time) "
+                "ON CONFLICT (slug) DO UPDATE SET "
+                "update_time = EXCLUDED.update_time, name = EXCLUDED.name, "
+                # 如果 name 已修改，将旧数据的 name 添加到 history_names 中
+                "history_names = CASE WHEN users.name <> EXCLUDED.name "
+                "THEN array_append(users.history_names, users.name) "
+                "ELSE users.history_names END, "
+                "avatar_url = EXCLUDED.avatar_url, "
+                "membership_type = EXCLUDED.membership_type, "
+                "membership_expire_time = EXCLUDED.membership_expire_time "
+                # 避免竞争更新导致数据过时
+                "WHERE users.update_time <= EXCLUDED.update_time;",
+                (
+                    [item.slug for item in data],
+                    [item.status for item in data],
+                    [item.update_time for item in data],
+                    [item.id for item in data],
+                    [item.name for item in data],
+                    [item.avatar_url for item in data],
+                    [item.membership_type for item in data],
+                    [item.membership_expire_time for item in data],
+                ),
             )
 
-            # 如果 name 已修改
-            if name != old_data.name:
-                # 更新 name
-                await conn.execute(
-                    "UPDATE users SET name = %s WHERE slug = %s;",
-                    (name, slug),
-                )
-
-                # 将旧数据的 name 添加到 history_names 中
-                await conn.execute(
-                    "UPDATE users SET history_names = "
-                    "array_append(history_names, %s) WHERE slug = %s;",
-                    (old_data.name, slug),
-                )
-
-            # 如果旧数据中不存在 avatar_url 或 avatar_url 已修改
-            if old_data.avatar_url is None or avatar_url != old_data.avatar_url:
-                # 更新 avatar_url
-                await conn.execute(
-                    "UPDATE users SET avatar_url = %s WHERE slug = %s;",
-                    (avatar_url, slug),
-                )
-
-            # 如果 membership_type 已修改
-            if membership_type != old_data.membership_type:
-                # 更新 membership_type 和 membership_expire_time
-                await conn.execute(
-                    "UPDATE users SET membership_type = %s, "
-                    "membership_expire_time = %s WHERE slug = %s;",
-                    (membership_type, membership_expire_time, slug),
-                )
-            # 如果 membership_expire_time 已修改
-            elif membership_expire_time != old_data.membership_expire_time:
-                # 更新 membership_expire_time
-                await conn.execute(
-                    "UPDATE users SET membership_expire_time = %s WHERE slug = %s;",
-                    (membership_expire_time, slug),
-                )
-
     @classmethod
+    @instrumented("db.User.update_status_by_slug")
     async def update_status_by_slug(cls, *, slug: str, status: StatusType) -> None:
         async with jianshu_pool.get_conn() as conn:
             await conn.execute(
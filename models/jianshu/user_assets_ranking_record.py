@@ -6,6 +6,7 @@ from sshared.postgres import Table
 from sshared.strict_struct import NonEmptyStr, NonNegativeFloat, PositiveInt
 
 from utils.db import jianshu_pool
+from utils.instrumentation import instrumented
 
 
 class UserAssetsRankingRecord(Table, frozen=True):
@@ -18,31 +19,7 @@ class UserAssetsRankingRecord(Table, frozen=True):
     assets: NonNegativeFloat | None
 
     @classmethod
-    async def create(
-        cls,
-        *,
-        date: date,
-        ranking: int,
-        slug: str | None,
-        fp: float | None,
-        ftn: float | None,
-        assets: float | None,
-    ) -> None:
-        async with jianshu_pool.get_conn() as conn:
-            await conn.cursor().execute(
-                "INSERT INTO user_assets_ranking_records (date, ranking, "
-                "slug, fp, ftn, assets) VALUES (%s, %s, %s, %s, %s, %s);",
-                (
-                    date,
-                    ranking,
-                    slug,
-                    fp,
-                    ftn,
-                    assets,
-                ),
-            )
-
-    @classmethod
+    @instrumented("db.UserAssetsRankingRecord.count_by_date")
     async def count_by_date(cls, date: date, /) -> int:
         async with jianshu_pool.get_conn() as conn:
             cursor = await conn.execute(
@@ -55,3 +32,16 @@ class UserAssetsRankingRecord(Table, frozen=True):
                 raise ValueError
 
         return data[0]
+
+    @classmethod
+    @instrumented("db.UserAssetsRankingRecord.get_rankings_by_date")
+    async def get_rankings_by_date(cls, date: date, /) -> set[int]:
+        async with jianshu_pool.get_conn() as conn:
+            cursor = await conn.execute(
+                "SELECT ranking FROM user_assets_ranking_records WHERE date = %s;",
+                (date,),
+            )
+
+            data = await cursor.fetchall()
+
+        return {item[0] for item in data}
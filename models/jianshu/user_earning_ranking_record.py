@@ -7,6 +7,7 @@ from sshared.postgres import Table
 from sshared.strict_struct import NonEmptyStr, NonNegativeFloat, PositiveInt
 
 from utils.db import jianshu_pool
+from utils.instrumentation import instrumented
 
 UserEarningRankingRecordType = Literal["ALL", "CREATING", "VOTING"]
 
@@ -22,34 +23,33 @@ class UserEarningRankingRecord(Table, frozen=True):
     voting_earning: NonNegativeFloat
 
     @classmethod
-    async def create(
-        cls,
-        *,
-        date: date,
-        type: UserEarningRankingRecordType,
-        ranking: int,
-        slug: str | None,
-        total_earning: float,
-        creating_earning: float,
-        voting_earning: float,
-    ) -> None:
-        async with jianshu_pool.get_conn() as conn:
-            await conn.cursor().execute(
-                "INSERT INTO user_earning_ranking_records (date, type, "
-                "ranking, slug, total_earning, creating_earning, voting_earning) "
-                "VALUES (%s, %s, %s, %s, %s, %s, %s);",
-                (
-                    date,
-                    type,
-                    ranking,
-                    slug,
-                    total_earning,
-                    creating_earning,
-                    voting_earning,
-                ),
-            )
+    @instrumented("db.UserEarningRankingRecord.create_many")
+    async def create_many(cls, data: list[UserEarningRankingRecord], /) -> None:
+        if not data:
+            return
+
+        async with (
+            jianshu_pool.get_conn() as conn,
+            conn.cursor().copy(
+                "COPY user_earning_ranking_records (date, type, ranking, slug, "
+                "total_earning, creating_earning, voting_earning) FROM STDIN;"
+            ) as copy,
+        ):
+            for item in data:
+                await copy.write_row(
+                    (
+                        item.date,
+                        item.type,
+                        item.ranking,
+                        item.slug,
+                        item.total_earning,
+                        item.creating_earning,
+                        item.voting_earning,
+                    )
+                )
 
     @classmethod
+    @instrumented("db.UserEarningRankingRecord.count_by_date_and_type")
     async def count_by_date_and_type(
         cls, *, date: date, type: UserEarningRankingRecordType
     ) -> int:
@@ -65,3 +65,19 @@ class UserEarningRankingRecord(Table, frozen=True):
                 raise ValueError
 
         return data[0]
+
+    @classmethod
+    @instrumented("db.UserEarningRankingRecord.count_by_date_group_by_type")
+    async def count_by_date_group_by_type(
+        cls, date: date, /
+    ) -> dict[UserEarningRankingRecordType, int]:
+        async with jianshu_pool.get_conn() as conn:
+            cursor = await conn.execute(
+                "SELECT type, COUNT(*) FROM user_earning_ranking_records "
+                "WHERE date = %s GROUP BY type;",
+                (date,),
+            )
+
+            data = await cursor.fetchall()
+
+        return dict(data)
@@ -6,6 +6,7 @@ from sshared.postgres import Table
 from sshared.strict_struct import PositiveInt
 
 from utils.db import jianshu_pool
+from utils.instrumentation import instrumented
 
 
 class UsersCountRecord(Table, frozen=True):
@@ -13,6 +14,7 @@ class UsersCountRecord(Table, frozen=True):
     total_users_count: PositiveInt
 
     @classmethod
+    @instrumented("db.UsersCountRecord.exists_by_date")
     async def exists_by_date(cls, date: date, /) -> bool:
         async with jianshu_pool.get_conn() as conn:
             cursor = await conn.execute(
@@ -23,6 +25,7 @@ class UsersCountRecord(Table, frozen=True):
             return await cursor.fetchone() is not None
 
     @classmethod
+    @instrumented("db.UsersCountRecord.get_by_date")
     async def get_by_date(cls, date: date, /) -> UsersCountRecord | None:
         async with jianshu_pool.get_conn() as conn:
             cursor = await conn.execute(
@@ -41,6 +44,29 @@ class UsersCountRecord(Table, frozen=True):
         ).validate()
 
     @classmethod
+    @instrumented("db.UsersCountRecord.get_recent_by_date")
+    async def get_recent_by_date(
+        cls, date: date, /, *, limit: int
+    ) -> list[UsersCountRecord]:
+        async with jianshu_pool.get_conn() as conn:
+            cursor = await conn.execute(
+                "SELECT date, total_users_count FROM users_count_records "
+                "WHERE date <= %s ORDER BY date DESC LIMIT %s;",
+                (date, limit),
+            )
+
+            data = await cursor.fetchall()
+
+        return [
+            cls(
+                date=item[0],
+                total_users_count=item[1],
+            ).validate()
+            for item in data
+        ]
+
+    @classmethod
+    @instrumented("db.UsersCountRecord.create")
     async def create(cls, *, date: date, total_users_count: int) -> None:
         async with jianshu_pool.get_conn() as conn:
             await conn.execute(
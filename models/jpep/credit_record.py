@@ -2,13 +2,16 @@ from __future__ import annotations
 
 from datetime import datetime
 
+from psycopg import AsyncConnection
+from psycopg.sql import SQL, Identifier
 from sshared.postgres import Table
 from sshared.strict_struct import (
     NonNegativeInt,
     PositiveInt,
 )
 
-from utils.db import jpep_pool
+from utils.db import get_conn, jpep_pool
+from utils.instrumentation import instrumented
 
 
 class CreditRecord(Table, frozen=True):
@@ -17,29 +20,72 @@ class CreditRecord(Table, frozen=True):
     credit: NonNegativeInt
 
     @classmethod
-    async def create(cls, *, time: datetime, user_id: int, credit: int) -> None:
-        async with jpep_pool.get_conn() as conn:
-            await conn.execute(
-                "INSERT INTO credit_records (time, user_id, credit) VALUES "
-                "(%s, %s, %s);",
-                (time, user_id, credit),
-            )
+    @instrumented("db.CreditRecord.create_many")
+    async def create_many(
+        cls,
+        data: list[CreditRecord],
+        /,
+        *,
+        conn: AsyncConnection | None = None,
+        ignore_conflicts: bool = False,
+    ) -> None:
+        if not data:
+            return
+
+        async with (
+            get_conn(jpep_pool, conn) as current_conn,
+            current_conn.transaction(),
+        ):
+            # 数据可能已部分写入（如重放本地缓冲区数据时），先写入临时表，再忽略冲突合并
+            if ignore_conflicts:
+                await current_conn.execute(
+                    "CREATE TEMP TABLE credit_records_staging "
+                    "(LIKE credit_records) ON COMMIT DROP;"
+                )
+
+            async with current_conn.cursor().copy(
+                SQL("COPY {} (time, user_id, credit) FROM STDIN;").format(
+                    Identifier(
+                        "credit_records_staging"
+                        if ignore_conflicts
+                        else "credit_records"
+                    )
+                )
+            ) as copy:
+                for item in data:
+                    await copy.write_row((item.time, item.user_id, item.credit))
+
+            if ignore_conflicts:
+                await current_conn.execute(
+                    "INSERT INTO credit_records "
+                    "SELECT * FROM credit_records_staging ON CONFLICT DO NOTHING;"
+                )
+                # 同一事务中可能多次写入（如隔离问题数据时），写入后立即删除临时表
+                await current_conn.execute("DROP TABLE credit_records_staging;")
 
     @classmethod
-    async def get_by_user_id(cls, user_id: int) -> CreditRecord | None:
-        async with jpep_pool.get_conn() as conn:
-            cursor = await conn.execute(
-                "SELECT time, credit FROM credit_records WHERE user_id = %s "
-                "ORDER BY time DESC LIMIT 1;",
-                (user_id,),
+    @instrumented("db.CreditRecord.get_by_user_ids")
+    async def get_by_user_ids(
+        cls, user_ids: list[int], /, *, conn: AsyncConnection | None = None
+    ) -> dict[int, CreditRecord]:
+        if not user_ids:
+            return {}
+
+        async with get_conn(jpep_pool, conn) as current_conn:
+            cursor = await current_conn.execute(
+                "SELECT DISTINCT ON (user_id) user_id, time, credit "
+                "FROM credit_records WHERE user_id = ANY(%s) "
+                "ORDER BY user_id, time DESC;",
+                (user_ids,),
             )
 
-            data = await cursor.fetchone()
-        if not data:
-            return None
+            data = await cursor.fetchall()
 
-        return cls(
-            time=data[0],
-            user_id=user_id,
-            credit=data[1],
-        ).validate()
+        return {
+            item[0]: cls(
+                time=item[1],
+                user_id=item[0],
+                credit=item[2],
+            ).validate()
+            for item in data
+        }
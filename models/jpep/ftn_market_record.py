@@ -2,10 +2,14 @@ from __future__ import annotations
 
 from datetime import datetime
 
+from psycopg import AsyncConnection
+from psycopg.sql import SQL, Identifier
 from sshared.postgres import Table
 from sshared.strict_struct import NonNegativeInt, PositiveFloat, PositiveInt
 
-from utils.db import jpep_pool
+from utils.db import get_conn, jpep_pool
+from utils.instrumentation import instrumented
+from utils.partition import Partition
 
 
 class FtnMarketRecord(Table, frozen=True):
@@ -18,43 +22,149 @@ class FtnMarketRecord(Table, frozen=True):
     minimum_trade_amount: PositiveInt
     completed_trades_count: NonNegativeInt
 
+    def has_same_values(self, other: FtnMarketRecord, /) -> bool:
+        """除采集时间外，其余字段是否与另一条记录相同。"""
+        return (
+            self.id == other.id
+            and self.price == other.price
+            and self.total_amount == other.total_amount
+            and self.traded_amount == other.traded_amount
+            and self.remaining_amount == other.remaining_amount
+            and self.minimum_trade_amount == other.minimum_trade_amount
+            and self.completed_trades_count == other.completed_trades_count
+        )
+
     @classmethod
-    async def create(
+    @instrumented("db.FtnMarketRecord.create_many")
+    async def create_many(
         cls,
+        data: list[FtnMarketRecord],
+        /,
         *,
-        fetch_time: datetime,
-        id: int,
-        price: float,
-        total_amount: int,
-        traded_amount: int,
-        remaining_amount: int,
-        minimum_trade_amount: int,
-        completed_trades_count: int,
+        conn: AsyncConnection | None = None,
+        ignore_conflicts: bool = False,
     ) -> None:
-        async with jpep_pool.get_conn() as conn:
-            await conn.cursor().execute(
-                "INSERT INTO ftn_market_records (fetch_time, id, price, total_amount, "
+        if not data:
+            return
+
+        async with (
+            get_conn(jpep_pool, conn) as current_conn,
+            current_conn.transaction(),
+        ):
+            # 数据可能已部分写入（如重放本地缓冲区数据时），先写入临时表，再忽略冲突合并
+            if ignore_conflicts:
+                await current_conn.execute(
+                    "CREATE TEMP TABLE ftn_market_records_staging "
+                    "(LIKE ftn_market_records) ON COMMIT DROP;"
+                )
+
+            async with current_conn.cursor().copy(
+                SQL(
+                    "COPY {} (fetch_time, id, price, total_amount, "
+                    "traded_amount, remaining_amount, minimum_trade_amount, "
+                    "completed_trades_count) FROM STDIN;"
+                ).format(
+                    Identifier(
+                        "ftn_market_records_staging"
+                        if ignore_conflicts
+                        else "ftn_market_records"
+                    )
+                )
+            ) as copy:
+                for item in data:
+                    await copy.write_row(
+                        (
+                            item.fetch_time,
+                            item.id,
+                            item.price,
+                            item.total_amount,
+                            item.traded_amount,
+                            item.remaining_amount,
+                            item.minimum_trade_amount,
+                            item.completed_trades_count,
+                        )
+                    )
+
+            if ignore_conflicts:
+                await current_conn.execute(
+                    "INSERT INTO ftn_market_records "
+                    "SELECT * FROM ftn_market_records_staging ON CONFLICT DO NOTHING;"
+                )
+                # 同一事务中可能多次写入（如隔离问题数据时），写入后立即删除临时表
+                await current_conn.execute("DROP TABLE ftn_market_records_staging;")
+
+    @classmethod
+    @instrumented("db.FtnMarketRecord.get_latest_by_ids")
+    async def get_latest_by_ids(
+        cls, ids: list[int], /, *, conn: AsyncConnection | None = None
+    ) -> dict[int, FtnMarketRecord]:
+        if not ids:
+            return {}
+
+        async with get_conn(jpep_pool, conn) as current_conn:
+            cursor = await current_conn.execute(
+                "SELECT DISTINCT ON (id) fetch_time, id, price, total_amount, "
                 "traded_amount, remaining_amount, minimum_trade_amount, "
-                "completed_trades_count) "
-                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s);",
-                (
-                    fetch_time,
-                    id,
-                    price,
-                    total_amount,
-                    traded_amount,
-                    remaining_amount,
-                    minimum_trade_amount,
-                    completed_trades_count,
-                ),
+                "completed_trades_count "
+                "FROM ftn_market_records WHERE id = ANY(%s) "
+                "ORDER BY id, fetch_time DESC;",
+                (ids,),
             )
 
+            data = await cursor.fetchall()
+
+        return {
+            item[1]: cls(
+                fetch_time=item[0],
+                id=item[1],
+                # NUMERIC 类型读取为 Decimal
+                price=float(item[2]),
+                total_amount=item[3],
+                traded_amount=item[4],
+                remaining_amount=item[5],
+                minimum_trade_amount=item[6],
+                completed_trades_count=item[7],
+            ).validate()
+            for item in data
+        }
+
     @classmethod
-    async def exists_by_fetch_time(cls, fetch_time: datetime, /) -> bool:
+    @instrumented("db.FtnMarketRecord.get_partitions")
+    async def get_partitions(cls) -> list[Partition]:
         async with jpep_pool.get_conn() as conn:
             cursor = await conn.execute(
-                "SELECT 1 FROM ftn_market_records WHERE fetch_time = %s LIMIT 1;",
-                (fetch_time,),
+                "SELECT pg_class.relname, "
+                "pg_get_expr(pg_class.relpartbound, pg_class.oid) FROM pg_inherits "
+                "JOIN pg_class ON pg_inherits.inhrelid = pg_class.oid "
+                "WHERE pg_inherits.inhparent = 'ftn_market_records'::regclass;"
             )
 
-            return await cursor.fetchone() is not None
+            data = await cursor.fetchall()
+
+        result: list[Partition] = []
+        for name, bound_expr in data:
+            partition = Partition.from_bound_expr(name=name, bound_expr=bound_expr)
+            if partition:
+                result.append(partition)
+
+        return sorted(result, key=lambda x: x.start_time)
+
+    @classmethod
+    @instrumented("db.FtnMarketRecord.create_partition")
+    async def create_partition(
+        cls, *, name: str, start_time: datetime, end_time: datetime
+    ) -> None:
+        async with jpep_pool.get_conn() as conn:
+            await conn.execute(
+                "SELECT create_ftn_market_records_partition(%s, %s, %s);",
+                (name, start_time, end_time),
+            )
+
+    @classmethod
+    @instrumented("db.FtnMarketRecord.detach_partition")
+    async def detach_partition(cls, name: str, /) -> None:
+        async with jpep_pool.get_conn() as conn:
+            await conn.execute(
+                "SELECT detach_ftn_market_records_partition(%s);",
+                (name,),
+            )
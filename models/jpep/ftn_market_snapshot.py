@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from msgspec import field
+from msgspec.structs import replace
+from psycopg import AsyncConnection
+
+from models.jpep.credit_record import CreditRecord
+from models.jpep.ftn_market_record import FtnMarketRecord
+from models.jpep.ftn_market_summary_record import (
+    FtnMarketSummaryRecord,
+    FtnMarketSummaryRecordType,
+)
+from models.jpep.ftn_order import FtnOrder
+from models.jpep.user import User
+from utils.db import jpep_pool
+from utils.ftn_market_snapshot import (
+    BaseFtnMarketSnapshot,
+    FtnMarketSnapshotData,
+    FtnMarketSnapshotStore,
+)
+from utils.spool import ReplayResult
+
+
+class _FtnMarketSnapshotData(
+    FtnMarketSnapshotData[FtnMarketRecord, FtnMarketSummaryRecord, User, FtnOrder],
+    frozen=True,
+):
+    # 早期版本的本地缓冲区数据中不包含以下字段
+    credit_records: list[CreditRecord] = field(default_factory=list)
+
+
+class _FtnMarketSnapshotStore(
+    FtnMarketSnapshotStore[
+        FtnMarketRecord, FtnMarketSummaryRecord, User, FtnOrder, _FtnMarketSnapshotData
+    ]
+):
+    async def _write_extra_data(
+        self,
+        data: _FtnMarketSnapshotData,
+        /,
+        *,
+        conn: AsyncConnection,
+        ignore_conflicts: bool,
+    ) -> None:
+        # 如果信用值记录不存在或已更新，创建新的信用值记录
+        latest_credit_records = await CreditRecord.get_by_user_ids(
+            [item.user_id for item in data.credit_records], conn=conn
+        )
+        await CreditRecord.create_many(
+            [
+                item
+                for item in data.credit_records
+                if item.user_id not in latest_credit_records
+                or item.credit != latest_credit_records[item.user_id].credit
+            ],
+            conn=conn,
+            ignore_conflicts=ignore_conflicts,
+        )
+
+
+_STORE = _FtnMarketSnapshotStore(
+    name="jpep",
+    pool=jpep_pool,
+    data_type=_FtnMarketSnapshotData,
+    ftn_market_record_model=FtnMarketRecord,
+    ftn_market_summary_record_model=FtnMarketSummaryRecord,
+    user_model=User,
+    ftn_order_model=FtnOrder,
+)
+
+
+class FtnMarketSnapshot(
+    BaseFtnMarketSnapshot[
+        FtnMarketRecord, FtnMarketSummaryRecord, User, FtnOrder, _FtnMarketSnapshotData
+    ]
+):
+    """单次采集的简书积分兑换平台简书贝市场快照，在通用快照的基础上包括用户的信用值。"""
+
+    _store = _STORE
+
+    def __init__(
+        self,
+        *,
+        fetch_time: datetime,
+        type: FtnMarketSummaryRecordType,
+        delta_storage: bool = False,
+    ) -> None:
+        super().__init__(fetch_time=fetch_time, type=type, delta_storage=delta_storage)
+
+        self.credit_records: dict[int, CreditRecord] = {}
+
+    def add_credit_record(self, record: CreditRecord, /) -> None:
+        self.credit_records[record.user_id] = record
+
+    def _get_data(self) -> _FtnMarketSnapshotData:
+        return replace(
+            super()._get_data(), credit_records=list(self.credit_records.values())
+        )
+
+    @classmethod
+    async def replay_spooled(cls) -> ReplayResult:
+        return await _STORE.replay()
@@ -3,10 +3,12 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Literal
 
+from psycopg import AsyncConnection
 from sshared.postgres import Table
 from sshared.strict_struct import PositiveInt
 
-from utils.db import jpep_pool
+from utils.db import get_conn, jpep_pool
+from utils.instrumentation import instrumented
 
 FtnOrdersType = Literal["BUY", "SELL"]
 
@@ -19,53 +21,39 @@ class FtnOrder(Table, frozen=True):
     last_seen_time: datetime
 
     @classmethod
-    async def create(
-        cls,
-        *,
-        id: int,
-        type: FtnOrdersType,
-        publisher_id: int,
-        publish_time: datetime,
-        last_seen_time: datetime,
-    ) -> None:
-        async with jpep_pool.get_conn() as conn:
-            await conn.execute(
+    @instrumented("db.FtnOrder.upsert_many")
+    async def upsert_many(
+        cls, data: list[FtnOrder], /, *, conn: AsyncConnection | None = None
+    ) -> tuple[int, int]:
+        """插入新订单，并更新已有订单的最后出现时间。
+
+        data 中的 id 不能重复，返回新订单数量与再次出现的订单数量。
+        """
+        if not data:
+            return 0, 0
+
+        async with get_conn(jpep_pool, conn) as current_conn:
+            cursor = await current_conn.execute(
                 "INSERT INTO ftn_orders (id, type, publisher_id, publish_time, "
-                "last_seen_time) VALUES (%s, %s, %s, %s, %s);",
+                "last_seen_time) "
+                "SELECT * FROM unnest(%s::INTEGER[], %s::enum_ftn_orders_type[], "
+                "%s::INTEGER[], %s::TIMESTAMP[], %s::TIMESTAMP[]) "
+                "ON CONFLICT (id) DO UPDATE SET "
+                # 重放本地缓冲区中较早的快照时，不回退最后出现时间
+                "last_seen_time = GREATEST(ftn_orders.last_seen_time, "
+                "EXCLUDED.last_seen_time) "
+                # 新插入的行 xmax 为 0
+                "RETURNING xmax = 0;",
                 (
-                    id,
-                    type,
-                    publisher_id,
-                    publish_time,
-                    last_seen_time,
+                    [item.id for item in data],
+                    [item.type for item in data],
+                    [item.publisher_id for item in data],
+                    [item.publish_time for item in data],
+                    [item.last_seen_time for item in data],
                 ),
             )
 
-    @classmethod
-    async def get_by_id(cls, id: int, /) -> FtnOrder | None:
-        async with jpep_pool.get_conn() as conn:
-            cursor = await conn.execute(
-                "SELECT type, publisher_id, publish_time, last_seen_time "
-                "FROM ftn_orders WHERE id = %s;",
-                (id,),
-            )
+            data_inserted = await cursor.fetchall()
 
-            data = await cursor.fetchone()
-        if not data:
-            return None
-
-        return cls(
-            id=id,
-            type=data[0],
-            publisher_id=data[1],
-            publish_time=data[2],
-            last_seen_time=data[3],
-        ).validate()
-
-    @classmethod
-    async def update_by_id(cls, *, id: int, last_seen_time: datetime) -> None:
-        async with jpep_pool.get_conn() as conn:
-            await conn.execute(
-                "UPDATE ftn_orders SET last_seen_time = %s WHERE id = %s;",
-                (last_seen_time, id),
-            )
+        new_count = sum(1 for (inserted,) in data_inserted if inserted)
+        return new_count, len(data_inserted) - new_count
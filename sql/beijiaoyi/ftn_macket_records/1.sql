@@ -0,0 +1,41 @@
+-- date: 2026-10-18
+-- description: 修正分区边界，添加 BRIN 索引与分区管理函数
+
+-- 原分区上界为 23:59:59，跨年时存在一秒的空隙
+ALTER TABLE ftn_market_records DETACH PARTITION ftn_market_records_2025;
+ALTER TABLE ftn_market_records ATTACH PARTITION ftn_market_records_2025
+FOR VALUES FROM ('2025-01-01 00:00:00') TO ('2026-01-01 00:00:00');
+
+CREATE INDEX idx_ftn_market_records_fetch_time ON ftn_market_records USING BRIN (fetch_time);
+
+CREATE FUNCTION create_ftn_market_records_partition(
+    partition_name TEXT,
+    start_time TIMESTAMP,
+    end_time TIMESTAMP
+) RETURNS VOID LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+    IF partition_name !~ '^ftn_market_records_[0-9_]+$' THEN
+        RAISE EXCEPTION 'invalid partition name: %', partition_name;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF ftn_market_records FOR VALUES FROM (%L) TO (%L);',
+        partition_name, start_time, end_time
+    );
+END;
+$$;
+
+CREATE FUNCTION detach_ftn_market_records_partition(
+    partition_name TEXT
+) RETURNS VOID LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+    IF partition_name !~ '^ftn_market_records_[0-9_]+$' THEN
+        RAISE EXCEPTION 'invalid partition name: %', partition_name;
+    END IF;
+
+    EXECUTE format('ALTER TABLE ftn_market_records DETACH PARTITION %I;', partition_name);
+END;
+$$;
+
+REVOKE ALL ON FUNCTION create_ftn_market_records_partition(TEXT, TIMESTAMP, TIMESTAMP) FROM PUBLIC;
+REVOKE ALL ON FUNCTION detach_ftn_market_records_partition(TEXT) FROM PUBLIC;
\ No newline at end of file
@@ -0,0 +1,4 @@
+-- date: 2026-10-18
+-- description: 添加按订单查询最新记录的索引，用于增量存储模式
+
+CREATE INDEX idx_ftn_market_records_id_fetch_time ON ftn_market_records (id, fetch_time DESC);
\ No newline at end of file
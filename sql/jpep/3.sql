@@ -0,0 +1,5 @@
+-- date: 2026-10-18
+-- description: 添加分区管理函数的执行权限
+
+GRANT EXECUTE ON FUNCTION create_ftn_market_records_partition(TEXT, TIMESTAMP, TIMESTAMP) TO jfetcher;
+GRANT EXECUTE ON FUNCTION detach_ftn_market_records_partition(TEXT) TO jfetcher;
\ No newline at end of file
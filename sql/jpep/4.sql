@@ -0,0 +1,38 @@
+-- date: 2026-10-18
+-- description: 添加还原简书贝市场完整快照的函数，用于增量存储模式
+
+-- 增量存储模式下仅写入字段有变化的市场记录，订单在采集时间仍存在
+--（last_seen_time 不早于采集时间）时，取其在该时间之前的最新记录
+CREATE FUNCTION get_ftn_market_records_snapshot(
+    snapshot_fetch_time TIMESTAMP,
+    snapshot_type enum_ftn_orders_type
+) RETURNS TABLE (
+    fetch_time TIMESTAMP,
+    id INTEGER,
+    price NUMERIC,
+    total_amount INTEGER,
+    traded_amount INTEGER,
+    remaining_amount INTEGER,
+    minimum_trade_amount INTEGER,
+    completed_trades_count SMALLINT
+) LANGUAGE sql STABLE AS $$
+    SELECT
+        snapshot_fetch_time,
+        latest_record.id,
+        latest_record.price,
+        latest_record.total_amount,
+        latest_record.traded_amount,
+        latest_record.remaining_amount,
+        latest_record.minimum_trade_amount,
+        latest_record.completed_trades_count
+    FROM ftn_orders
+    CROSS JOIN LATERAL (
+        SELECT * FROM ftn_market_records
+        WHERE ftn_market_records.id = ftn_orders.id
+            AND ftn_market_records.fetch_time <= snapshot_fetch_time
+        ORDER BY ftn_market_records.fetch_time DESC
+        LIMIT 1
+    ) AS latest_record
+    WHERE ftn_orders.type = snapshot_type
+        AND ftn_orders.last_seen_time >= snapshot_fetch_time;
+$$;
\ No newline at end of file
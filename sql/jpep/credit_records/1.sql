@@ -0,0 +1,4 @@
+-- date: 2026-10-18
+-- description: 添加 user_id 与 time 索引以加速查询最新信用值
+
+CREATE INDEX idx_credit_records_user_id_time ON credit_records (user_id, time DESC);
\ No newline at end of file
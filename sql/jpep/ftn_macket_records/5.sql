@@ -0,0 +1,16 @@
+-- date: 2026-10-18
+-- description: 分离分区时授予查询权限，以便归档已分离的分区
+
+-- 已分离的分区无法通过主表查询，归档工具直接读取分区表
+CREATE OR REPLACE FUNCTION detach_ftn_market_records_partition(
+    partition_name TEXT
+) RETURNS VOID LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+    IF partition_name !~ '^ftn_market_records_[0-9_]+$' THEN
+        RAISE EXCEPTION 'invalid partition name: %', partition_name;
+    END IF;
+
+    EXECUTE format('ALTER TABLE ftn_market_records DETACH PARTITION %I;', partition_name);
+    EXECUTE format('GRANT SELECT ON TABLE %I TO jfetcher;', partition_name);
+END;
+$$;
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from asyncio import Task, create_task, shield
+from collections import OrderedDict
+from collections.abc import Awaitable
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from time import time
+from typing import Callable, Generic, TypeVar
+from uuid import uuid4
+
+from anyio import to_thread
+from jkit.user import InfoData, User
+from msgspec import DecodeError, Struct
+from msgspec.msgpack import Decoder, encode
+from sshared.retry import retry
+
+from utils.config import CONFIG
+from utils.retry import NETWORK_REQUEST_RETRY_PARAMS
+
+V = TypeVar("V")
+
+
+class CacheEntry(Struct, Generic[V], frozen=True):
+    # 值的获取时间（Unix 时间戳）
+    time: float
+    value: V
+
+
+class AsyncCache(Generic[V]):
+    """带有过期时间与 LRU 淘汰的异步缓存。
+
+    同一个键的并发请求会合并为一次获取。Prefect 中每次 Flow 运行都在独立进程中
+    进行，设置 directory 时，缓存同时写入本地文件，以便在多次运行之间共享，
+    每个进程首次写入文件时清理已过期的文件。文件读写在工作线程中进行，不阻塞事件循环。
+    获取失败时不缓存，异常传递给所有等待该键的调用方。
+    """
+
+    def __init__(
+        self,
+        value_type: type[V],
+        /,
+        *,
+        ttl: float,
+        max_size: int,
+        directory: Path | None = None,
+    ) -> None:
+        self._ttl = ttl
+        self._max_size = max_size
+        self._directory = directory
+        self._decoder = Decoder(CacheEntry[value_type])
+        self._files_pruned = False
+
+        self._entries: OrderedDict[str, CacheEntry[V]] = OrderedDict()
+        self._in_flight: dict[str, Task[CacheEntry[V]]] = {}
+
+        self.hits_count = 0
+        self.file_hits_count = 0
+        self.misses_count = 0
+        self.coalesced_count = 0
+
+    def _is_fresh(self, entry: CacheEntry[V], /) -> bool:
+        return time() - entry.time < self._ttl
+
+    def _set_entry(self, key: str, entry: CacheEntry[V], /) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def _read_file(self, key: str, /) -> CacheEntry[V] | None:
+        if not self._directory:
+            return None
+
+        try:
+            entry = self._decoder.decode((self._directory / key).read_bytes())
+        except (FileNotFoundError, DecodeError):
+            return None
+
+        return entry if self._is_fresh(entry) else None
+
+    def _prune_files(self, directory: Path, /) -> None:
+        # 缓存文件的修改时间即为写入时间，包括进程中断时遗留的临时文件
+        expire_time = time() - self._ttl
+        for file in directory.iterdir():
+            try:
+                if file.stat().st_mtime < expire_time:
+                    file.unlink(missing_ok=True)
+            except FileNotFoundError:
+                continue
+
+    def _write_file(
+        self, key: str, entry: CacheEntry[V], /, *, prune_files: bool
+    ) -> None:
+        if not self._directory:
+            return
+
+        self._directory.mkdir(parents=True, exist_ok=True)
+        if prune_files:
+            self._prune_files(self._directory)
+
+        # 其它进程可能同时写入同一个键，使用唯一的临时文件名
+        temp_file = self._directory / f"{key}.{uuid4().hex[:8]}.tmp"
+        temp_file.write_bytes(encode(entry))
+        temp_file.replace(self._directory / key)
+
+    async def _load(
+        self, key: str, fetch: Callable[[], Awaitable[V]], /
+    ) -> CacheEntry[V]:
+        try:
+            entry = (
+                await to_thread.run_sync(self._read_file, key)
+                if self._directory
+                else None
+            )
+            if entry:
+                self.file_hits_count += 1
+            else:
+                self.misses_count += 1
+                entry = CacheEntry(time=time(), value=await fetch())
+
+                if self._directory:
+                    prune_files = not self._files_pruned
+                    self._files_pruned = True
+                    await to_thread.run_sync(
+                        partial(self._write_file, key, entry, prune_files=prune_files)
+                    )
+
+            self._set_entry(key, entry)
+            return entry
+        finally:
+            del self._in_flight[key]
+
+    async def get(
+        self, key: str, fetch: Callable[[], Awaitable[V]], /
+    ) -> CacheEntry[V]:
+        """获取缓存的值及其获取时间，不存在或已过期时调用 fetch 获取。
+
+        key 会用作文件名，调用方需保证其不包含路径分隔符。
+        """
+        entry = self._entries.get(key)
+        if entry and self._is_fresh(entry):
+            self.hits_count += 1
+            self._entries.move_to_end(key)
+            return entry
+
+        if key in self._in_flight:
+            self.coalesced_count += 1
+        else:
+            self._in_flight[key] = create_task(self._load(key, fetch))
+
+        # 某个调用方被取消时，不影响其它等待同一个键的调用方
+        return await shield(self._in_flight[key])
+
+
+USER_INFO_CACHE: AsyncCache[InfoData] = AsyncCache(
+    InfoData,
+    ttl=CONFIG.cache.user_info_ttl,
+    max_size=CONFIG.cache.user_info_max_size,
+    directory=Path(CONFIG.cache.path) / "jianshu_user_info",
+)
+
+
+@retry(**NETWORK_REQUEST_RETRY_PARAMS)
+async def _fetch_user_info(user: User, /) -> InfoData:
+    return await user.info
+
+
+async def get_cached_user_info(user: User, /) -> tuple[InfoData, datetime]:
+    """获取简书用户信息及其获取时间，同一用户在缓存有效期内只请求一次。
+
+    缓存的数据可能是之前获取的，写入数据库时应以获取时间作为更新时间。
+    """
+    entry = await USER_INFO_CACHE.get(user.slug, lambda: _fetch_user_info(user))
+    return entry.value, datetime.fromtimestamp(entry.time)
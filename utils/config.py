@@ -1,5 +1,69 @@
+from msgspec import field
 from sshared.config import ConfigBase
-from sshared.config.blocks import PostgresBlock
+from sshared.config.blocks import ConfigBlock, PostgresBlock
+from sshared.strict_struct import (
+    NonEmptyStr,
+    NonNegativeInt,
+    PositiveFloat,
+    PositiveInt,
+)
+
+
+class _PoolBlock(ConfigBlock, frozen=True):
+    # 预热时创建的连接数
+    min_size: NonNegativeInt
+    max_size: PositiveInt
+
+    def __post_init__(self) -> None:
+        if self.min_size > self.max_size:
+            raise ValueError("min_size 不能大于 max_size")
+
+
+class _PoolsBlock(ConfigBlock, frozen=True):
+    jianshu: _PoolBlock = field(
+        default_factory=lambda: _PoolBlock(min_size=2, max_size=4)
+    )
+    jpep: _PoolBlock = field(default_factory=lambda: _PoolBlock(min_size=2, max_size=2))
+    beijiaoyi: _PoolBlock = field(
+        default_factory=lambda: _PoolBlock(min_size=2, max_size=2)
+    )
+
+
+class _SpoolBlock(ConfigBlock, frozen=True):
+    path: NonEmptyStr = "spool"
+    max_size_mb: PositiveInt = 1024
+    # 数据库写入超时时间（秒），超时后写入本地缓冲区
+    db_write_timeout: PositiveFloat = 5
+    # 每次运行重放本地缓冲区的时间上限（秒），未重放的快照在之后的运行中重放
+    replay_time_limit: PositiveFloat = 5
+
+
+class _CacheBlock(ConfigBlock, frozen=True):
+    path: NonEmptyStr = "cache"
+    # 简书用户信息缓存有效期（秒）
+    user_info_ttl: PositiveInt = 86400
+    # 内存中缓存的简书用户信息数量上限
+    user_info_max_size: PositiveInt = 10000
+
+
+class _DeadLetterBlock(ConfigBlock, frozen=True):
+    # 批量写入时被隔离的问题数据，以及无法重放的本地缓冲区分段的保存目录
+    path: NonEmptyStr = "dead_letters"
+
+
+class _RateLimiterBlock(ConfigBlock, frozen=True):
+    # 各数据源限流状态文件的保存目录，同时运行的多个 Flow 通过其共享限制
+    path: NonEmptyStr = "rate_limiter"
+
+
+class _UserRefreshBlock(ConfigBlock, frozen=True):
+    # 简书用户在该时间（秒）内更新过时，跳过刷新，为 0 时总是刷新
+    fresh_window: NonNegativeInt = 3600
+
+
+class _MetricsBlock(ConfigBlock, frozen=True):
+    # Prometheus textfile 输出目录，为空时不输出
+    prometheus_textfile_dir: str = ""
 
 
 class _Config(ConfigBase, frozen=True):
@@ -9,6 +73,13 @@ class _Config(ConfigBase, frozen=True):
     jianshu_postgres: PostgresBlock
     jpep_postgres: PostgresBlock
     beijiaoyi_postgres: PostgresBlock
+    pools: _PoolsBlock = field(default_factory=_PoolsBlock)
+    spool: _SpoolBlock = field(default_factory=_SpoolBlock)
+    cache: _CacheBlock = field(default_factory=_CacheBlock)
+    dead_letter: _DeadLetterBlock = field(default_factory=_DeadLetterBlock)
+    rate_limiter: _RateLimiterBlock = field(default_factory=_RateLimiterBlock)
+    user_refresh: _UserRefreshBlock = field(default_factory=_UserRefreshBlock)
+    metrics: _MetricsBlock = field(default_factory=_MetricsBlock)
 
 
 CONFIG = _Config.load_from_file("config.toml")
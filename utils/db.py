@@ -1,24 +1,211 @@
+from __future__ import annotations
+
+from asyncio import gather, wait_for
+from collections.abc import AsyncGenerator, Coroutine
+from contextlib import asynccontextmanager
+from functools import wraps
+from time import perf_counter
+from typing import Any, Callable, Literal, TypeVar
+from weakref import WeakSet
+
+from msgspec import Struct
+from psycopg import AsyncConnection
+from sshared.config.blocks import PostgresBlock
 from sshared.postgres import Pool, enhance_json_process
+from typing_extensions import ParamSpec
 
 from utils.config import CONFIG
 
+P = ParamSpec("P")
+R = TypeVar("R")
+
+PoolNameType = Literal["jianshu", "jpep", "beijiaoyi"]
+
 enhance_json_process()
 
-jianshu_pool = Pool(
-    CONFIG.jianshu_postgres.connection_string,
-    min_size=2,
-    max_size=4,
-    app_name="JFetcher",
+
+class PoolStats(Struct, frozen=True):
+    in_use_conns_count: int
+    idle_conns_count: int
+    max_in_use_conns_count: int
+    acquires_count: int
+    total_wait_seconds: float
+    max_wait_seconds: float
+
+
+class LazyPool:
+    """首次使用时才创建的连接池。
+
+    同时统计获取连接的等待时间与连接使用情况。sshared 的连接池未公开其连接数量，
+    连接使用情况根据获取过的连接与预热创建的连接估计。
+    """
+
+    def __init__(
+        self, postgres: PostgresBlock, /, *, min_size: int, max_size: int
+    ) -> None:
+        self._connection_string = postgres.connection_string
+        self._min_size = min_size
+        self._max_size = max_size
+
+        self._pool: Pool | None = None
+
+        # 获取过的连接，被连接池丢弃（如连接异常）后自动移除
+        self._conns: WeakSet[AsyncConnection] = WeakSet()
+        # 预热完成时连接池中的连接数
+        self._prepared_conns_count = 0
+        self._in_use_conns_count = 0
+        self.reset_stats()
+
+    def _get_pool(self) -> Pool:
+        if self._pool is None:
+            self._pool = Pool(
+                self._connection_string,
+                min_size=self._min_size,
+                max_size=self._max_size,
+                app_name="JFetcher",
+            )
+
+        return self._pool
+
+    def reset_stats(self) -> None:
+        self._max_in_use_conns_count = self._in_use_conns_count
+        self._acquires_count = 0
+        self._total_wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+
+    @property
+    def stats(self) -> PoolStats:
+        open_conns_count = max(
+            sum(1 for conn in self._conns if not conn.closed),
+            self._prepared_conns_count,
+        )
+        idle_conns_count = max(open_conns_count - self._in_use_conns_count, 0)
+
+        return PoolStats(
+            in_use_conns_count=self._in_use_conns_count,
+            idle_conns_count=idle_conns_count,
+            max_in_use_conns_count=self._max_in_use_conns_count,
+            acquires_count=self._acquires_count,
+            total_wait_seconds=self._total_wait_seconds,
+            max_wait_seconds=self._max_wait_seconds,
+        )
+
+    async def prepare(self, *, timeout: float = 2) -> None:
+        """预热连接池，创建 min_size 个连接。
+
+        sshared 创建连接失败时会无限重试，预热仅为优化，超时或失败时直接返回，
+        数据库不可用的情况由实际写入处理（如写入本地缓冲区）。
+        """
+        try:
+            await wait_for(self._get_pool().prepare(), timeout=timeout)
+        except Exception:  # noqa: BLE001
+            return
+
+        self._prepared_conns_count = max(self._prepared_conns_count, self._min_size)
+
+    async def close(self) -> None:
+        """关闭连接池中的空闲连接，之后再次使用时将重新创建连接池。"""
+        if self._pool is None:
+            return
+
+        pool, self._pool = self._pool, None
+        self._prepared_conns_count = 0
+        await pool.close()
+
+    @asynccontextmanager
+    async def get_conn(self) -> AsyncGenerator[AsyncConnection]:
+        start_time = perf_counter()
+        async with self._get_pool().get_conn() as conn:
+            wait_seconds = perf_counter() - start_time
+            self._acquires_count += 1
+            self._total_wait_seconds += wait_seconds
+            self._max_wait_seconds = max(self._max_wait_seconds, wait_seconds)
+
+            self._conns.add(conn)
+            self._in_use_conns_count += 1
+            self._max_in_use_conns_count = max(
+                self._max_in_use_conns_count, self._in_use_conns_count
+            )
+            try:
+                yield conn
+            finally:
+                self._in_use_conns_count -= 1
+
+
+jianshu_pool = LazyPool(
+    CONFIG.jianshu_postgres,
+    min_size=CONFIG.pools.jianshu.min_size,
+    max_size=CONFIG.pools.jianshu.max_size,
 )
-jpep_pool = Pool(
-    CONFIG.jpep_postgres.connection_string,
-    min_size=2,
-    max_size=2,
-    app_name="JFetcher",
+jpep_pool = LazyPool(
+    CONFIG.jpep_postgres,
+    min_size=CONFIG.pools.jpep.min_size,
+    max_size=CONFIG.pools.jpep.max_size,
 )
-beijiaoyi_pool = Pool(
-    CONFIG.beijiaoyi_postgres.connection_string,
-    min_size=2,
-    max_size=2,
-    app_name="JFetcher",
+beijiaoyi_pool = LazyPool(
+    CONFIG.beijiaoyi_postgres,
+    min_size=CONFIG.pools.beijiaoyi.min_size,
+    max_size=CONFIG.pools.beijiaoyi.max_size,
 )
+
+POOLS: dict[PoolNameType, LazyPool] = {
+    "jianshu": jianshu_pool,
+    "jpep": jpep_pool,
+    "beijiaoyi": beijiaoyi_pool,
+}
+
+
+def get_pool_stats() -> dict[PoolNameType, PoolStats]:
+    """获取已使用过的连接池的统计数据。"""
+    return {
+        name: pool.stats for name, pool in POOLS.items() if pool.stats.acquires_count
+    }
+
+
+async def close_pools() -> None:
+    await gather(*(pool.close() for pool in POOLS.values()))
+
+
+def use_pools(
+    *pools: LazyPool,
+) -> Callable[
+    [Callable[P, Coroutine[Any, Any, R]]], Callable[P, Coroutine[Any, Any, R]]
+]:
+    """在 Flow 开始时重置连接池统计数据并尝试预热其使用的连接池，结束后关闭所有连接池。
+
+    应放在 flow 装饰器内层。
+    """
+
+    def outer(
+        func: Callable[P, Coroutine[Any, Any, R]],
+    ) -> Callable[P, Coroutine[Any, Any, R]]:
+        @wraps(func)
+        async def inner(*args: P.args, **kwargs: P.kwargs) -> R:
+            for pool in POOLS.values():
+                pool.reset_stats()
+            await gather(*(pool.prepare() for pool in pools))
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                await close_pools()
+
+        return inner
+
+    return outer
+
+
+@asynccontextmanager
+async def get_conn(
+    pool: LazyPool, conn: AsyncConnection | None = None, /
+) -> AsyncGenerator[AsyncConnection]:
+    """获取连接。
+
+    如果传入了连接，直接使用该连接，以便多次写入共用同一事务；
+    否则从连接池中获取连接。
+    """
+    if conn is not None:
+        yield conn
+        return
+
+    async with pool.get_conn() as pool_conn:
+        yield pool_conn
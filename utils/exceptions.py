@@ -12,3 +12,11 @@ class MissingCredentialError(JFetcherError):
 
 class BinarySearchMaxTriesReachedError(JFetcherError):
     pass
+
+
+class SpoolFullError(JFetcherError):
+    pass
+
+
+class PartitionCoverageError(JFetcherError):
+    pass
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from collections.abc import AsyncGenerator, AsyncIterable, Awaitable
+from datetime import datetime, timedelta
+from typing import Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class FreshnessFilter(Generic[T]):
+    """跳过在时间窗口内已更新过的数据。
+
+    从数据源按批读取元素，每批通过一次查询获取各元素对应数据的更新时间，
+    处理元素时通过 is_fresh 判断是否可以跳过刷新。window 为 0 时不进行查询，
+    所有元素均需要刷新。
+    """
+
+    def __init__(
+        self,
+        get_update_times: Callable[[list[str]], Awaitable[dict[str, datetime]]],
+        /,
+        *,
+        key: Callable[[T], str | None],
+        window: timedelta,
+        batch_size: int = 20,
+    ) -> None:
+        self._get_update_times = get_update_times
+        self._key = key
+        self._window = window
+        self._batch_size = batch_size
+
+        self._update_times: dict[str, datetime] = {}
+
+        self.skipped_count = 0
+
+    async def _load(self, batch: list[T], /) -> None:
+        keys = [key for key in map(self._key, batch) if key]
+        self._update_times.update(await self._get_update_times(keys))
+
+    async def iter(self, source: AsyncIterable[T], /) -> AsyncGenerator[T]:
+        """迭代数据源，并在产出每批元素前加载其更新时间。"""
+        if not self._window:
+            async for item in source:
+                yield item
+            return
+
+        batch: list[T] = []
+        async for item in source:
+            batch.append(item)
+            if len(batch) < self._batch_size:
+                continue
+
+            await self._load(batch)
+            for batch_item in batch:
+                yield batch_item
+            batch = []
+
+        if batch:
+            await self._load(batch)
+            for batch_item in batch:
+                yield batch_item
+
+    def is_fresh(self, item: T, /) -> bool:
+        """元素对应的数据是否在时间窗口内更新过，是则计入跳过数量。"""
+        key = self._key(item)
+        update_time = self._update_times.get(key) if key else None
+        if update_time is None or datetime.now() - update_time >= self._window:
+            return False
+
+        self.skipped_count += 1
+        return True
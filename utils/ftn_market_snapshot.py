@@ -0,0 +1,398 @@
+from __future__ import annotations
+
+from asyncio import TimeoutError as AsyncioTimeoutError
+from asyncio import wait_for
+from collections.abc import Coroutine
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Generic, Literal, Protocol, TypeVar
+
+from msgspec import Struct, field
+from msgspec.msgpack import Decoder, encode
+from psycopg import AsyncConnection, OperationalError
+from typing_extensions import Self
+
+from utils.batch import write_batch
+from utils.config import CONFIG
+from utils.db import LazyPool
+from utils.exceptions import SpoolFullError
+from utils.instrumentation import instrumented
+from utils.spool import ReplayResult, Spool
+
+FtnMarketSnapshotType = Literal["BUY", "SELL"]
+
+# SAVED：已写入数据库，SPOOLED：已写入本地缓冲区，DROPPED：本地缓冲区已满，已丢弃
+FtnMarketSnapshotSaveResultType = Literal["SAVED", "SPOOLED", "DROPPED"]
+
+
+class FtnMarketRecordModel(Protocol):
+    """简书贝市场记录表。"""
+
+    @property
+    def id(self) -> int: ...
+
+    @property
+    def price(self) -> float: ...
+
+    @property
+    def total_amount(self) -> int: ...
+
+    @property
+    def traded_amount(self) -> int: ...
+
+    @property
+    def remaining_amount(self) -> int: ...
+
+    def has_same_values(self, other: Self, /) -> bool: ...
+
+    @classmethod
+    def create_many(
+        cls,
+        data: list[Self],
+        /,
+        *,
+        conn: AsyncConnection | None = None,
+        ignore_conflicts: bool = False,
+    ) -> Coroutine[Any, Any, None]: ...
+
+    @classmethod
+    def get_latest_by_ids(
+        cls, ids: list[int], /, *, conn: AsyncConnection | None = None
+    ) -> Coroutine[Any, Any, dict[int, Self]]: ...
+
+
+class FtnMarketSummaryRecordModel(Protocol):
+    """简书贝市场摘要记录表。"""
+
+    def __init__(
+        self,
+        *,
+        fetch_time: datetime,
+        type: FtnMarketSnapshotType,
+        best_price: float,
+        total_amount: int,
+        traded_amount: int,
+        remaining_amount: int,
+    ) -> None: ...
+
+    @property
+    def fetch_time(self) -> datetime: ...
+
+    @property
+    def type(self) -> FtnMarketSnapshotType: ...
+
+    @property
+    def best_price(self) -> float: ...
+
+    @property
+    def total_amount(self) -> int: ...
+
+    @property
+    def traded_amount(self) -> int: ...
+
+    @property
+    def remaining_amount(self) -> int: ...
+
+    @classmethod
+    def create(
+        cls,
+        *,
+        fetch_time: datetime,
+        type: FtnMarketSnapshotType,
+        best_price: float,
+        total_amount: int,
+        traded_amount: int,
+        remaining_amount: int,
+        conn: AsyncConnection | None = None,
+        ignore_conflicts: bool = False,
+    ) -> Coroutine[Any, Any, None]: ...
+
+
+class UserModel(Protocol):
+    """订单发布者表。"""
+
+    @property
+    def id(self) -> int: ...
+
+    @classmethod
+    def upsert_many(
+        cls, data: list[Self], /, *, conn: AsyncConnection | None = None
+    ) -> Coroutine[Any, Any, None]: ...
+
+
+class FtnOrderModel(Protocol):
+    """简书贝订单表。"""
+
+    @property
+    def id(self) -> int: ...
+
+    @classmethod
+    def upsert_many(
+        cls, data: list[Self], /, *, conn: AsyncConnection | None = None
+    ) -> Coroutine[Any, Any, tuple[int, int]]: ...
+
+
+R = TypeVar("R", bound=FtnMarketRecordModel)
+S = TypeVar("S", bound=FtnMarketSummaryRecordModel)
+U = TypeVar("U", bound=UserModel)
+F = TypeVar("F", bound=FtnOrderModel)
+
+
+class FtnMarketSnapshotData(Struct, Generic[R, S, U, F], frozen=True):
+    """写入本地缓冲区的快照数据，数据源特有的数据可在子类中添加字段。"""
+
+    ftn_market_records: list[R]
+    ftn_market_summary_record: S | None
+    # 早期版本的本地缓冲区数据中不包含以下字段
+    users: list[U] = field(default_factory=list)
+    ftn_orders: list[F] = field(default_factory=list)
+
+
+D = TypeVar("D", bound=FtnMarketSnapshotData[Any, Any, Any, Any])
+
+
+class FtnMarketSnapshotWriteResult(Struct, frozen=True):
+    ftn_market_records_count: int
+    new_ftn_orders_count: int
+    seen_again_ftn_orders_count: int
+
+
+class FtnMarketSnapshotStore(Generic[R, S, U, F, D]):
+    """简书贝市场快照的数据库写入、本地缓冲与重放。
+
+    每个数据源创建一个实例，快照在该数据源连接池的同一连接的同一事务中写入。
+    数据源特有的数据（如简书积分兑换平台的信用值）在子类的 _write_extra_data 中写入。
+    """
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        pool: LazyPool,
+        data_type: type[D],
+        ftn_market_record_model: type[R],
+        ftn_market_summary_record_model: type[S],
+        user_model: type[U],
+        ftn_order_model: type[F],
+    ) -> None:
+        self.name = name
+        self.data_type = data_type
+        self.ftn_market_record_model = ftn_market_record_model
+        self.ftn_market_summary_record_model = ftn_market_summary_record_model
+        self.user_model = user_model
+        self.ftn_order_model = ftn_order_model
+
+        self._pool = pool
+        self._decoder = Decoder(data_type)
+        self._spool = Spool(
+            Path(CONFIG.spool.path) / f"{name}_ftn_market_snapshots",
+            quarantine_path=Path(CONFIG.dead_letter.path)
+            / f"{name}_ftn_market_snapshots",
+            max_size=CONFIG.spool.max_size_mb * 1024 * 1024,
+        )
+
+    async def _write_extra_data(
+        self, data: D, /, *, conn: AsyncConnection, ignore_conflicts: bool
+    ) -> None:
+        pass
+
+    async def write(
+        self,
+        data: D,
+        /,
+        *,
+        ignore_conflicts: bool = False,
+        delta_storage: bool = False,
+    ) -> FtnMarketSnapshotWriteResult:
+        async with self._pool.get_conn() as conn, conn.transaction():
+            await self.user_model.upsert_many(data.users, conn=conn)
+
+            (
+                new_ftn_orders_count,
+                seen_again_ftn_orders_count,
+            ) = await self.ftn_order_model.upsert_many(data.ftn_orders, conn=conn)
+
+            await self._write_extra_data(
+                data, conn=conn, ignore_conflicts=ignore_conflicts
+            )
+
+            ftn_market_records: list[R] = data.ftn_market_records
+            # 增量存储模式下，仅写入与该订单最新记录相比有变化的市场记录
+            if delta_storage:
+                latest_records = await self.ftn_market_record_model.get_latest_by_ids(
+                    [item.id for item in ftn_market_records], conn=conn
+                )
+                ftn_market_records = [
+                    item
+                    for item in ftn_market_records
+                    if item.id not in latest_records
+                    or not item.has_same_values(latest_records[item.id])
+                ]
+
+            # create_many 在保存点中写入，隔离问题数据（如重复的订单）时不影响其它数据
+            poison_ftn_market_records = await write_batch(
+                ftn_market_records,
+                lambda batch: self.ftn_market_record_model.create_many(
+                    batch, conn=conn, ignore_conflicts=ignore_conflicts
+                ),
+                name=f"{self.name}.ftn_market_records",
+            )
+
+            summary: S | None = data.ftn_market_summary_record
+            if summary:
+                await self.ftn_market_summary_record_model.create(
+                    fetch_time=summary.fetch_time,
+                    type=summary.type,
+                    best_price=summary.best_price,
+                    total_amount=summary.total_amount,
+                    traded_amount=summary.traded_amount,
+                    remaining_amount=summary.remaining_amount,
+                    conn=conn,
+                    ignore_conflicts=ignore_conflicts,
+                )
+
+        return FtnMarketSnapshotWriteResult(
+            ftn_market_records_count=len(ftn_market_records)
+            - len(poison_ftn_market_records),
+            new_ftn_orders_count=new_ftn_orders_count,
+            seen_again_ftn_orders_count=seen_again_ftn_orders_count,
+        )
+
+    async def save(
+        self, data: D, /, *, delta_storage: bool
+    ) -> FtnMarketSnapshotWriteResult | FtnMarketSnapshotSaveResultType:
+        """写入快照，数据库不可用或写入超时时写入本地缓冲区。
+
+        写入成功时返回写入结果，否则返回 SPOOLED 或 DROPPED。
+        """
+        try:
+            return await wait_for(
+                self.write(data, delta_storage=delta_storage),
+                timeout=CONFIG.spool.db_write_timeout,
+            )
+        except (OperationalError, AsyncioTimeoutError):
+            try:
+                self._spool.append(encode(data))
+            except SpoolFullError:
+                return "DROPPED"
+
+            return "SPOOLED"
+
+    @instrumented("db.FtnMarketSnapshot.replay_spooled")
+    async def replay(self) -> ReplayResult:
+        """重放本地缓冲区中的快照。
+
+        每个快照在独立事务中写入，提交后才删除对应分段，已写入的数据会被忽略，
+        因此重放中断后可安全重试。重放时数据库中可能已有更新的记录，
+        因此始终写入完整快照。每次最多重放 spool.replay_time_limit 秒。
+        无法解码或写入时违反约束的快照被移入死信目录，不阻塞之后的快照。
+        """
+
+        async def write(data: bytes, /) -> None:
+            await self.write(self._decoder.decode(data), ignore_conflicts=True)
+
+        return await self._spool.replay(
+            write, time_limit=CONFIG.spool.replay_time_limit
+        )
+
+
+class BaseFtnMarketSnapshot(Generic[R, S, U, F, D]):
+    """单次采集的简书贝市场快照，各数据源的子类需设置 _store。
+
+    添加市场记录时增量计算摘要数据。快照中的全部数据在同一连接的同一事务中写入，
+    读取方不会看到写入了一部分的快照。
+
+    启用增量存储模式时，仅写入字段有变化的市场记录，订单的存续时间由
+    ftn_orders.last_seen_time 确定，可通过 get_ftn_market_records_snapshot
+    数据库函数还原任意采集时间的完整快照。摘要数据始终基于完整快照计算。
+    """
+
+    _store: FtnMarketSnapshotStore[R, S, U, F, D]
+
+    def __init__(
+        self,
+        *,
+        fetch_time: datetime,
+        type: FtnMarketSnapshotType,
+        delta_storage: bool = False,
+    ) -> None:
+        self.fetch_time = fetch_time
+        self.type: FtnMarketSnapshotType = type
+        self.delta_storage = delta_storage
+
+        self.ftn_market_records: list[R] = []
+        # 同一用户可能发布多个订单，翻页时同一订单也可能出现多次，按 ID 去重
+        self.users: dict[int, U] = {}
+        self.ftn_orders: dict[int, F] = {}
+
+        # 成功写入数据库的市场记录数量，增量存储模式下可能少于采集到的数量
+        self.written_ftn_market_records_count = 0
+        self.new_ftn_orders_count = 0
+        self.seen_again_ftn_orders_count = 0
+
+        self._best_price: float | None = None
+        self._total_amount = 0
+        self._traded_amount = 0
+        self._remaining_amount = 0
+
+    def add_ftn_market_record(self, record: R, /) -> None:
+        self.ftn_market_records.append(record)
+
+        # 买单取最低价格，卖单取最高价格
+        if (
+            self._best_price is None
+            or (self.type == "BUY" and record.price < self._best_price)
+            or (self.type == "SELL" and record.price > self._best_price)
+        ):
+            self._best_price = record.price
+        self._total_amount += record.total_amount
+        self._traded_amount += record.traded_amount
+        self._remaining_amount += record.remaining_amount
+
+    def add_user(self, user: U, /) -> None:
+        self.users[user.id] = user
+
+    def add_ftn_order(self, order: F, /) -> None:
+        self.ftn_orders[order.id] = order
+
+    def _get_data(self) -> D:
+        return self._store.data_type(
+            ftn_market_records=self.ftn_market_records,
+            ftn_market_summary_record=self.ftn_market_summary_record,
+            users=list(self.users.values()),
+            ftn_orders=list(self.ftn_orders.values()),
+        )
+
+    @property
+    def ftn_market_summary_record(self) -> S | None:
+        # 如果没有订单数据，不生成摘要数据
+        if self._best_price is None:
+            return None
+
+        return self._store.ftn_market_summary_record_model(
+            fetch_time=self.fetch_time,
+            type=self.type,
+            best_price=self._best_price,
+            total_amount=self._total_amount,
+            traded_amount=self._traded_amount,
+            remaining_amount=self._remaining_amount,
+        )
+
+    @instrumented("db.FtnMarketSnapshot.save")
+    async def save(self) -> FtnMarketSnapshotSaveResultType:
+        """在同一事务中写入快照中的全部数据。
+
+        数据库不可用或写入超时时，将快照写入本地缓冲区，
+        此时无法与最新记录比较，缓冲区中始终保存完整快照。
+        本地缓冲区已满时丢弃该快照。
+        """
+        result = await self._store.save(
+            self._get_data(), delta_storage=self.delta_storage
+        )
+        if isinstance(result, str):
+            return result
+
+        self.written_ftn_market_records_count = result.ftn_market_records_count
+        self.new_ftn_orders_count = result.new_ftn_orders_count
+        self.seen_again_ftn_orders_count = result.seen_again_ftn_orders_count
+        return "SAVED"
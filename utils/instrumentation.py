@@ -0,0 +1,359 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import AsyncGenerator, AsyncIterator, Coroutine, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from inspect import signature
+from logging import getLogger
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, TypeVar
+from uuid import uuid4
+
+from msgspec import Struct, field
+from prefect.artifacts import acreate_table_artifact
+from prefect.runtime import flow_run
+from sshared.retry import RetryInfo
+from typing_extensions import ParamSpec
+
+from utils.config import CONFIG
+from utils.db import get_pool_stats
+from utils.rate_limiter import get_rate_limiter_metrics
+from utils.write_behind import get_write_behind_stats, reset_write_behind_stats
+
+P = ParamSpec("P")
+R = TypeVar("R")
+T = TypeVar("T")
+
+# 耗时直方图的桶上界（秒），最后一个桶为 +Inf
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class StageMetrics(Struct):
+    # 每个桶的计数（非累计），长度为 len(HISTOGRAM_BUCKETS) + 1
+    buckets: list[int] = field(
+        default_factory=lambda: [0] * (len(HISTOGRAM_BUCKETS) + 1)
+    )
+    count: int = 0
+    total_seconds: float = 0
+    errors_count: int = 0
+    retries_count: int = 0
+
+    def observe(self, seconds: float, /) -> None:
+        self.buckets[bisect_left(HISTOGRAM_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total_seconds += seconds
+
+    def get_percentile(self, percentile: float, /) -> float | None:
+        """根据直方图估算分位数，返回所在桶的上界，落在 +Inf 桶中时返回 None。"""
+        target = self.count * percentile
+        current = 0
+        for upper_bound, bucket_count in zip(HISTOGRAM_BUCKETS, self.buckets):
+            current += bucket_count
+            if current >= target:
+                return upper_bound
+
+        return None
+
+
+class FlowRunMetrics:
+    def __init__(self, *, flow_name: str, variant: dict[str, str]) -> None:
+        self.flow_name = flow_name
+        # 区分同一 Flow 的不同部署（如买单与卖单）的参数
+        self.variant = variant
+        self.stages: dict[str, StageMetrics] = {}
+        self.duration_seconds = 0.0
+
+    def get_stage(self, name: str, /) -> StageMetrics:
+        if name not in self.stages:
+            self.stages[name] = StageMetrics()
+
+        return self.stages[name]
+
+
+_CURRENT_METRICS: ContextVar[FlowRunMetrics | None] = ContextVar(
+    "_CURRENT_METRICS", default=None
+)
+_CURRENT_STAGE: ContextVar[str | None] = ContextVar("_CURRENT_STAGE", default=None)
+
+
+@contextmanager
+def stage(name: str, /) -> Iterator[None]:
+    """记录代码块的耗时与异常。
+
+    不在启用了统计的 Flow 中运行时不做任何记录。
+    """
+    metrics = _CURRENT_METRICS.get()
+    if metrics is None:
+        yield
+        return
+
+    stage_metrics = metrics.get_stage(name)
+    token = _CURRENT_STAGE.set(name)
+    start_time = perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_metrics.errors_count += 1
+        raise
+    finally:
+        stage_metrics.observe(perf_counter() - start_time)
+        _CURRENT_STAGE.reset(token)
+
+
+def instrumented(
+    name: str, /
+) -> Callable[
+    [Callable[P, Coroutine[Any, Any, R]]], Callable[P, Coroutine[Any, Any, R]]
+]:
+    """记录异步函数的耗时与异常。
+
+    应放在 retry 装饰器外层，以便将重试次数计入该阶段。
+    """
+
+    def outer(
+        func: Callable[P, Coroutine[Any, Any, R]],
+    ) -> Callable[P, Coroutine[Any, Any, R]]:
+        @wraps(func)
+        async def inner(*args: P.args, **kwargs: P.kwargs) -> R:
+            with stage(name):
+                return await func(*args, **kwargs)
+
+        return inner
+
+    return outer
+
+
+async def instrumented_iter(
+    name: str, iterator: AsyncIterator[T], /
+) -> AsyncGenerator[T]:
+    """记录异步迭代器获取每个元素的耗时与异常。"""
+    while True:
+        with stage(name):
+            try:
+                item = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+
+        yield item
+
+
+def record_retry(_: RetryInfo, /) -> None:
+    """作为 retry 的 on_exception 回调，将重试次数计入当前阶段。"""
+    metrics = _CURRENT_METRICS.get()
+    if metrics is None:
+        return
+
+    metrics.get_stage(_CURRENT_STAGE.get() or "unknown").retries_count += 1
+
+
+def _get_file_name(metrics: FlowRunMetrics, /) -> str:
+    # jpep_fetch_ftn_market_orders_data + {"type": "BUY"}
+    # -> jpep_fetch_ftn_market_orders_data_type_BUY
+    return metrics.flow_name + "".join(
+        f"_{key}_{value}" for key, value in metrics.variant.items()
+    )
+
+
+def _get_prometheus_text(metrics: FlowRunMetrics, /) -> str:
+    flow_label = ",".join(
+        (
+            f'flow="{metrics.flow_name}"',
+            *(f'{key}="{value}"' for key, value in metrics.variant.items()),
+        )
+    )
+
+    lines = [
+        "# TYPE jfetcher_flow_duration_seconds gauge",
+        f"jfetcher_flow_duration_seconds{{{flow_label}}} {metrics.duration_seconds}",
+        "# TYPE jfetcher_stage_duration_seconds histogram",
+    ]
+    for name, stage_metrics in metrics.stages.items():
+        labels = f'{flow_label},stage="{name}"'
+        cumulative_count = 0
+        for upper_bound, bucket_count in zip(
+            (*HISTOGRAM_BUCKETS, "+Inf"), stage_metrics.buckets
+        ):
+            cumulative_count += bucket_count
+            lines.append(
+                f"jfetcher_stage_duration_seconds_bucket"
+                f'{{{labels},le="{upper_bound}"}} {cumulative_count}'
+            )
+        lines.append(
+            f"jfetcher_stage_duration_seconds_sum{{{labels}}} "
+            f"{stage_metrics.total_seconds}"
+        )
+        lines.append(
+            f"jfetcher_stage_duration_seconds_count{{{labels}}} {stage_metrics.count}"
+        )
+
+    lines.append("# TYPE jfetcher_stage_errors gauge")
+    lines.extend(
+        f'jfetcher_stage_errors{{{flow_label},stage="{name}"}} '
+        f"{stage_metrics.errors_count}"
+        for name, stage_metrics in metrics.stages.items()
+    )
+    lines.append("# TYPE jfetcher_stage_retries gauge")
+    lines.extend(
+        f'jfetcher_stage_retries{{{flow_label},stage="{name}"}} '
+        f"{stage_metrics.retries_count}"
+        for name, stage_metrics in metrics.stages.items()
+    )
+    for metric_name, attr_name in (
+        ("jfetcher_pool_in_use_conns", "in_use_conns_count"),
+        ("jfetcher_pool_idle_conns", "idle_conns_count"),
+        ("jfetcher_pool_max_in_use_conns", "max_in_use_conns_count"),
+        ("jfetcher_pool_acquires", "acquires_count"),
+        ("jfetcher_pool_wait_seconds_sum", "total_wait_seconds"),
+        ("jfetcher_pool_wait_seconds_max", "max_wait_seconds"),
+    ):
+        lines.append(f"# TYPE {metric_name} gauge")
+        lines.extend(
+            f'{metric_name}{{{flow_label},pool="{pool_name}"}} '
+            f"{getattr(pool_stats, attr_name)}"
+            for pool_name, pool_stats in get_pool_stats().items()
+        )
+
+    for metric_name, attr_name in (
+        ("jfetcher_write_behind_pending_rows", "pending_count"),
+        ("jfetcher_write_behind_max_pending_rows", "max_pending_count"),
+        ("jfetcher_write_behind_flushes", "flushes_count"),
+        ("jfetcher_write_behind_written_rows", "written_count"),
+        ("jfetcher_write_behind_poison_rows", "poison_count"),
+    ):
+        lines.append(f"# TYPE {metric_name} gauge")
+        lines.extend(
+            f'{metric_name}{{{flow_label},table="{table}"}} '
+            f"{getattr(write_behind_stats, attr_name)}"
+            for table, write_behind_stats in get_write_behind_stats().items()
+        )
+
+    return "\n".join(lines) + "\n"
+
+
+def _get_rate_limiter_prometheus_text() -> str:
+    lines = ["# TYPE jfetcher_rate_limiter_rate gauge"]
+    lines.extend(
+        f'jfetcher_rate_limiter_rate{{datasource="{datasource}"}} {rate}'
+        for datasource, rate in get_rate_limiter_metrics().items()
+    )
+
+    return "\n".join(lines) + "\n"
+
+
+def _write_textfile(directory: Path, name: str, text: str, /) -> None:
+    # node_exporter 可能在写入过程中读取文件，先写入临时文件再重命名
+    temp_file = directory / f"{name}.prom.{uuid4().hex[:8]}.tmp"
+    temp_file.write_text(text, encoding="utf-8")
+    temp_file.replace(directory / f"{name}.prom")
+
+
+def _write_prometheus_textfile(metrics: FlowRunMetrics, /) -> None:
+    directory = Path(CONFIG.metrics.prometheus_textfile_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    # 每个部署写入独立的文件，避免同一 Flow 的不同部署互相覆盖
+    _write_textfile(
+        directory,
+        f"jfetcher_{_get_file_name(metrics)}",
+        _get_prometheus_text(metrics),
+    )
+    # 限流状态由所有 Flow 共享，写入单独的文件，避免 node_exporter 读取到重复的序列
+    _write_textfile(
+        directory, "jfetcher_rate_limiter", _get_rate_limiter_prometheus_text()
+    )
+
+
+async def _create_artifact(metrics: FlowRunMetrics, /) -> None:
+    rate_limiter_metrics = get_rate_limiter_metrics()
+
+    await acreate_table_artifact(
+        key=f"{_get_file_name(metrics).replace('_', '-').lower()}-metrics",
+        table=[
+            {
+                "stage": name,
+                "count": stage_metrics.count,
+                "total_seconds": round(stage_metrics.total_seconds, 3),
+                "avg_ms": round(
+                    stage_metrics.total_seconds / stage_metrics.count * 1000, 2
+                )
+                if stage_metrics.count
+                else None,
+                "p50_upper_seconds": stage_metrics.get_percentile(0.5),
+                "p99_upper_seconds": stage_metrics.get_percentile(0.99),
+                "errors": stage_metrics.errors_count,
+                "retries": stage_metrics.retries_count,
+            }
+            for name, stage_metrics in sorted(metrics.stages.items())
+        ],
+        description=(
+            f"耗时 {metrics.duration_seconds:.3f}s，限流速率（请求 / 秒）："
+            + "，".join(
+                f"{datasource} {rate:.2f}"
+                for datasource, rate in rate_limiter_metrics.items()
+            )
+            + "；连接池："
+            + "，".join(
+                f"{pool_name} 获取 {pool_stats.acquires_count} 次，"
+                f"等待 {pool_stats.total_wait_seconds:.3f}s"
+                f"（最长 {pool_stats.max_wait_seconds:.3f}s），"
+                f"最多同时使用 {pool_stats.max_in_use_conns_count} 个连接"
+                for pool_name, pool_stats in get_pool_stats().items()
+            )
+            + "".join(
+                f"；写入缓冲区 {table}：写入 {write_behind_stats.written_count} 行，"
+                f"{write_behind_stats.flushes_count} 次，"
+                f"最多积压 {write_behind_stats.max_pending_count} 行"
+                for table, write_behind_stats in get_write_behind_stats().items()
+            )
+        ),
+    )
+
+
+def collect_metrics(
+    func: Callable[P, Coroutine[Any, Any, R]], /
+) -> Callable[P, Coroutine[Any, Any, R]]:
+    """为 Flow 启用耗时统计，运行结束后发布为 Prefect Artifact。
+
+    配置了 metrics.prometheus_textfile_dir 时，同时写入 Prometheus textfile。
+    字符串类型的参数（如 type）用于区分同一 Flow 的不同部署，会加入文件名与标签。
+    应放在 flow 装饰器内层。
+    """
+    func_signature = signature(func)
+
+    @wraps(func)
+    async def inner(*args: P.args, **kwargs: P.kwargs) -> R:
+        arguments = func_signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+        metrics = FlowRunMetrics(
+            flow_name=func.__name__,
+            variant={
+                key: value
+                for key, value in arguments.arguments.items()
+                if isinstance(value, str)
+            },
+        )
+        # 连接池与写入缓冲区的统计数据为进程级，Prefect 中每次 Flow 运行都在
+        # 独立进程中进行，在开始时清空，使其只包含本次运行
+        reset_write_behind_stats()
+        token = _CURRENT_METRICS.set(metrics)
+        start_time = perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            metrics.duration_seconds = perf_counter() - start_time
+            _CURRENT_METRICS.reset(token)
+
+            # 统计数据发布失败不应影响 Flow 运行结果
+            try:
+                # 不在 Prefect Flow Run 中运行时（如基准测试），不创建 Artifact
+                if flow_run.get_id() is not None:
+                    await _create_artifact(metrics)
+                if CONFIG.metrics.prometheus_textfile_dir:
+                    _write_prometheus_textfile(metrics)
+            except Exception:
+                getLogger(__name__).exception("发布耗时统计数据时发生未知异常")
+
+    return inner
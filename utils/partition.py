@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+from collections.abc import Coroutine
+from datetime import datetime, timedelta
+from re import compile as re_compile
+from typing import Any, Literal, Protocol
+
+from msgspec import Struct
+from prefect import get_run_logger
+
+from utils.exceptions import PartitionCoverageError
+
+PartitionGranularityType = Literal["YEAR", "MONTH", "DAY"]
+
+PARTITION_BOUND_REGEX = re_compile(r"^FOR VALUES FROM \('(.+?)'\) TO \('(.+?)'\)$")
+
+
+class Partition(Struct, frozen=True):
+    name: str
+    start_time: datetime
+    end_time: datetime
+
+    @classmethod
+    def from_bound_expr(cls, *, name: str, bound_expr: str) -> Partition | None:
+        """从 pg_get_expr 返回的分区边界表达式解析分区信息。
+
+        如果不是上下界均确定的范围分区，返回 None。
+        """
+        match = PARTITION_BOUND_REGEX.match(bound_expr)
+        if not match:
+            return None
+
+        return cls(
+            name=name,
+            start_time=datetime.fromisoformat(match.group(1)),
+            end_time=datetime.fromisoformat(match.group(2)),
+        )
+
+    def overlaps(self, *, start_time: datetime, end_time: datetime) -> bool:
+        return self.start_time < end_time and start_time < self.end_time
+
+
+class PartitionedTable(Protocol):
+    """按 fetch_time 范围分区的表。"""
+
+    @classmethod
+    def get_partitions(cls) -> Coroutine[Any, Any, list[Partition]]: ...
+
+    @classmethod
+    def create_partition(
+        cls, *, name: str, start_time: datetime, end_time: datetime
+    ) -> Coroutine[Any, Any, None]: ...
+
+    @classmethod
+    def detach_partition(cls, name: str, /) -> Coroutine[Any, Any, None]: ...
+
+
+def get_period_start(
+    time: datetime, /, *, granularity: PartitionGranularityType
+) -> datetime:
+    time = time.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if granularity == "YEAR":
+        return time.replace(month=1, day=1)
+    if granularity == "MONTH":
+        return time.replace(day=1)
+    return time
+
+
+def get_next_period_start(
+    period_start: datetime, /, *, granularity: PartitionGranularityType
+) -> datetime:
+    if granularity == "YEAR":
+        return period_start.replace(year=period_start.year + 1)
+    if granularity == "MONTH":
+        if period_start.month == 12:
+            return period_start.replace(year=period_start.year + 1, month=1)
+        return period_start.replace(month=period_start.month + 1)
+    return period_start + timedelta(days=1)
+
+
+def get_partition_name(
+    table: str,
+    /,
+    *,
+    start_time: datetime,
+    end_time: datetime,
+    granularity: PartitionGranularityType,
+) -> str:
+    # 周期被已有分区部分覆盖时，剩余部分的分区以起始时间命名，避免与周期分区重名
+    period_start = get_period_start(start_time, granularity=granularity)
+    if start_time != period_start or end_time != get_next_period_start(
+        period_start, granularity=granularity
+    ):
+        if start_time.time() != datetime.min.time():
+            return f"{table}_{start_time:%Y_%m_%d_%H%M%S}"
+        return f"{table}_{start_time:%Y_%m_%d}"
+
+    if granularity == "YEAR":
+        return f"{table}_{start_time:%Y}"
+    if granularity == "MONTH":
+        return f"{table}_{start_time:%Y_%m}"
+    return f"{table}_{start_time:%Y_%m_%d}"
+
+
+def get_partition_ranges(
+    time: datetime, /, *, granularity: PartitionGranularityType, count: int
+) -> list[tuple[datetime, datetime]]:
+    """获取从 time 所在周期开始的 count 个连续分区范围（左闭右开）。"""
+    result: list[tuple[datetime, datetime]] = []
+
+    start_time = get_period_start(time, granularity=granularity)
+    for _ in range(count):
+        end_time = get_next_period_start(start_time, granularity=granularity)
+        result.append((start_time, end_time))
+        start_time = end_time
+
+    return result
+
+
+def get_uncovered_ranges(
+    partitions: list[Partition], /, *, start_time: datetime, end_time: datetime
+) -> list[tuple[datetime, datetime]]:
+    """获取 [start_time, end_time) 中未被任何分区覆盖的范围（左闭右开）。"""
+    result: list[tuple[datetime, datetime]] = []
+
+    current = start_time
+    for partition in sorted(partitions, key=lambda x: x.start_time):
+        if not partition.overlaps(start_time=current, end_time=end_time):
+            continue
+
+        if partition.start_time > current:
+            result.append((current, partition.start_time))
+        current = max(current, partition.end_time)
+
+    if current < end_time:
+        result.append((current, end_time))
+
+    return result
+
+
+async def create_partitions(
+    table: type[PartitionedTable],
+    /,
+    *,
+    table_name: str,
+    granularity: PartitionGranularityType,
+    create_ahead: int,
+) -> None:
+    """创建当前周期及之后 create_ahead 个周期的分区。
+
+    周期被已有分区（如早期的按年分区）部分覆盖时，为未覆盖的部分创建分区。
+    创建后仍有未覆盖的时间范围时抛出 PartitionCoverageError。
+    """
+    logger = get_run_logger()
+
+    ranges = get_partition_ranges(
+        datetime.now(), granularity=granularity, count=create_ahead + 1
+    )
+
+    partitions = await table.get_partitions()
+    for period_start_time, period_end_time in ranges:
+        for start_time, end_time in get_uncovered_ranges(
+            partitions, start_time=period_start_time, end_time=period_end_time
+        ):
+            name = get_partition_name(
+                table_name,
+                start_time=start_time,
+                end_time=end_time,
+                granularity=granularity,
+            )
+            await table.create_partition(
+                name=name, start_time=start_time, end_time=end_time
+            )
+            logger.info(
+                "已创建分区 name=%s start_time=%s end_time=%s",
+                name,
+                start_time,
+                end_time,
+            )
+
+    # 同名的表已存在（如已分离的分区）时不会创建分区，需重新检查
+    uncovered_ranges = get_uncovered_ranges(
+        await table.get_partitions(), start_time=ranges[0][0], end_time=ranges[-1][1]
+    )
+    if uncovered_ranges:
+        raise PartitionCoverageError(
+            f"{table_name} 的以下时间范围未被分区覆盖：{uncovered_ranges}"
+        )
+
+
+async def detach_partitions(
+    table: type[PartitionedTable], /, *, retention_days: int
+) -> None:
+    """分离结束时间早于保留期限的分区。"""
+    logger = get_run_logger()
+
+    threshold = datetime.now() - timedelta(days=retention_days)
+    for partition in await table.get_partitions():
+        if partition.end_time > threshold:
+            continue
+
+        await table.detach_partition(partition.name)
+        logger.info("已分离分区 name=%s", partition.name)
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from asyncio import FIRST_EXCEPTION, Queue, create_task, gather, wait
+from collections.abc import AsyncIterable, Awaitable
+from typing import Callable, Generic, TypeVar
+
+from anyio import CancelScope
+
+T = TypeVar("T")
+
+
+class Pipeline(Generic[T]):
+    """在数据源与处理函数之间加入有界队列，使数据获取与数据处理并行进行。
+
+    - 队列已满时暂停从数据源获取数据（背压）
+    - 由 concurrency 个 worker 并发处理，concurrency 为 1 时按顺序处理
+    - 记录按数据源顺序连续完成的最后一个元素（watermark），用于断点续采
+    - 数据源或处理函数抛出异常、或被取消（如 Flow 超时）时，取消所有 worker
+      并等待其退出后再向上传递
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[T], Awaitable[None]],
+        /,
+        *,
+        concurrency: int = 1,
+        queue_size: int | None = None,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency 必须大于 0")
+
+        self._handler = handler
+        self._concurrency = concurrency
+        self._queue_size = queue_size or concurrency
+
+        self.completed_count = 0
+        self._watermark: T | None = None
+        self._watermark_seq = -1
+        # 已完成但前面仍有未完成元素的数据，按序号保存
+        self._completed_out_of_order: dict[int, T] = {}
+
+    @property
+    def watermark(self) -> T | None:
+        """按数据源顺序连续完成的最后一个元素，尚无元素完成时为 None。"""
+        return self._watermark
+
+    def _mark_completed(self, seq: int, item: T, /) -> None:
+        self.completed_count += 1
+        self._completed_out_of_order[seq] = item
+
+        while self._watermark_seq + 1 in self._completed_out_of_order:
+            self._watermark_seq += 1
+            self._watermark = self._completed_out_of_order.pop(self._watermark_seq)
+
+    async def run(self, source: AsyncIterable[T], /) -> None:
+        queue: Queue[tuple[int, T] | None] = Queue(maxsize=self._queue_size)
+
+        async def produce() -> None:
+            seq = 0
+            async for item in source:
+                await queue.put((seq, item))
+                seq += 1
+
+            for _ in range(self._concurrency):
+                await queue.put(None)
+
+        async def consume() -> None:
+            while (entry := await queue.get()) is not None:
+                seq, item = entry
+                await self._handler(item)
+                self._mark_completed(seq, item)
+
+        tasks = [
+            create_task(produce()),
+            *(create_task(consume()) for _ in range(self._concurrency)),
+        ]
+        try:
+            done, _ = await wait(tasks, return_when=FIRST_EXCEPTION)
+            for task in done:
+                exception = task.exception()
+                if exception:
+                    raise exception
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Prefect 的超时通过 anyio 取消范围实现，范围内的每次 await 都会被
+            # 再次取消，需在屏蔽取消的范围内等待 worker 退出
+            with CancelScope(shield=True):
+                await gather(*tasks, return_exceptions=True)
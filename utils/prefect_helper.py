@@ -1,11 +1,174 @@
+from __future__ import annotations
+
+import ast
+import sys
+from importlib import import_module
+from inspect import Parameter, Signature
+from pathlib import Path
+from typing import Any, Literal
+
 from prefect.client.schemas.schedules import CronSchedule
+from prefect.deployments.runner import RunnerDeployment
+from prefect.flows import load_flow_arguments_from_entrypoint
 from prefect.runtime import flow_run, task_run
+from prefect.utilities.callables import (
+    ParameterSchema,
+    generate_parameter_schema,
+    parameter_docstrings,
+)
 
 
 def get_cron_schedule(cron: str, /) -> CronSchedule:
     return CronSchedule(cron=cron, timezone="Asia/Shanghai")
 
 
+def _get_type_aliases(path: Path, /) -> dict[str, Any]:
+    """从源码中解析模块级的 Literal 类型别名（如 FtnOrdersType = Literal[...]）。"""
+    result: dict[str, Any] = {}
+    for node in ast.parse(path.read_text(encoding="utf-8")).body:
+        if (
+            not isinstance(node, ast.Assign)
+            or len(node.targets) != 1
+            or not isinstance(node.targets[0], ast.Name)
+        ):
+            continue
+
+        try:
+            result[node.targets[0].id] = eval(  # noqa: S307
+                ast.unparse(node.value), {"Literal": Literal}
+            )
+        except Exception:  # noqa: BLE001, S112
+            # 不是类型别名
+            continue
+
+    return result
+
+
+def _get_annotations_namespace(module: ast.Module, /) -> dict[str, Any]:
+    """获取计算参数类型注解所需的名称，不导入 Flow 所在模块及其依赖。
+
+    标准库中的名称直接导入，项目中的类型别名从源码中解析，
+    其余名称（如第三方库中的类型）忽略，对应的参数在 Schema 中不限制类型。
+    """
+    namespace: dict[str, Any] = {"Literal": Literal}
+    for node in module.body:
+        if not isinstance(node, ast.ImportFrom) or not node.module or node.level:
+            continue
+
+        if node.module.split(".")[0] in sys.stdlib_module_names:
+            imported_module = import_module(node.module)
+            for alias in node.names:
+                if hasattr(imported_module, alias.name):
+                    namespace[alias.asname or alias.name] = getattr(
+                        imported_module, alias.name
+                    )
+            continue
+
+        path = Path(*node.module.split(".")).with_suffix(".py")
+        if not path.exists():
+            continue
+        type_aliases = _get_type_aliases(path)
+        for alias in node.names:
+            if alias.name in type_aliases:
+                namespace[alias.asname or alias.name] = type_aliases[alias.name]
+
+    return namespace
+
+
+def get_parameter_schema(entrypoint: str, /) -> ParameterSchema:
+    """从源码中解析 Flow 函数的签名，生成参数的 OpenAPI Schema。
+
+    与 Flow.to_deployment 生成的 Schema 一致，但不导入 Flow 所在模块。
+    """
+    path, func_name = entrypoint.rsplit(":", maxsplit=1)
+    module = ast.parse(Path(path).read_text(encoding="utf-8"))
+    func = next(
+        node
+        for node in module.body
+        if isinstance(node, ast.AsyncFunctionDef | ast.FunctionDef)
+        and node.name == func_name
+    )
+    namespace = _get_annotations_namespace(module)
+
+    def get_annotation(arg: ast.arg, /) -> Any:  # noqa: ANN401
+        if not arg.annotation:
+            return Parameter.empty
+
+        try:
+            return eval(ast.unparse(arg.annotation), namespace)  # noqa: S307
+        except Exception:  # noqa: BLE001
+            return Parameter.empty
+
+    def get_default(default: ast.expr | None, /) -> Any:  # noqa: ANN401
+        return Parameter.empty if default is None else ast.literal_eval(default)
+
+    args = func.args
+    # 位置参数的默认值与最后几个参数对应
+    positional_defaults: list[ast.expr | None] = [None] * (
+        len(args.posonlyargs) + len(args.args) - len(args.defaults)
+    ) + list(args.defaults)
+    parameters = [
+        Parameter(
+            arg.arg,
+            Parameter.POSITIONAL_ONLY,
+            default=get_default(default),
+            annotation=get_annotation(arg),
+        )
+        for arg, default in zip(args.posonlyargs, positional_defaults)
+    ]
+    parameters += [
+        Parameter(
+            arg.arg,
+            Parameter.POSITIONAL_OR_KEYWORD,
+            default=get_default(default),
+            annotation=get_annotation(arg),
+        )
+        for arg, default in zip(args.args, positional_defaults[len(args.posonlyargs) :])
+    ]
+    parameters += [
+        Parameter(
+            arg.arg,
+            Parameter.KEYWORD_ONLY,
+            default=get_default(default),
+            annotation=get_annotation(arg),
+        )
+        for arg, default in zip(args.kwonlyargs, args.kw_defaults)
+    ]
+
+    return generate_parameter_schema(
+        Signature(parameters), parameter_docstrings(ast.get_docstring(func))
+    )
+
+
+def get_deployment(
+    entrypoint: str,
+    /,
+    *,
+    name: str,
+    tags: list[str],
+    cron: str,
+    parameters: dict[str, Any] | None = None,
+) -> RunnerDeployment:
+    """通过入口点字符串声明部署，不导入 Flow 所在模块。
+
+    Flow 模块仅在运行时由 Prefect 在子进程中导入。Flow 名称从 flow 装饰器的
+    name 参数中解析，参数 Schema 从函数签名中解析，均不导入 Flow 所在模块。
+    """
+    deployment = RunnerDeployment(
+        name=name,
+        flow_name=load_flow_arguments_from_entrypoint(entrypoint, {"name"})["name"],
+        entrypoint=entrypoint,
+        tags=tags,
+        parameters=parameters or {},
+        schedules=[get_cron_schedule(cron)],  # type: ignore
+    )
+    # 与 Flow.to_deployment 保持一致，入口点路径相对于工作目录
+    deployment._path = "."
+    deployment._parameter_openapi_schema = get_parameter_schema(entrypoint)
+
+    return deployment
+
+
 def get_task_run_name() -> str:
     task_name = task_run.get_task_name()
     task_run_id = task_run.get_id()
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+from asyncio import Task, create_task, get_running_loop, shield, sleep
+from fcntl import LOCK_EX, flock
+from functools import partial
+from os import getpid
+from pathlib import Path
+from time import monotonic, time
+from typing import Literal
+
+from anyio import to_thread
+from httpx import Request, Response
+from msgspec import DecodeError, Struct
+from msgspec.msgpack import Decoder, encode
+
+from utils.config import CONFIG
+
+DatasourceType = Literal["JIANSHU", "JPEP", "BEIJIAOYI"]
+
+# 简书在触发限流时返回 502（与 JKit 一致），其余数据源仅使用标准的 429
+RATELIMIT_STATUS_CODES: dict[DatasourceType, set[int]] = {
+    "JIANSHU": {429, 502},
+    "JPEP": {429},
+    "BEIJIAOYI": {429},
+}
+
+RATE_LIMITER_STATE_PATH = Path(CONFIG.rate_limiter.path)
+
+# 与共享状态文件同步的间隔（秒）
+SYNC_INTERVAL = 1
+# 超过该时间（秒）未同步的进程视为已退出
+PROCESS_TIMEOUT = 5 * SYNC_INTERVAL
+
+
+class _SharedState(Struct):
+    # 所有进程合计的速率（请求 / 秒）
+    rate: float
+    # 最近一次降低速率的时刻（Unix 时间戳）
+    last_decrease_time: float
+    # 各进程最近一次同步的时刻（Unix 时间戳），用于计算每个进程分得的速率
+    heartbeats: dict[int, float]
+
+
+_STATE_DECODER = Decoder(_SharedState)
+
+
+class RateLimiter:
+    """自适应令牌桶限流器。
+
+    请求成功时线性提高速率，触发限流时按比例降低速率（AIMD）。
+
+    Prefect 中每次 Flow 运行都在独立进程中进行，设置 path 时，各进程每隔
+    SYNC_INTERVAL 秒在工作线程中加 flock 读写该文件，合并期间的速率调整，
+    并按同时运行的进程数平分速率，使同时运行的多个 Flow 共享同一限制，
+    之后的运行也从已调整的速率开始。令牌桶始终在内存中，获取令牌时不读写文件。
+    未设置 path 时仅在当前进程内生效。
+    """
+
+    def __init__(
+        self,
+        *,
+        path: Path | None = None,
+        initial_rate: float,
+        min_rate: float,
+        max_rate: float,
+        burst: int,
+        increase_step: float,
+        decrease_factor: float,
+    ) -> None:
+        self._path = path
+        self._initial_rate = initial_rate
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._burst = burst
+        self._increase_step = increase_step
+        self._decrease_factor = decrease_factor
+
+        self._rate = initial_rate
+        # 同时使用该限流器的进程数
+        self._processes_count = 1
+        # 下一个令牌可用的时刻
+        self._next_token_time = monotonic()
+        self._last_decrease_time = 0.0
+
+        # 上次同步后在本进程中发生的速率调整，同步时合并到共享状态
+        self._pending_increases_count = 0
+        self._pending_decrease = False
+        self._last_sync_time: float | None = None
+        self._sync_task: Task[None] | None = None
+
+    def _sync_state_file(
+        self, path: Path, /, *, increases_count: int, decrease: bool
+    ) -> _SharedState:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a+b") as f:
+            flock(f, LOCK_EX)
+            f.seek(0)
+            try:
+                state = _STATE_DECODER.decode(f.read())
+            except DecodeError:
+                # 状态文件为空（首次使用）或已损坏
+                state = _SharedState(
+                    rate=self._initial_rate, last_decrease_time=0, heartbeats={}
+                )
+
+            now = time()
+            # 限流参数可能已修改
+            state.rate = min(max(state.rate, self._min_rate), self._max_rate)
+            if decrease:
+                # 多个进程在同一时间窗口内的限流只计为一次
+                if now - state.last_decrease_time >= 1 / state.rate:
+                    state.last_decrease_time = now
+                    state.rate = max(state.rate * self._decrease_factor, self._min_rate)
+            else:
+                for _ in range(increases_count):
+                    state.rate = min(
+                        state.rate + self._increase_step / state.rate, self._max_rate
+                    )
+
+            state.heartbeats = {
+                pid: heartbeat_time
+                for pid, heartbeat_time in state.heartbeats.items()
+                if now - heartbeat_time < PROCESS_TIMEOUT
+            }
+            state.heartbeats[getpid()] = now
+
+            f.seek(0)
+            f.truncate()
+            f.write(encode(state))
+
+        return state
+
+    async def _sync(self, path: Path, /) -> None:
+        increases_count = self._pending_increases_count
+        decrease = self._pending_decrease
+        self._pending_increases_count = 0
+        self._pending_decrease = False
+
+        try:
+            state = await to_thread.run_sync(
+                partial(
+                    self._sync_state_file,
+                    path,
+                    increases_count=increases_count,
+                    decrease=decrease,
+                )
+            )
+        except OSError:
+            # 状态文件不可用时继续使用本进程内的状态
+            pass
+        else:
+            # 同步期间本进程可能再次触发限流，此时保留更低的速率
+            self._rate = (
+                min(self._rate, state.rate) if self._pending_decrease else state.rate
+            )
+            self._processes_count = len(state.heartbeats)
+        finally:
+            self._last_sync_time = monotonic()
+
+    async def _maybe_sync(self) -> None:
+        if not self._path:
+            return
+
+        task = self._sync_task
+        # 同步任务可能属于已关闭的事件循环
+        if not task or task.done() or task.get_loop() is not get_running_loop():
+            if (
+                self._last_sync_time is not None
+                and monotonic() - self._last_sync_time < SYNC_INTERVAL
+            ):
+                return
+
+            task = self._sync_task = create_task(self._sync(self._path))
+
+        # 首次获取令牌前等待同步完成，从共享的速率开始
+        if self._last_sync_time is None:
+            await shield(task)
+
+    @property
+    def rate(self) -> float:
+        """所有进程合计的当前速率（请求 / 秒）。"""
+        return self._rate
+
+    async def acquire(self) -> None:
+        """获取一个令牌，如果令牌桶为空，等待直到有令牌可用。"""
+        await self._maybe_sync()
+
+        now = monotonic()
+        interval = self._processes_count / self._rate
+
+        # 令牌桶最多积攒 burst 个令牌
+        token_time = max(self._next_token_time, now - (self._burst - 1) * interval)
+        self._next_token_time = token_time + interval
+
+        if token_time > now:
+            await sleep(token_time - now)
+
+    def on_success(self) -> None:
+        self._pending_increases_count += 1
+        self._rate = min(self._rate + self._increase_step / self._rate, self._max_rate)
+
+    def on_ratelimit(self) -> None:
+        now = monotonic()
+        # 同一时间窗口内并发请求的多次限流只计为一次
+        if now - self._last_decrease_time < 1 / self._rate:
+            return
+
+        self._last_decrease_time = now
+        self._pending_decrease = True
+        self._rate = max(self._rate * self._decrease_factor, self._min_rate)
+
+
+RATE_LIMITERS: dict[DatasourceType, RateLimiter] = {
+    "JIANSHU": RateLimiter(
+        path=RATE_LIMITER_STATE_PATH / "jianshu",
+        initial_rate=5,
+        min_rate=0.5,
+        max_rate=20,
+        burst=5,
+        increase_step=1,
+        decrease_factor=0.5,
+    ),
+    "JPEP": RateLimiter(
+        path=RATE_LIMITER_STATE_PATH / "jpep",
+        initial_rate=5,
+        min_rate=0.5,
+        max_rate=10,
+        burst=5,
+        increase_step=1,
+        decrease_factor=0.5,
+    ),
+    "BEIJIAOYI": RateLimiter(
+        path=RATE_LIMITER_STATE_PATH / "beijiaoyi",
+        initial_rate=5,
+        min_rate=0.5,
+        max_rate=10,
+        burst=5,
+        increase_step=1,
+        decrease_factor=0.5,
+    ),
+}
+
+
+def _get_event_hooks(
+    rate_limiter: RateLimiter, /, *, ratelimit_status_codes: set[int]
+) -> dict[str, list]:
+    async def on_request(_: Request) -> None:
+        await rate_limiter.acquire()
+
+    async def on_response(response: Response) -> None:
+        if response.status_code in ratelimit_status_codes:
+            rate_limiter.on_ratelimit()
+        else:
+            rate_limiter.on_success()
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def apply_rate_limiters() -> None:
+    """为 JKit 的所有数据源启用限流。
+
+    修改 JKit 数据源配置会重建 HTTP 客户端，因此需在修改配置后调用。
+    """
+    # JKit 未公开设置 HTTP 客户端 event hooks 的方式，只能修改其内部的客户端，
+    # 在此处导入，使 JKit 内部结构变化时只影响启用限流
+    from jkit._network import DATASOURCE_CLIENTS  # noqa: PLC0415
+
+    for datasource, rate_limiter in RATE_LIMITERS.items():
+        DATASOURCE_CLIENTS[datasource].event_hooks = _get_event_hooks(
+            rate_limiter, ratelimit_status_codes=RATELIMIT_STATUS_CODES[datasource]
+        )
+
+
+def get_rate_limiter_metrics() -> dict[DatasourceType, float]:
+    """获取各数据源当前的限流速率（请求 / 秒）。"""
+    return {
+        datasource: rate_limiter.rate
+        for datasource, rate_limiter in RATE_LIMITERS.items()
+    }
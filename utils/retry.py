@@ -3,8 +3,11 @@ from typing import Any
 from httpx import TransportError
 from jkit.exceptions import RatelimitError
 
+from utils.instrumentation import record_retry
+
 NETWORK_REQUEST_RETRY_PARAMS: dict[str, Any] = {
     "retries": 3,
     "base_delay": 5,
     "exceptions": (RatelimitError, TransportError),
+    "on_exception": record_retry,
 }
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from asyncio import TimeoutError as AsyncioTimeoutError
+from asyncio import wait_for
+from collections.abc import Awaitable, Iterator
+from fcntl import LOCK_EX, LOCK_NB, flock
+from os import fstat
+from pathlib import Path
+from shutil import move
+from time import monotonic, time_ns
+from typing import Callable
+from uuid import uuid4
+
+from msgspec import Struct
+from psycopg import OperationalError
+
+from utils.exceptions import SpoolFullError
+
+SEGMENT_SUFFIX = ".msgpack"
+
+
+class ReplayResult(Struct, frozen=True):
+    replayed_count: int
+    quarantined_count: int
+
+
+class Spool:
+    """本地只追加缓冲区。
+
+    数据库不可用时，将待写入的数据以分段文件形式保存在本地，待数据库恢复后重放。
+    无法重放的分段被移入隔离目录（quarantine_path），不阻塞之后的分段。
+    """
+
+    def __init__(self, path: Path, /, *, quarantine_path: Path, max_size: int) -> None:
+        self._path = path
+        self._quarantine_path = quarantine_path
+        self._max_size = max_size
+
+    @property
+    def size(self) -> int:
+        """缓冲区当前占用的磁盘空间（字节）。"""
+        size = 0
+        for segment in self.iter_segments():
+            # 分段可能在遍历时被其它进程重放并删除
+            try:
+                size += segment.stat().st_size
+            except FileNotFoundError:
+                continue
+
+        return size
+
+    def append(self, data: bytes, /) -> Path:
+        """写入一个分段。
+
+        超出缓冲区大小限制时抛出 SpoolFullError。
+        """
+        if self.size + len(data) > self._max_size:
+            raise SpoolFullError(
+                f"本地缓冲区空间不足（{self._path}，上限 {self._max_size} 字节）"
+            )
+
+        self._path.mkdir(parents=True, exist_ok=True)
+
+        # 文件名以写入时间开头，保证按写入顺序重放
+        name = f"{time_ns():020d}-{uuid4().hex[:8]}"
+        segment = self._path / f"{name}{SEGMENT_SUFFIX}"
+        temp_file = self._path / f"{name}.tmp"
+
+        # 先写入临时文件再重命名，避免进程中断时留下不完整的分段
+        temp_file.write_bytes(data)
+        temp_file.replace(segment)
+
+        return segment
+
+    def iter_segments(self) -> Iterator[Path]:
+        """按写入顺序遍历所有分段。"""
+        if not self._path.exists():
+            return
+
+        yield from sorted(self._path.glob(f"*{SEGMENT_SUFFIX}"))
+
+    def remove(self, segment: Path, /) -> None:
+        segment.unlink(missing_ok=True)
+
+    def quarantine(self, segment: Path, /, *, error: Exception) -> Path:
+        """将分段移入隔离目录，返回移动后的路径。
+
+        异常信息写入同名的 .error 文件，便于排查。
+        """
+        self._quarantine_path.mkdir(parents=True, exist_ok=True)
+
+        (self._quarantine_path / f"{segment.stem}.error").write_text(repr(error))
+        return Path(move(segment, self._quarantine_path / segment.name))
+
+    async def replay(
+        self,
+        write: Callable[[bytes], Awaitable[None]],
+        /,
+        *,
+        time_limit: float,
+        transient_exceptions: tuple[type[Exception], ...] = (OperationalError,),
+    ) -> ReplayResult:
+        """按写入顺序重放分段。
+
+        同一缓冲区可能被多个进程同时重放（如买单与卖单的采集），重放前通过 flock
+        独占分段，跳过其它进程正在重放或已删除的分段，进程退出时锁自动释放。
+        write 成功后才删除分段。抛出 transient_exceptions 中的异常（如数据库不可用）
+        或被中断时分段保留，下次重放时重试；抛出其它异常（如数据无法解码或违反约束）
+        时将分段移入隔离目录，继续重放之后的分段。
+        超过 time_limit 秒后不再重放新的分段，正在进行的写入也会被取消。
+        """
+        deadline = monotonic() + time_limit
+        replayed_count = 0
+        quarantined_count = 0
+        for segment in self.iter_segments():
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                break
+
+            try:
+                f = segment.open("rb")
+            except FileNotFoundError:
+                continue
+
+            with f:
+                try:
+                    flock(f, LOCK_EX | LOCK_NB)
+                except BlockingIOError:
+                    continue
+                # 获取锁前，该分段可能已被其它进程重放并删除
+                if fstat(f.fileno()).st_nlink == 0:
+                    continue
+
+                try:
+                    await wait_for(write(f.read()), timeout=remaining)
+                except AsyncioTimeoutError:
+                    break
+                except transient_exceptions:
+                    raise
+                except Exception as e:  # noqa: BLE001
+                    self.quarantine(segment, error=e)
+                    quarantined_count += 1
+                    continue
+
+                self.remove(segment)
+                replayed_count += 1
+
+        return ReplayResult(
+            replayed_count=replayed_count, quarantined_count=quarantined_count
+        )
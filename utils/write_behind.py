@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+from asyncio import Lock, Task, create_task, sleep
+from re import sub
+from types import TracebackType
+
+from anyio import get_cancelled_exc_class, move_on_after
+from msgspec import Struct
+from msgspec.structs import astuple, fields
+from psycopg.sql import SQL, Identifier
+
+from utils.batch import write_batch
+from utils.db import LazyPool
+
+
+class WriteBehindStats(Struct):
+    # 当前等待写入的数据行数量
+    pending_count: int = 0
+    max_pending_count: int = 0
+    flushes_count: int = 0
+    written_count: int = 0
+    poison_count: int = 0
+
+
+# 各表的写入统计数据，键为表名
+_STATS: dict[str, WriteBehindStats] = {}
+
+
+def get_write_behind_stats() -> dict[str, WriteBehindStats]:
+    """获取已使用过的写入缓冲区的统计数据。"""
+    return dict(_STATS)
+
+
+def reset_write_behind_stats() -> None:
+    """清空统计数据，在 Flow 开始时调用，使统计数据只包含本次运行。"""
+    _STATS.clear()
+
+
+def _get_table_name(model: type[Struct], /) -> str:
+    # FtnMarketRecord -> ftn_market_records
+    return sub(r"(?<!^)(?=[A-Z])", "_", model.__name__).lower() + "s"
+
+
+class _Buffer:
+    def __init__(
+        self, pool: LazyPool, model: type[Struct], /, *, max_size: int, max_delay: float
+    ) -> None:
+        self._pool = pool
+        self._table = _get_table_name(model)
+        self._columns = tuple(field.encode_name for field in fields(model))
+        self._max_size = max_size
+        self._max_delay = max_delay
+
+        self._rows: list[Struct] = []
+        self._lock = Lock()
+        self._timer: Task[None] | None = None
+
+        self.stats = _STATS.setdefault(self._table, WriteBehindStats())
+
+    async def _copy(self, rows: list[Struct], /) -> None:
+        async with (
+            self._pool.get_conn() as conn,
+            conn.transaction(),
+            conn.cursor().copy(
+                SQL("COPY {} ({}) FROM STDIN;").format(
+                    Identifier(self._table),
+                    SQL(", ").join(map(Identifier, self._columns)),
+                )
+            ) as copy,
+        ):
+            for row in rows:
+                await copy.write_row(astuple(row))
+
+    async def _try_flush(self) -> None:
+        try:
+            await self.flush()
+        except Exception:  # noqa: BLE001
+            # 未写入的数据行已放回缓冲区，在下次写入或关闭时重试，
+            # 关闭时仍写入失败则抛出异常，使 Flow 运行失败
+            return
+
+    async def _flush_later(self) -> None:
+        await sleep(self._max_delay)
+        self._timer = None
+        await self._try_flush()
+
+    async def add(self, row: Struct, /) -> None:
+        self._rows.append(row)
+        self.stats.pending_count = len(self._rows)
+        self.stats.max_pending_count = max(
+            self.stats.max_pending_count, self.stats.pending_count
+        )
+
+        if len(self._rows) >= self._max_size:
+            await self._try_flush()
+        elif not self._timer:
+            self._timer = create_task(self._flush_later())
+
+    async def flush(self) -> None:
+        # 按添加顺序写入，保证依赖已写入数据数量的断点续采正确
+        async with self._lock:
+            rows, self._rows = self._rows, []
+            if not rows:
+                return
+
+            # 二分隔离时各子批次分别提交，记录已写入的数据行
+            written_ids: set[int] = set()
+
+            async def write(batch: list[Struct], /) -> None:
+                await self._copy(batch)
+                written_ids.update(map(id, batch))
+
+            try:
+                poison_rows = await write_batch(rows, write, name=self._table)
+            except BaseException:
+                # 非数据问题导致写入失败（如数据库不可用）或被取消时，
+                # 将未写入的数据行按原顺序放回缓冲区
+                self._rows[:0] = [row for row in rows if id(row) not in written_ids]
+                self.stats.written_count += len(written_ids)
+                raise
+            finally:
+                self.stats.pending_count = len(self._rows)
+
+            self.stats.flushes_count += 1
+            self.stats.written_count += len(rows) - len(poison_rows)
+            self.stats.poison_count += len(poison_rows)
+
+    async def close(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+
+
+class WriteBehind:
+    """按模型分组的写入缓冲区。
+
+    添加的数据行按模型类型分别缓冲，数量达到 max_size 或最早的数据行等待超过
+    max_delay 秒时，通过 COPY 批量写入模型对应的表（类名转为下划线形式并加 s，
+    如 FtnMarketRecord -> ftn_market_records），写入失败的数据行由 write_batch
+    隔离。仅适用于只插入、不更新的表。
+
+    作为异步上下文管理器使用，退出时写入剩余数据，写入失败时抛出异常。
+    Flow 超时被取消时，在屏蔽取消的范围内最多等待 close_timeout 秒完成写入。
+    """
+
+    def __init__(
+        self,
+        pool: LazyPool,
+        /,
+        *,
+        max_size: int = 500,
+        max_delay: float = 1,
+        close_timeout: float = 10,
+    ) -> None:
+        self._pool = pool
+        self._max_size = max_size
+        self._max_delay = max_delay
+        self._close_timeout = close_timeout
+
+        self._buffers: dict[type[Struct], _Buffer] = {}
+
+    async def add(self, row: Struct, /) -> None:
+        model = type(row)
+        if model not in self._buffers:
+            self._buffers[model] = _Buffer(
+                self._pool,
+                model,
+                max_size=self._max_size,
+                max_delay=self._max_delay,
+            )
+
+        await self._buffers[model].add(row)
+
+    async def flush(self) -> None:
+        for buffer in self._buffers.values():
+            await buffer.flush()
+
+    async def close(self) -> None:
+        for buffer in self._buffers.values():
+            await buffer.close()
+
+    async def __aenter__(self) -> WriteBehind:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if isinstance(exc_value, get_cancelled_exc_class()):
+            # Prefect 的超时通过 anyio 取消范围实现，范围内的每次 await 都会被
+            # 再次取消，需在屏蔽取消的范围内写入剩余数据
+            with move_on_after(self._close_timeout, shield=True):
+                await self.close()
+        else:
+            await self.close()